@@ -0,0 +1,118 @@
+"""
+Per-request cost of the chat read paths: DataFrame round-trips, plain tuple fetches, cached response bytes.
+
+    python -m benchmarks.bench_read_paths [--chats 200] [--turns 20] [--requests 2000]
+"""
+import argparse
+import time
+from typing import List, Optional
+
+import duckdb
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import endpoints._api_RAG as api_rag_module
+from domain import SerializedCache
+from endpoints import api_RAG
+from infrastructure import SessionCache, get_repository, get_sessions
+from infrastructure._duckdb import create_schema
+from infrastructure._repository import (
+    LocalRepository, ChatRow, ExchangeRow, Page, _off_loop, page_size,
+    SQL_LIST_CHATS, SQL_GET_CHAT, SQL_GET_HISTORY, SQL_GET_HISTORY_LAST_N,
+)
+
+
+class DataFrameRepository(LocalRepository):
+    """The read paths as they were: ``.df()`` followed by ``to_dict(orient='records')``."""
+
+    @_off_loop
+    def list_chats(self, cursor, after: Optional[int] = None, limit: Optional[int] = None) -> Page:
+        df = cursor.execute(SQL_LIST_CHATS, [page_size(limit)]).df()
+        return Page([ChatRow(int(rec['id']), rec['name'], rec['summary']) for rec in df.to_dict(orient='records')], None)
+
+    @_off_loop
+    def get_chat(self, cursor, id_chat: int) -> Optional[ChatRow]:
+        df = cursor.execute(SQL_GET_CHAT, [id_chat]).df()
+        if df.empty:
+            return None
+        rec = df.to_dict(orient='records')[0]
+        return ChatRow(int(rec['id']), rec['name'], rec['summary'])
+
+    @_off_loop
+    def get_history(self, cursor, id_chat: int, last_n: Optional[int] = None) -> List[ExchangeRow]:
+        if last_n is None:
+            df = cursor.execute(SQL_GET_HISTORY, [id_chat]).df()
+        else:
+            df = cursor.execute(SQL_GET_HISTORY_LAST_N, [id_chat, last_n]).df()
+        return [
+            ExchangeRow(
+                int(rec['seq']), int(rec['id_exchange']), int(rec['id_query']), rec['content_query'],
+                int(rec['id_response']), rec['content_response'],
+            )
+            for rec in reversed(df.to_dict(orient='records'))
+        ]
+
+
+def seed(conn: duckdb.DuckDBPyConnection, chats: int, turns: int):
+    create_schema(conn)
+    conn.executemany(
+        "INSERT INTO chats (id, name, summary) VALUES (?, ?, ?)",
+        [[i, f'Chat #{i}', f'summary #{i}'] for i in range(chats)],
+    )
+    conn.executemany(
+        "INSERT INTO exchanges VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            [i, seq, i * turns + seq, seq, f'question {seq} ' * 8, seq, f'answer {seq} ' * 32]
+            for i in range(chats) for seq in range(turns)
+        ],
+    )
+
+
+def install(application: FastAPI, repository: LocalRepository):
+    # The endpoints take their repository and sessions through Depends
+    sessions = SessionCache(repository)
+    application.dependency_overrides[get_repository] = lambda: repository
+    application.dependency_overrides[get_sessions] = lambda: sessions
+
+
+def measure(client: TestClient, url: str, requests: int) -> float:
+    client.get(url)  # warm up
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(url).raise_for_status()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    conn = duckdb.connect(':memory:')
+    seed(conn, args.chats, args.turns)
+    application = FastAPI()
+    application.include_router(api_RAG)
+    client = TestClient(application)
+
+    # The first two runs render every response; the last one reuses cached ChatDetails bytes
+    runs = (
+        (DataFrameRepository(conn), SerializedCache(0)),
+        (LocalRepository(conn), SerializedCache(0)),
+        (LocalRepository(conn), SerializedCache()),
+    )
+    print(f"{'endpoint':<16}{'dataframe us':>14}{'tuples us':>12}{'cached us':>12}{'saving':>9}")
+    for url in ('/chats', f'/chats/{args.chats // 2}'):
+        timings = []
+        for repository, cache in runs:
+            install(application, repository)
+            api_rag_module.chat_responses = cache
+            assert client.get(url).json(), f'{url} found no seeded data'
+            timings.append(measure(client, url, args.requests))
+        before, after, cached = timings
+        print(f"{url:<16}{before:>14.1f}{after:>12.1f}{cached:>12.1f}{(before - cached) / before:>9.1%}")
+
+
+if __name__ == '__main__':
+    main()
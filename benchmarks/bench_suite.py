@@ -0,0 +1,319 @@
+"""
+Offline benchmarks of ingestion, retrieval and chat turns, checked against stored baselines.
+
+    python -m benchmarks.bench_suite [--scales 50,500] [--chats 8] [--rounds 5] [--update]
+
+Runs without network access: embeddings are the stand-in's hash-seeded vectors, the LLM is a stub
+behind the real prompt builder, Chroma lives in a temporary directory and DuckDB in memory. The
+corpus is synthetic ConvFinQA-shaped entries from a fixed seed, so every run does the same work.
+Each result is the median over several rounds of the suite. Exits with status 1 when a throughput
+or p50 result is worse than its baseline by more than the tolerance, and a latency also by more
+than the floor in milliseconds; p99s are reported alongside but too noisy to gate on.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterator, List, Sequence
+
+import duckdb
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+import usecases.doc_ingest._build_index as build_index_module
+import usecases.RAG._generate_responses as generate_module
+import usecases.RAG._retrieve_context as retrieve_module
+import usecases.RAG._warmup as warmup_module
+from domain import ChatQueryDTO
+from endpoints import api_RAG
+from infrastructure import LocalRepository, SessionCache, get_repository, get_sessions
+from infrastructure._duckdb import create_schema
+from infrastructure._standin import deterministic_embedding, count_tokens
+from usecases.RAG import retrieve_context
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+# How much worse than its baseline a result may be before the run fails
+BENCH_TOLERANCE = float(os.getenv('BENCH_TOLERANCE', '0.3'))
+# Latencies must also be this many milliseconds worse, since 30% of a 4 ms p50 is scheduler jitter
+BENCH_FLOOR_MS = float(os.getenv('BENCH_FLOOR_MS', '1.0'))
+# Each result is the median over this many rounds of the whole suite
+BENCH_ROUNDS = int(os.getenv('BENCH_ROUNDS', '5'))
+EMBEDDING_DIMENSIONS = 256
+HISTORY_POINTS = (0, 10, 30)
+HISTORY_WINDOW = 5
+
+COMPANIES = ('ACME', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Tyrell', 'Cyberdyne')
+LINE_ITEMS = ('revenue', 'net income', 'operating expenses', 'cash flow', 'total debt', 'dividends paid')
+
+
+@dataclass
+class Result:
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool
+    # Tail percentiles from a few dozen samples swing too much between machines to fail a run on
+    gated: bool = True
+
+
+class OfflineEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [deterministic_embedding(text, EMBEDDING_DIMENSIONS) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return deterministic_embedding(text, EMBEDDING_DIMENSIONS)
+
+
+class OfflineChatModel:
+    """Answers instantly, reporting token usage the way ChatOpenAI does."""
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        prompt_tokens = sum(count_tokens(str(msg.content)) for msg in messages)
+        content = f'Stub answer to: {messages[-1].content}'
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': count_tokens(content)}
+        return AIMessage(content=content, response_metadata={'token_usage': usage})
+
+
+def synthetic_entry(rng: random.Random, index: int) -> Dict[str, Any]:
+    company = rng.choice(COMPANIES)
+    years = [str(2015 + offset) for offset in range(rng.randint(2, 4))]
+    table = [['', *years]] + [
+        [item, *(f'{rng.uniform(10, 9000):.1f}' for _ in years)] for item in rng.sample(LINE_ITEMS, 4)
+    ]
+    sentences = [
+        f'{company} reported {rng.choice(LINE_ITEMS)} of ${rng.uniform(1, 900):.1f} million in {rng.choice(years)}, '
+        f'compared with ${rng.uniform(1, 900):.1f} million a year earlier, driven by {rng.choice(LINE_ITEMS)}.'
+        for _ in range(rng.randint(15, 30))
+    ]
+    split = len(sentences) // 2
+    return {
+        'id': f'{company}/{years[0]}/page_{index}.pdf-{index}',
+        'filename': f'{company}/{years[0]}/page_{index}.pdf',
+        'pre_text': sentences[:split],
+        'post_text': sentences[split:],
+        'table': table,
+        'qa': {
+            'question': f'what was the change in {table[1][0]} from {years[0]} to {years[-1]}?',
+            'answer': f'{rng.uniform(-50, 50):.1f}%',
+        },
+    }
+
+
+def corpus(entries: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [synthetic_entry(rng, index) for index in range(entries)]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@contextmanager
+def offline_stack(directory: str) -> Iterator[Any]:
+    """
+    Chroma over offline embeddings and the real chain with a stub LLM, as the usecases see them
+    until the block exits.
+    """
+    from chromadb.config import Settings
+    from langchain_chroma import Chroma
+    from infrastructure._openai import MessageAwareRAG
+
+    vectorstore = Chroma(
+        collection_name='bench',
+        embedding_function=OfflineEmbeddings(),
+        persist_directory=directory,
+        client_settings=Settings(anonymized_telemetry=False, is_persistent=True, persist_directory=directory),
+    )
+    retriever = vectorstore.as_retriever()
+    chain = MessageAwareRAG(retriever=retriever, openai_api_key='offline')
+    chain.llm = OfflineChatModel()
+    patches = (
+        (build_index_module, 'get_vectorstore', lambda: vectorstore),
+        (warmup_module, 'get_vectorstore', lambda: vectorstore),
+        (retrieve_module, 'get_retriever', lambda: retriever),
+        (generate_module, 'get_llm_chat', lambda: chain),
+    )
+    originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    for module, name, replacement in patches:
+        setattr(module, name, replacement)
+    try:
+        yield vectorstore
+    finally:
+        for module, name, original in originals:
+            setattr(module, name, original)
+
+
+def write_entries(entries: List[Dict[str, Any]], directory: str) -> List[str]:
+    # One file per entry, as POST /uploads indexes JSON uploads
+    paths = []
+    for index, entry in enumerate(entries):
+        path = os.path.join(directory, f'entry_{index}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        paths.append(path)
+    return paths
+
+
+def bench_ingest(entries: List[Dict[str, Any]], directory: str) -> Result:
+    paths = write_entries(entries, directory)
+    started, chunks = time.perf_counter(), 0
+    for path in paths:
+        chunks += len(build_index_module.from_file(path))
+    return Result(f'ingest[{len(entries)}]', chunks / (time.perf_counter() - started), 'chunks/s', True)
+
+
+def bench_retrieve(entries: List[Dict[str, Any]], queries: int) -> Iterator[Result]:
+    questions = [entry['qa']['question'] for entry in entries]
+    retrieve_context(ChatQueryDTO(id_query=0, content_query=questions[0]))  # warm up
+    timings = []
+    for index in range(queries):
+        query = ChatQueryDTO(id_query=index, content_query=questions[index % len(questions)])
+        started = time.perf_counter()
+        retrieve_context(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    yield Result(f'retrieve_p50[{len(entries)}]', percentile(timings, 0.5), 'ms', False)
+    yield Result(f'retrieve_p99[{len(entries)}]', percentile(timings, 0.99), 'ms', False, gated=False)
+
+
+def bench_chat_turns(entries: List[Dict[str, Any]], chats: int) -> Iterator[Result]:
+    conn = duckdb.connect(':memory:')
+    create_schema(conn)
+    repository = LocalRepository(conn)
+    sessions = SessionCache(repository)
+    application = FastAPI()
+    application.include_router(api_RAG)
+    application.dependency_overrides[get_repository] = lambda: repository
+    application.dependency_overrides[get_sessions] = lambda: sessions
+    client = TestClient(application, follow_redirects=False)
+
+    questions = [entry['qa']['question'] for entry in entries]
+    client.post(f'/chats/{chats}/query', json={'id_query': 0, 'content_query': questions[0]})  # warm up
+    by_history: Dict[int, List[float]] = {point: [] for point in HISTORY_POINTS}
+    for id_chat in range(chats):
+        for turn in range(HISTORY_POINTS[-1] + HISTORY_WINDOW):
+            body = {'id_query': turn, 'content_query': questions[(id_chat + turn) % len(questions)]}
+            started = time.perf_counter()
+            response = client.post(f'/chats/{id_chat}/query', json=body)
+            elapsed = (time.perf_counter() - started) * 1000
+            assert response.status_code == 302, response.text
+            for point in HISTORY_POINTS:
+                if point <= turn < point + HISTORY_WINDOW:
+                    by_history[point].append(elapsed)
+    conn.close()
+    for point, timings in by_history.items():
+        yield Result(f'chat_turn_p50[history={point}]', percentile(timings, 0.5), 'ms', False)
+        yield Result(f'chat_turn_p99[history={point}]', percentile(timings, 0.99), 'ms', False, gated=False)
+
+
+def run_round(scales: Sequence[int], chats: int, queries: int) -> List[Result]:
+    results = []
+    for entries_count in scales:
+        entries = corpus(entries_count)
+        with tempfile.TemporaryDirectory() as directory:
+            with offline_stack(os.path.join(directory, 'chroma')) as vectorstore:
+                results.append(bench_ingest(entries, directory))
+                results.extend(bench_retrieve(entries, queries))
+                # History growth is measured against the largest corpus only
+                if entries_count == max(scales):
+                    results.extend(bench_chat_turns(entries, chats))
+                vectorstore.delete_collection()
+    return results
+
+
+def run(scales: Sequence[int], chats: int, queries: int, rounds: int = 1) -> List[Result]:
+    """The median of each result over ``rounds`` runs, so that one slow round cannot fail the gate."""
+    samples: Dict[str, List[Result]] = {}
+    for _ in range(max(rounds, 1)):
+        for result in run_round(scales, chats, queries):
+            samples.setdefault(result.name, []).append(result)
+    return [
+        replace(results[0], value=statistics.median(result.value for result in results))
+        for results in samples.values()
+    ]
+
+
+def compare(
+    results: List[Result], baselines: Dict[str, Dict[str, Any]], tolerance: float, floor_ms: float = BENCH_FLOOR_MS
+) -> List[str]:
+    """
+    Descriptions of the gated results that are worse than their baseline by more than ``tolerance``,
+    and for latencies also by more than ``floor_ms``.
+    """
+    regressions = []
+    for result in results:
+        baseline = baselines.get(result.name)
+        if baseline is None or not result.gated:
+            continue
+        expected = baseline['value']
+        if result.higher_is_better:
+            worse = result.value < expected / (1 + tolerance)
+        else:
+            worse = result.value > expected * (1 + tolerance)
+            if result.unit == 'ms':
+                worse = worse and result.value - expected > floor_ms
+        if worse:
+            regressions.append(f'{result.name}: {result.value:.2f} {result.unit} against a baseline of {expected:.2f}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', default='50,500', help='Corpus sizes in ConvFinQA entries')
+    parser.add_argument('--chats', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=BENCH_TOLERANCE)
+    parser.add_argument('--floor-ms', type=float, default=BENCH_FLOOR_MS)
+    parser.add_argument('--rounds', type=int, default=BENCH_ROUNDS)
+    parser.add_argument('--update', action='store_true', help='Store these results as the new baselines')
+    args = parser.parse_args()
+    # This Chroma release logs an error for every telemetry event, even with telemetry off
+    logging.getLogger('chromadb.telemetry.product.posthog').setLevel(logging.CRITICAL)
+
+    results = run([int(scale) for scale in args.scales.split(',')], args.chats, args.queries, args.rounds)
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    print(f"{'benchmark':<32}{'result':>12}{'baseline':>12}  unit")
+    for result in results:
+        baseline = baselines.get(result.name, {}).get('value')
+        shown = f'{baseline:>12.2f}' if baseline is not None else f"{'-':>12}"
+        note = '' if result.gated else ' (not gated)'
+        print(f'{result.name:<32}{result.value:>12.2f}{shown}  {result.unit}{note}')
+
+    if args.update:
+        baselines.update({
+            result.name: {'value': round(result.value, 3), 'unit': result.unit, 'higher_is_better': result.higher_is_better}
+            for result in results
+        })
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return
+
+    regressions = compare(results, baselines, args.tolerance, args.floor_ms)
+    if regressions:
+        print(
+            f'\nREGRESSION: {len(regressions)} benchmark(s) worse than baseline by more than {args.tolerance:.0%}'
+            f' (and {args.floor_ms:g} ms for latencies)'
+        )
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
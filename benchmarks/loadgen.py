@@ -0,0 +1,231 @@
+"""
+Concurrent virtual users replaying multi-turn ConvFinQA conversations against the app.
+
+    python -m benchmarks.loadgen [--users 20] [--conversations 2] [--think 1.0] [--url http://127.0.0.1:8000]
+
+Each user opens a chat with ``POST /chats/new`` and asks the rest of the conversation through
+``POST /chats/{id}/query``, pausing for the think time between turns. Without ``--url`` the app is
+driven in-process through its ASGI interface, with its lifespan; add ``--stub-llm`` to run that
+offline against the benchmark suite's stub LLM and embeddings. Reports throughput, latency
+percentiles per turn index, and the error and 429 rates.
+"""
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import anyio
+import httpx
+
+from .bench_suite import corpus, offline_stack, percentile, write_entries
+
+
+CHAT_LOCATION = re.compile(r'/chats/(\d+)$')
+
+
+def synthetic_conversation(entry: Dict[str, Any]) -> List[str]:
+    header, row = entry['table'][0], entry['table'][1]
+    item, first, last = row[0], header[1], header[-1]
+    return [
+        f'what was the {item} in {first}?',
+        f'and what was it in {last}?',
+        'what was the change over that period?',
+        'and how much is that as a percentage of the first value?',
+        entry['qa']['question'],
+    ]
+
+
+def load_conversations(path: Optional[str], count: int) -> List[List[str]]:
+    """The turns of ConvFinQA dialogues from ``path``, or synthetic ones shaped like them."""
+    if path is None:
+        return [synthetic_conversation(entry) for entry in corpus(count)]
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    conversations = []
+    for entry in entries:
+        turns = entry.get('annotation', {}).get('dialogue_break') or [entry.get('qa', {}).get('question')]
+        turns = [turn for turn in turns if turn]
+        if turns:
+            conversations.append(turns)
+    return conversations[:count]
+
+
+@dataclass
+class LoadReport:
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+    latencies: Dict[int, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    throttled: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    conversations: int = 0
+
+    def record(self, turn: int, seconds: float, status_code: Optional[int]):
+        if status_code == 429:
+            self.throttled[turn] += 1
+        elif status_code is None or status_code >= 400:
+            self.errors[turn] += 1
+        else:
+            self.latencies[turn].append(seconds)
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> Dict[str, Any]:
+        turns = sorted(set(self.latencies) | set(self.errors) | set(self.throttled))
+        ok = sum(len(values) for values in self.latencies.values())
+        errors, throttled = sum(self.errors.values()), sum(self.throttled.values())
+        total = ok + errors + throttled
+        return {
+            'duration_s': round(self.duration, 3),
+            'requests': total,
+            'conversations': self.conversations,
+            'throughput_rps': round(ok / self.duration, 3) if self.duration else 0.0,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'throttled_rate': round(throttled / total, 4) if total else 0.0,
+            'turns': [
+                {
+                    'turn': turn,
+                    'ok': len(self.latencies[turn]),
+                    'errors': self.errors[turn],
+                    'throttled': self.throttled[turn],
+                    **{
+                        f'p{int(q * 100)}_ms': round(percentile(self.latencies[turn], q) * 1000, 2)
+                        for q in (0.5, 0.95, 0.99) if self.latencies[turn]
+                    },
+                }
+                for turn in turns
+            ],
+        }
+
+
+async def _send(client: httpx.AsyncClient, report: LoadReport, turn: int, url: str, **kwargs) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, **kwargs)
+    except httpx.HTTPError:
+        report.record(turn, time.perf_counter() - started, None)
+        return None
+    report.record(turn, time.perf_counter() - started, response.status_code)
+    return response
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    conversations: Sequence[List[str]],
+    report: LoadReport,
+    think: float,
+    rng: random.Random,
+):
+    for conversation in conversations:
+        id_chat = None
+        for turn, question in enumerate(conversation):
+            if turn:
+                # Think times vary around the mean, so users do not move in lockstep
+                await anyio.sleep(rng.uniform(0.5, 1.5) * think)
+            if id_chat is None:
+                response = await _send(client, report, turn, '/chats/new', params={'query': question})
+                match = CHAT_LOCATION.search(response.headers.get('location', '')) if response is not None else None
+                if match is None:
+                    break
+                id_chat = int(match.group(1))
+            else:
+                await _send(
+                    client, report, turn, f'/chats/{id_chat}/query',
+                    json={'id_query': turn, 'content_query': question},
+                )
+        report.conversations += 1
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    conversations: Sequence[List[str]],
+    users: int,
+    per_user: int = 1,
+    think: float = 1.0,
+    ramp_up: float = 0.0,
+    seed: int = 0,
+) -> LoadReport:
+    """Run ``users`` virtual users concurrently, each replaying ``per_user`` conversations."""
+    report = LoadReport()
+
+    async def start_user(index: int):
+        await anyio.sleep(ramp_up * index / users)
+        assigned = [conversations[(index * per_user + offset) % len(conversations)] for offset in range(per_user)]
+        await virtual_user(client, assigned, report, think, random.Random(seed + index))
+
+    async with anyio.create_task_group() as task_group:
+        for index in range(users):
+            task_group.start_soon(start_user, index)
+    report.finished = time.perf_counter()
+    return report
+
+
+def print_report(summary: Dict[str, Any]):
+    print(
+        f"{summary['requests']} requests, {summary['conversations']} conversations in {summary['duration_s']:.1f}s: "
+        f"{summary['throughput_rps']:.2f} turns/s, errors {summary['error_rate']:.2%}, "
+        f"429s {summary['throttled_rate']:.2%}"
+    )
+    print(f"{'turn':>6}{'ok':>8}{'errors':>8}{'429s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for row in summary['turns']:
+        timings = ''.join(f"{row.get(key, float('nan')):>10.1f}" for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{row['turn']:>6}{row['ok']:>8}{row['errors']:>8}{row['throttled']:>8}{timings}")
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    conversations = load_conversations(args.dataset, max(args.users * args.conversations, 1))
+    if args.turns:
+        conversations = [conversation[:args.turns] for conversation in conversations]
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        else:
+            import main
+            if args.stub_llm:
+                directory = stack.enter_context(tempfile.TemporaryDirectory())
+                stack.enter_context(offline_stack(directory))
+                from usecases.doc_ingest import index_from_file
+                for path in write_entries(corpus(50), directory):
+                    index_from_file(path)
+            await stack.enter_async_context(main.app.router.lifespan_context(main.app))
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=main.app), base_url='http://app', timeout=args.timeout
+            )
+        await stack.enter_async_context(client)
+        report = await run_load(
+            client, conversations, args.users, args.conversations, args.think, args.ramp_up, args.seed
+        )
+    return report.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+    parser.add_argument('--conversations', type=int, default=2, help='Conversations replayed by each user')
+    parser.add_argument('--turns', type=int, default=0, help='Cap on the turns of each conversation (0: all)')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean pause between turns in seconds')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='Seconds over which users are started')
+    parser.add_argument('--url', help='Base URL of a running server; in-process when omitted')
+    parser.add_argument('--dataset', help='ConvFinQA JSON whose dialogue turns are replayed; synthetic otherwise')
+    parser.add_argument('--stub-llm', action='store_true', help='In-process only: stub LLM and embeddings')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    summary = anyio.run(_main, args)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,18 @@ from ._langchain import (
     AIMessage,
     SystemMessage
 )
+from ._serialization import (
+    ChatDetailsAdapter,
+    SerializedCache,
+    chat_details_json,
+)
+from ._program import (
+    ProgramError,
+    execute_program,
+    extract_program,
+    format_program_result,
+    table_from_context,
+)
 
 __all__ = (
     "ChatDebriefDTO",
@@ -31,5 +43,13 @@ __all__ = (
     "SystemMessage",
     "RelevantQueriesDTO",
     "to_langchain_simple_metadata",
-    "inplace_append_chat"
+    "inplace_append_chat",
+    "ProgramError",
+    "execute_program",
+    "extract_program",
+    "format_program_result",
+    "table_from_context",
+    "ChatDetailsAdapter",
+    "SerializedCache",
+    "chat_details_json",
 )
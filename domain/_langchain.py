@@ -1,9 +1,14 @@
-from langchain_community.vectorstores.utils import filter_complex_metadata
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.documents import Document
 from typing_extensions import List
 from os import linesep
 
 
+def filter_complex_metadata(documents: List[Document], **kwargs) -> List[Document]:
+    # langchain_community is a large import that only document ingestion needs
+    from langchain_community.vectorstores.utils import filter_complex_metadata as _filter_complex_metadata
+    return _filter_complex_metadata(documents, **kwargs)
+
+
 def combine_docs(docs: List[Document]) -> str:
     return f"{linesep}{linesep}".join(doc.page_content for doc in docs)
@@ -0,0 +1,180 @@
+import re
+import math
+from functools import lru_cache
+from typing_extensions import List, Optional, Sequence, Tuple, Union
+
+
+MAX_PROGRAM_STEPS = 16
+MAX_PROGRAM_LENGTH = 1024
+# Guards ``exp`` against results that would take unbounded time or memory to produce
+MAX_EXPONENT = 1000
+
+STEP_PATTERN = re.compile(r'([a-z_]+)\(([^()]*)\)')
+PROGRAM_PATTERN = re.compile(r'^\s*[a-z_]+\([^()]*\)(\s*,\s*[a-z_]+\([^()]*\))*\s*$')
+NUMBER_PATTERN = re.compile(r'^-?\d+(\.\d+)?$')
+
+Value = Union[float, bool]
+Step = Tuple[str, Tuple[str, ...]]
+Table = Sequence[Sequence[str]]
+
+
+class ProgramError(ValueError):
+    pass
+
+
+def _binary(fn):
+    def op(args: List[Value], table: Optional[Table]) -> Value:
+        if len(args) != 2:
+            raise ProgramError(f'Expected 2 arguments, got {len(args)}.')
+        return fn(*args)
+    return op
+
+
+def _divide(a, b):
+    if b == 0:
+        raise ProgramError('Division by zero.')
+    return a / b
+
+
+def _exp(a, b):
+    if abs(b) > MAX_EXPONENT:
+        raise ProgramError('Exponent out of range.')
+    try:
+        return float(a ** b)
+    except (OverflowError, TypeError):
+        raise ProgramError('Exponentiation result out of range.')
+
+
+def _table_op(fn):
+    def op(args: List[str], table: Optional[Table]) -> Value:
+        if not table:
+            raise ProgramError('Table operation used without a table.')
+        row = _find_row(table, args[0])
+        values = [number for number in (_cell_number(cell) for cell in row[1:]) if number is not None]
+        if not values:
+            raise ProgramError(f'Row {args[0]!r} has no numeric cells.')
+        return fn(values)
+    return op
+
+
+ARITHMETIC_OPERATIONS = {
+    'add': _binary(lambda a, b: a + b),
+    'subtract': _binary(lambda a, b: a - b),
+    'multiply': _binary(lambda a, b: a * b),
+    'divide': _binary(_divide),
+    'exp': _binary(_exp),
+    'greater': _binary(lambda a, b: a > b),
+}
+TABLE_OPERATIONS = {
+    'table_max': _table_op(max),
+    'table_min': _table_op(min),
+    'table_sum': _table_op(sum),
+    'table_average': _table_op(lambda values: sum(values) / len(values)),
+}
+
+
+def _cell_number(cell: str) -> Optional[float]:
+    text = str(cell).strip().replace('$', '').replace(',', '').strip()
+    negative = text.startswith('(') and text.endswith(')')
+    text = text.strip('()').strip()
+    # 5% is 0.05, as in the ConvFinQA reference executor
+    percent = text.endswith('%')
+    text = text.rstrip('%').strip()
+    if not NUMBER_PATTERN.match(text):
+        return None
+    value = -float(text) if negative else float(text)
+    return value / 100 if percent else value
+
+
+def _find_row(table: Table, name: str) -> Sequence[str]:
+    name = name.strip().lower()
+    for row in table:
+        if row and str(row[0]).strip().lower() == name:
+            return row
+    raise ProgramError(f'Row {name!r} not found in table.')
+
+
+@lru_cache(maxsize=4096)
+def parse_program(program: str) -> Tuple[Step, ...]:
+    """Parse ``op(arg, arg), op(#0, arg)`` into ``(op, args)`` steps without evaluating anything."""
+    program = program.strip()
+    if len(program) > MAX_PROGRAM_LENGTH or not PROGRAM_PATTERN.match(program):
+        raise ProgramError(f'Not a valid program: {program[:80]!r}')
+    steps = tuple(
+        (name, tuple(arg.strip() for arg in args.split(',')))
+        for name, args in STEP_PATTERN.findall(program)
+    )
+    if len(steps) > MAX_PROGRAM_STEPS:
+        raise ProgramError(f'Program has more than {MAX_PROGRAM_STEPS} steps.')
+    for name, _ in steps:
+        if name not in ARITHMETIC_OPERATIONS and name not in TABLE_OPERATIONS:
+            raise ProgramError(f'Unknown operation {name!r}.')
+    return steps
+
+
+def _resolve(arg: str, results: List[Value]) -> Value:
+    if arg.startswith('#'):
+        index = int(arg[1:]) if arg[1:].isdigit() else -1
+        if not 0 <= index < len(results):
+            raise ProgramError(f'Reference {arg} points at no earlier step.')
+        return results[index]
+    if arg.startswith('const_'):
+        constant = arg[len('const_'):]
+        return -float(constant[1:]) if constant.startswith('m') else float(constant)
+    number = _cell_number(arg)
+    if number is None:
+        raise ProgramError(f'Not a number: {arg!r}')
+    return number
+
+
+def execute_program(program: str, table: Optional[Table] = None) -> Value:
+    """
+    Evaluate a ConvFinQA program such as ``subtract(206588, 181001), divide(#0, 181001)``.
+
+    Only the whitelisted operations are interpreted, so model output is never executed as code.
+    The value of the last step is returned.
+    """
+    steps = parse_program(program)
+    if table is None or not any(name in TABLE_OPERATIONS for name, _ in steps):
+        return _execute_cached(program)
+    return _execute(steps, table)
+
+
+@lru_cache(maxsize=4096)
+def _execute_cached(program: str) -> Value:
+    return _execute(parse_program(program), None)
+
+
+def _execute(steps: Tuple[Step, ...], table: Optional[Table]) -> Value:
+    results: List[Value] = []
+    for name, args in steps:
+        if name in TABLE_OPERATIONS:
+            results.append(TABLE_OPERATIONS[name](list(args), table))
+        else:
+            results.append(ARITHMETIC_OPERATIONS[name]([_resolve(arg, results) for arg in args], table))
+    result = results[-1]
+    if isinstance(result, float) and not math.isfinite(result):
+        raise ProgramError('Program result is not finite.')
+    return result
+
+
+def extract_program(text: str) -> str:
+    """Return the first line of an LLM reply that is a well-formed program."""
+    for line in text.replace('`', '').splitlines():
+        line = line.strip()
+        if line.lower().startswith('program:'):
+            line = line[len('program:'):].strip()
+        if PROGRAM_PATTERN.match(line):
+            return line
+    raise ProgramError('No program found in model output.')
+
+
+def table_from_context(context: str) -> List[List[str]]:
+    """Recover table rows from retrieved context, where ``_transform_json_entries`` joins cells with ``' | '``."""
+    return [[cell.strip() for cell in line.split(' | ')] for line in context.splitlines() if ' | ' in line]
+
+
+def format_program_result(value: Value) -> str:
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    return f'{value:.5f}'.rstrip('0').rstrip('.')
@@ -0,0 +1,44 @@
+from threading import Lock
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple, Union
+
+from pydantic import TypeAdapter
+
+from ._data_transfer_objects import ChatDetails
+
+
+ChatDetailsAdapter = TypeAdapter(ChatDetails)
+
+
+def chat_details_json(payload: Union[str, bytes]) -> bytes:
+    """Validate a whole ChatDetails document, history included, in one pass and return its JSON."""
+    return ChatDetailsAdapter.dump_json(ChatDetailsAdapter.validate_json(payload))
+
+
+class SerializedCache:
+    """Least recently used response bodies, each tagged with the version it was rendered from."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, Tuple[int, bytes]]' = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, version: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, version: int, body: bytes):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,4 +1,10 @@
 from ._api_doc_ingest import router as api_doc_ingest
 from ._api_RAG import router as api_RAG
+from ._api_metrics import router as api_metrics, InFlightMiddleware
+from ._api_traces import router as api_traces, TracingMiddleware
+from ._api_profiles import router as api_profiles, ProfilingMiddleware
+from ._api_health import router as api_health
 
-__all__ = ("api_doc_ingest", "api_RAG",)
+__all__ = ("api_doc_ingest", "api_RAG", "api_metrics", "InFlightMiddleware", "api_traces", "TracingMiddleware",
+    "api_profiles", "ProfilingMiddleware", "api_health",
+)
@@ -1,84 +1,99 @@
-import json
-import pandas as pd
+import os
 from uuid import uuid4
-from typing_extensions import Annotated, List
-from fastapi import APIRouter, Body, Path, status, HTTPException
+from functools import partial
+
+import anyio
+from typing_extensions import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Body, Path, Query, Response, status, HTTPException
 from fastapi.responses import ORJSONResponse, RedirectResponse
-from langchain_community.chat_message_histories import ChatMessageHistory
 
 from domain import (
     ChatDebriefDTO,
     ChatDetailsDTO,
     ChatQueryDTO,
-    ChatResponseDTO,
     ChatExchangeDTO,
+    HumanMessage,
+    SerializedCache,
+    chat_details_json,
+)
+from infrastructure import (
+    ExchangeRow, ConcurrentUpdateError, LocalRepository, SessionCache, timed, count_cache, debug_sampled,
 )
-from infrastructure import localdb
-from usecases.RAG import generate_response
+from usecases.RAG import generate_response, generate_program_response
+
+from ._dependencies import AdmissionDep, LLMChatDep, RepositoryDep, SessionsDep, admitted, chat_turn
 
 
 router = APIRouter()
 
+# Turns of history put into the prompt for each new query
+CHAT_HISTORY_TURNS = int(os.getenv('CHAT_HISTORY_TURNS', '32'))
+# Rendered ChatDetails bodies kept per chat, reused until the chat's version changes
+CHAT_RESPONSE_CACHE_SIZE = int(os.getenv('CHAT_RESPONSE_CACHE_SIZE', '1024'))
+
+chat_responses = SerializedCache(CHAT_RESPONSE_CACHE_SIZE)
+
 @router.get('/chats', response_class=ORJSONResponse)
-async def get_chats() -> List[ChatDebriefDTO]:
-    # Load into DataFrame for named access
-    df = localdb.execute(
-        "SELECT id, name, summary FROM chats ORDER BY id"
-    ).df()
-    # Convert each row to ChatDebriefDTO by column name
+async def get_chats(
+    response: Response,
+    repository: RepositoryDep,
+    after: Annotated[Optional[int], Query] = None,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+) -> List[ChatDebriefDTO]:
+    # Pages are capped in size; the key to continue from comes back in the X-Next-Cursor header
+    page = await repository.list_chats(after=after, limit=limit)
+    if page.next_after is not None:
+        response.headers['X-Next-Cursor'] = str(page.next_after)
     return [
-        ChatDebriefDTO(
-            id_chat=int(rec['id']),
-            name=rec['name'],
-            summary=rec['summary'],
-        )
-        for rec in df.to_dict(orient='records')
+        ChatDebriefDTO(id_chat=row.id, name=row.name, summary=row.summary)
+        for row in page.rows
     ]
 
+async def _chat_details_body(_id: int, repository: LocalRepository, sessions: SessionCache) -> Optional[bytes]:
+    # Turns still queued for the database must be visible to whoever reads the chat next
+    await sessions.settled(_id)
+    chat = await repository.get_chat(_id)
+    if chat is None:
+        return None
+    body = chat_responses.get(_id, chat.version)
+    count_cache('chat_details', body is not None)
+    if body is None:
+        rendered = await repository.get_chat_details_json(_id)
+        if rendered is None:
+            return None
+        version, payload = rendered
+        body = chat_details_json(payload)
+        chat_responses.put(_id, version, body)
+    return body
+
 @router.get('/chats/{_id}', response_class=ORJSONResponse)
-async def get_chat(_id: Annotated[int, Path]) -> ChatDetailsDTO:
-    df = localdb.execute(
-        "SELECT id, name, summary, history FROM chats WHERE id = ?", [_id]
-    ).df()
-    if df.empty:
+async def get_chat(_id: Annotated[int, Path], repository: RepositoryDep, sessions: SessionsDep) -> ChatDetailsDTO:
+    body = await _chat_details_body(_id, repository, sessions)
+    if body is None:
         return ChatDetailsDTO(
             id_chat=-1, name='', summary='', history=[]
         )
+    # Already validated and serialized, so FastAPI must not rebuild the models
+    return Response(content=body, media_type='application/json')
 
-    record = df.to_dict(orient='records')[0]
-    history_items = json.loads(record.get('history') or '[]')
-    history = [ChatExchangeDTO.parse_obj(item) for item in history_items]
-    return ChatDetailsDTO(
-        id_chat=int(record['id']),
-        name=record['name'],
-        summary=record['summary'],
-        history=history,
-    )
+async def _answer(_id: int, query_chat: ChatQueryDTO, sessions: SessionCache, mode: str):
+    # The caller holds the chat's lock and an interactive slot
+    # Active chats come from memory with their messages already parsed
+    with timed('post_query', 'load_session'):
+        session = await sessions.get(_id)
+    counter = int(session.summary.split('#')[-1]) if session.summary else 0
 
-@router.post('/chats/{_id}/query', response_class=ORJSONResponse)
-async def post_query(
-    _id: Annotated[int, Path],
-    query_chat: Annotated[ChatQueryDTO, Body],
-) -> RedirectResponse:
-    df = localdb.execute(
-        "SELECT history, summary FROM chats WHERE id = ?", [_id]
-    ).df()
-    if not df.empty:
-        rec = df.to_dict(orient='records')[0]
-        history_list = json.loads(rec.get('history') or '[]')
-        counter = int(rec.get('summary', '#0').split('#')[-1])
-    else:
-        history_list = []
-        counter = 0
-
-    chat_history = ChatMessageHistory()
-    for item in history_list:
-        ex = ChatExchangeDTO.parse_obj(item)
-        chat_history.add_user_message(ex.query.content_query)
-        chat_history.add_ai_message(ex.response.content_response)
-
-    chat_history.add_user_message(query_chat.content_query)
-    llm_response = generate_response(query_chat, chat_history.messages, debug=True)
+    messages = session.history(CHAT_HISTORY_TURNS)
+    messages.append(HumanMessage(content=query_chat.content_query))
+    # 'program' asks the LLM for a ConvFinQA program and computes the answer locally
+    respond = generate_program_response if mode == 'program' else generate_response
+    # The LLM call blocks, so it runs in a worker thread and leaves the event loop to other chats;
+    # the full prompt is only printed for requests sampled for debugging
+    with timed('post_query', 'respond') as span:
+        span.set(history_messages=len(messages), mode=mode)
+        llm_response = await anyio.to_thread.run_sync(
+            partial(respond, query_chat, messages, debug=debug_sampled())
+        )
 
     exchange = ChatExchangeDTO(
         id_chat=_id,
@@ -86,42 +101,64 @@ async def post_query(
         query=query_chat,
         response=llm_response,
     )
-    history_list.append(exchange.dict())
     new_summary = f'something wicked this way comes #{counter + 1}'
     new_name = f'Chat #{_id} (id_chat: {_id})'
-    serialized_history = json.dumps(history_list)
 
-    if not df.empty:
-        localdb.execute(
-            "UPDATE chats SET name = ?, summary = ?, history = ? WHERE id = ?",
-            [new_name, new_summary, serialized_history, _id],
-        )
-    else:
-        localdb.execute(
-            "INSERT INTO chats (id, name, summary, history) VALUES (?, ?, ?, ?)",
-            [_id, new_name, new_summary, serialized_history],
-        )
+    try:
+        with timed('post_query', 'persist'):
+            await sessions.record(
+                session, new_name, new_summary,
+                ExchangeRow(
+                    session.next_seq, exchange.id_exchange,
+                    exchange.query.id_query, exchange.query.content_query,
+                    exchange.response.id_response, exchange.response.content_response,
+                ),
+            )
+    except ConcurrentUpdateError:
+        # Another writer (e.g. a second worker) added a turn first; the client may retry
+        raise HTTPException(status_code=409, detail='Chat was updated concurrently')
 
+@router.post('/chats/{_id}/query', response_class=ORJSONResponse)
+async def post_query(
+    _id: Annotated[int, Path],
+    query_chat: Annotated[ChatQueryDTO, Body],
+    sessions: SessionsDep,
+    admission: AdmissionDep,
+    mode: Annotated[Literal['text', 'program'], Query] = 'text',
+) -> RedirectResponse:
+    # One turn at a time per chat, so each query sees the previous answer; other chats run in parallel.
+    # Turns past the chat's or the pool's queue are turned away with 429 before any retrieval or LLM work
+    async with chat_turn(sessions, _id, admission.interactive):
+        await _answer(_id, query_chat, sessions, mode)
     return RedirectResponse(url=f'/chats/{_id}', status_code=status.HTTP_302_FOUND)
 
 @router.post('/chats/new', response_class=ORJSONResponse)
-async def post_new_chat(query: Annotated[str, Body]) -> RedirectResponse:
-    df = localdb.execute("SELECT MAX(id) AS max_id FROM chats").df()
-    max_id = df.at[0, 'max_id'] if not df.empty and pd.notna(df.at[0, 'max_id']) else None
-    next_id = int(max_id) + 1 if max_id is not None else 0
-    return await post_query(_id=next_id, query_chat=ChatQueryDTO(id_query=0, content_query=query))
+async def post_new_chat(
+    query: Annotated[str, Body],
+    repository: RepositoryDep,
+    sessions: SessionsDep,
+    admission: AdmissionDep,
+    mode: Annotated[Literal['text', 'program'], Query] = 'text',
+) -> RedirectResponse:
+    # Admitted before the id is allocated, so rejected requests do not use up chat ids
+    async with admitted(admission.interactive):
+        next_id = await repository.allocate_chat_id()
+        async with sessions.lock(next_id):
+            await _answer(next_id, ChatQueryDTO(id_query=0, content_query=query), sessions, mode)
+    return RedirectResponse(url=f'/chats/{next_id}', status_code=status.HTTP_302_FOUND)
 
 @router.get('/chats/{_id}/history', response_class=ORJSONResponse)
-async def get_chat_history(_id: Annotated[int, Path]) -> ChatDetailsDTO:
-    df = localdb.execute(
-        "SELECT id, name, summary, history FROM chats WHERE id = ?", [_id]
-    ).df()
-    if df.empty:
+async def get_chat_history(
+    _id: Annotated[int, Path], repository: RepositoryDep, sessions: SessionsDep
+) -> ChatDetailsDTO:
+    body = await _chat_details_body(_id, repository, sessions)
+    if body is None:
         raise HTTPException(status_code=404, detail='Chat history not found')
+    return Response(content=body, media_type='application/json')
 
-    rec = df.to_dict(orient='records')[0]
-    history_items = json.loads(rec.get('history') or '[]')
-    history = [ChatExchangeDTO.parse_obj(item) for item in history_items]
-    return ChatDetailsDTO(
-        id_chat=int(rec['id']), name=rec['name'], summary=rec['summary'], history=history
-    )
+@router.get('/models', response_class=ORJSONResponse)
+async def get_model_stats(llm_chat: LLMChatDep) -> List[dict]:
+    # Per-tier latency percentiles and token spend of the model ladder
+    if llm_chat.router is None:
+        return []
+    return llm_chat.router.report()
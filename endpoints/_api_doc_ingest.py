@@ -1,116 +1,116 @@
 import os
 import json
-import shutil
+import tempfile
+import mimetypes
+from functools import partial
 
-from fastapi import APIRouter, Path, status, HTTPException, UploadFile
+import anyio
+from fastapi import APIRouter, Path, Query, Response, status, HTTPException, UploadFile
 from fastapi.responses import ORJSONResponse, RedirectResponse
 from typing_extensions import Annotated
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Tuple
 from tqdm import tqdm
 
 from usecases.doc_ingest import index_from_file
-from infrastructure import localdb
+from infrastructure import BlobStore, DocumentRow
 
+from ._dependencies import AdmissionDep, BlobStoreDep, RepositoryDep, admitted
+from ._responses import RangedFileResponse
 
-router = APIRouter()
 
-UPLOAD_DIRECTORY = 'uploads'
-if not os.path.exists(UPLOAD_DIRECTORY):
-    os.makedirs(UPLOAD_DIRECTORY)
+router = APIRouter()
 
-@router.get('/uploads', response_class=ORJSONResponse)
-async def get_uploads() -> List[List[Tuple[str, Any]]]:
-    # Load all documents into a DataFrame for named access
-    df = localdb.execute(
-        "SELECT id, name, contents FROM documents ORDER BY id"
-    ).df()
+def _metadata(row: DocumentRow) -> List[Tuple[str, Any]]:
     return [
-        [
-            ('id', rec['id']),
-            ('name', rec['name']),
-            ('contents', rec['contents']),
-        ]
-        for rec in df.to_dict(orient='records')
+        ('id', row.id),
+        ('name', row.name),
+        ('size', row.size),
+        ('hash', row.hash),
     ]
 
+@router.get('/uploads', response_class=ORJSONResponse)
+async def get_uploads(
+    response: Response,
+    repository: RepositoryDep,
+    after: Annotated[Optional[str], Query] = None,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+) -> List[List[Tuple[str, Any]]]:
+    # Metadata only, one capped page at a time; contents are served by /uploads/{_id}/contents
+    page = await repository.list_documents(after=after, limit=limit)
+    if page.next_after is not None:
+        response.headers['X-Next-Cursor'] = page.next_after
+    return [_metadata(row) for row in page.rows]
+
 @router.get('/uploads/{_id}', response_class=ORJSONResponse)
-async def get_upload(_id: Annotated[str, Path]) -> List[Tuple[str, Any]]:
-    df = localdb.execute(
-        "SELECT id, name, contents FROM documents WHERE id = ?", [_id]
-    ).df()
-    if df.empty:
+async def get_upload(_id: Annotated[str, Path], repository: RepositoryDep) -> List[Tuple[str, Any]]:
+    row = await repository.get_document(_id)
+    if row is None:
         raise HTTPException(status_code=404, detail='Document not found')
-
-    rec = df.to_dict(orient='records')[0]
-    return [
-        ('id', rec['id']),
-        ('name', rec['name']),
-        ('contents', rec['contents']),
-    ]
-
-@router.post('/uploads', response_class=ORJSONResponse)
-async def post_upload(file: UploadFile) -> RedirectResponse:
-    dest = os.path.join(UPLOAD_DIRECTORY, file.filename)
-    with open(dest, 'wb') as buf:
-        shutil.copyfileobj(file.file, buf)
-
-    lower = dest.lower()
-    is_json = lower.endswith(".json") or lower.endswith(".jsonl")
-
-    if is_json:
-        with open(dest, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    return _metadata(row)
+
+@router.get('/uploads/{_id}/contents')
+async def get_upload_contents(
+    _id: Annotated[str, Path], repository: RepositoryDep, blob_store: BlobStoreDep
+) -> RangedFileResponse:
+    row = await repository.get_document(_id)
+    if row is None or row.hash is None or not blob_store.exists(row.hash):
+        raise HTTPException(status_code=404, detail='Document not found')
+    media_type = mimetypes.guess_type(row.name)[0] or 'application/octet-stream'
+    # Content-addressed, so the hash doubles as a strong ETag
+    return RangedFileResponse(blob_store.path(row.hash), etag=row.hash, media_type=media_type, filename=row.name)
+
+def _index_json_entries(path: str, blob_store: BlobStore, source: str) -> List[str]:
+    # Each entry is indexed from its own short-lived file; only the uploaded file is kept
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    ids_indexed = []
+    with tempfile.TemporaryDirectory(dir=blob_store.staging) as entries_dir:
         for idx, entry in enumerate(tqdm(data, desc="Processing JSON", unit="entry"), start=1):
-            filename = f"{dest.split('.')[0]}_{idx}.json"
-            filepath = filename
+            filepath = os.path.join(entries_dir, f"entry_{idx}.json")
             with open(filepath, 'w', encoding='utf-8') as out_f:
                 json.dump(entry, out_f, ensure_ascii=False, indent=2)
 
-            ids_indexed = index_from_file(filepath)
+            ids_entry = index_from_file(filepath, source=source)
 
-            if not ids_indexed:
+            if not ids_entry:
                 raise HTTPException(
                     status_code=400,
                     detail="Upload succeeded but no documents were ingested"
                 )
+            ids_indexed.extend(ids_entry)
+    return ids_indexed
 
-            with open(dest, 'rb') as f:
-                data = f.read()
-
-            for _id in ids_indexed:
-                exists_df = localdb.execute(
-                    "SELECT 1 FROM documents WHERE id = ?", [_id]
-                ).df()
-                if not exists_df.empty:
-                    continue
+@router.post('/uploads', response_class=ORJSONResponse)
+async def post_upload(
+    file: UploadFile, repository: RepositoryDep, blob_store: BlobStoreDep, admission: AdmissionDep
+) -> RedirectResponse:
+    # Uploads have their own pool, so a burst of them queues behind itself and not behind chat turns
+    async with admitted(admission.bulk):
+        suffix = os.path.splitext(file.filename)[1]
+        staged = await anyio.to_thread.run_sync(blob_store.stage, file.file, suffix)
+        try:
+            lower = file.filename.lower()
+            # Embedding and indexing block, so they run in a worker thread like the chat turns' LLM calls
+            if lower.endswith(".json") or lower.endswith(".jsonl"):
+                ids_indexed = await anyio.to_thread.run_sync(
+                    _index_json_entries, staged.path, blob_store, file.filename
+                )
+            else:
+                ids_indexed = await anyio.to_thread.run_sync(
+                    partial(index_from_file, staged.path, source=file.filename)
+                )
 
-                localdb.execute(
-                    "INSERT INTO documents (id, name, contents) VALUES (?, ?, ?)",
-                    [_id, file.filename, data],
+            if not ids_indexed:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Upload succeeded but no documents were ingested"
                 )
-    else:
-        ids_indexed = index_from_file(dest)
-
-        if not ids_indexed:
-            raise HTTPException(
-                status_code=400,
-                detail="Upload succeeded but no documents were ingested"
-            )
-
-        with open(dest, 'rb') as f:
-            data = f.read()
-
-        for _id in tqdm(ids_indexed, desc="Uploading documents", unit="doc"):
-            exists_df = localdb.execute(
-                "SELECT 1 FROM documents WHERE id = ?", [_id]
-            ).df()
-            if not exists_df.empty:
-                continue
-
-            localdb.execute(
-                "INSERT INTO documents (id, name, contents) VALUES (?, ?, ?)",
-                [_id, file.filename, data],
-            )
+        except BaseException:
+            blob_store.discard(staged)
+            raise
+
+        blob_store.commit(staged)
+        await repository.insert_documents(ids_indexed, file.filename, staged.size, staged.digest)
 
     print("Upload complete")
 
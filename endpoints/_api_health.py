@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+from infrastructure import readiness
+
+
+router = APIRouter()
+
+
+@router.get('/health', response_class=ORJSONResponse)
+async def get_health():
+    # Liveness only: the event loop answers, whatever the state of the warmup
+    return {'status': 'ok'}
+
+
+@router.get('/ready', response_class=ORJSONResponse)
+async def get_ready():
+    # Load balancers keep the process out of rotation until the caches are warm
+    return ORJSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
@@ -0,0 +1,92 @@
+import hmac
+import random
+from typing import Any, Dict, List, Optional
+
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Path
+from fastapi.responses import FileResponse, ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing_extensions import Annotated
+
+import infrastructure._profiling as profiling
+from infrastructure import ProfileStore, get_profile_store
+
+from ._dependencies import ProfileStoreDep
+
+
+def _token_matches(token: Optional[str]) -> bool:
+    expected = profiling.PROFILE_ADMIN_TOKEN
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def require_admin(x_admin_token: Annotated[Optional[str], Header()] = None):
+    if not profiling.PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail='Profiling is disabled')
+    if not _token_matches(x_admin_token):
+        raise HTTPException(status_code=403, detail='Admin token required')
+
+
+router = APIRouter(prefix='/admin/profiles', dependencies=[Depends(require_admin)])
+
+
+@router.get('', response_class=ORJSONResponse)
+async def get_profiles(store: ProfileStoreDep) -> List[Dict[str, Any]]:
+    return [info._asdict() for info in store.list()]
+
+
+@router.get('/{name}')
+async def get_profile(name: Annotated[str, Path], store: ProfileStoreDep) -> FileResponse:
+    path = store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    return FileResponse(path, media_type='text/plain', filename=name)
+
+
+@router.get('/{name}/summary', response_class=ORJSONResponse)
+async def get_profile_summary(name: Annotated[str, Path], store: ProfileStoreDep) -> Dict[str, Any]:
+    summary = await anyio.to_thread.run_sync(store.summary, name)
+    if summary is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    return summary
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when asked to with ``X-Profile: 1`` and the admin token, or when it is picked
+    by ``PROFILE_SAMPLE_RATE``. The response names the profile in ``X-Profile-Id``.
+
+    Does nothing at all unless ``PROFILE_ADMIN_TOKEN`` is set.
+    """
+
+    def __init__(self, app: ASGIApp, store: Optional[ProfileStore] = None):
+        self.app = app
+        self.store = store
+
+    def _wanted(self, scope: Scope) -> bool:
+        headers = Headers(scope=scope)
+        if headers.get('x-profile') == '1' and _token_matches(headers.get('x-admin-token')):
+            return True
+        return random.random() < profiling.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or not profiling.PROFILE_ADMIN_TOKEN or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        store = self.store or get_profile_store()
+        profiler = store.start()
+        if profiler is None:
+            # Another request is being profiled
+            await self.app(scope, receive, send)
+            return
+        name = store.new_name(f"{scope['method']} {scope['path']}")
+
+        async def send_with_id(message: Message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message.get('headers', []), (b'x-profile-id', name.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            await anyio.to_thread.run_sync(store.stop, profiler, name)
@@ -0,0 +1,39 @@
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Query
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing_extensions import Annotated
+
+from infrastructure import tracer
+
+
+router = APIRouter()
+
+# Polled every few seconds by the orchestrator; they would crowd real requests out of the buffer
+PROBE_PATHS = ('/health', '/ready')
+
+
+@router.get('/debug/traces', response_class=ORJSONResponse)
+async def get_traces(limit: Annotated[int, Query(ge=1, le=500)] = 20) -> List[Dict[str, Any]]:
+    # Slowest of the requests still in the ring buffer, each with its tree of spans
+    return [span.as_dict() for span in tracer.slowest(limit)]
+
+
+class TracingMiddleware:
+    """Opens the root span of every HTTP request; spans opened while serving it nest underneath."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['path'].startswith('/debug/') or scope['path'] in PROBE_PATHS:
+            await self.app(scope, receive, send)
+            return
+        with tracer.span(f"{scope['method']} {scope['path']}") as span:
+            async def traced_send(message: Message):
+                if message['type'] == 'http.response.start':
+                    span.set(status_code=message['status'])
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
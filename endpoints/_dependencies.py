@@ -0,0 +1,42 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Depends, HTTPException
+from typing_extensions import Annotated
+
+from infrastructure import (
+    AdmissionControl, AdmissionPool, BlobStore, LLMChat, LocalRepository, Overloaded, ProfileStore, SessionCache,
+    get_admission, get_blob_store, get_llm_chat, get_profile_store, get_repository, get_sessions,
+)
+
+
+# Endpoint parameters for the shared infrastructure; tests replace them through app.dependency_overrides
+RepositoryDep = Annotated[LocalRepository, Depends(get_repository)]
+SessionsDep = Annotated[SessionCache, Depends(get_sessions)]
+BlobStoreDep = Annotated[BlobStore, Depends(get_blob_store)]
+LLMChatDep = Annotated[LLMChat, Depends(get_llm_chat)]
+ProfileStoreDep = Annotated[ProfileStore, Depends(get_profile_store)]
+AdmissionDep = Annotated[AdmissionControl, Depends(get_admission)]
+
+
+@asynccontextmanager
+async def _rejected_when_full() -> AsyncIterator[None]:
+    # A full queue answers at once, telling the client when a slot is likely to be free
+    try:
+        yield
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': str(e.retry_after)})
+
+
+@asynccontextmanager
+async def admitted(pool: AdmissionPool) -> AsyncIterator[None]:
+    async with _rejected_when_full(), pool.admit():
+        yield
+
+
+@asynccontextmanager
+async def chat_turn(sessions: SessionCache, id_chat: int, pool: AdmissionPool) -> AsyncIterator[None]:
+    # The chat first and then a slot, so turns queued behind their own chat hold none; both queues are
+    # bounded, so a burst at one chat is turned away as fast as a burst at the pool
+    async with _rejected_when_full(), sessions.lock(id_chat), pool.admit():
+        yield
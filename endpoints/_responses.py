@@ -0,0 +1,149 @@
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive byte span requested by a single-range ``Range`` header, or None to send the whole file.
+
+    Raises ValueError when the range cannot be satisfied. Multi-range requests are answered in full.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def content_disposition(filename: str) -> str:
+    """
+    ``attachment`` with the name as RFC 6266 ``filename*``, plus a plain ASCII ``filename`` for
+    clients that do not read the encoded form. Header values must stay within Latin-1.
+    """
+    fallback = filename.encode('ascii', 'replace').decode('ascii').replace('"', '').replace('\\', '')
+    encoded = quote(filename)
+    if encoded == filename:
+        return f'attachment; filename="{fallback}"'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{encoded}"
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    # ``*`` matches any current representation; weak validators compare equal for If-None-Match
+    tags = [tag.strip() for tag in (header or '').split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+class RangedFileResponse(Response):
+    """
+    Streams a file from disk with ``Range``, ``If-Range`` and ``If-None-Match`` support.
+
+    The file is never read into memory as a whole: servers that implement the ASGI zero-copy
+    extension get the descriptor to ``sendfile`` from, all others receive fixed-size chunks.
+    """
+
+    def __init__(self, path: str, etag: str, media_type: str, filename: Optional[str] = None):
+        self.path = path
+        self.etag = f'"{etag}"'
+        self.media_type = media_type
+        self.filename = filename
+        self.background = None
+        self.status_code = 200
+        self.body = b''
+        self.init_headers({})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        request_headers = Headers(scope=scope)
+        size = os.stat(self.path).st_size
+        headers = {
+            'accept-ranges': 'bytes',
+            'etag': self.etag,
+            'content-type': self.media_type,
+        }
+        if self.filename:
+            headers['content-disposition'] = content_disposition(self.filename)
+
+        if etag_matches(request_headers.get('if-none-match'), self.etag):
+            await self._send_head(send, 304, headers)
+            return
+
+        span = None
+        if_range = request_headers.get('if-range')
+        if if_range is None or if_range == self.etag:
+            try:
+                span = parse_range(request_headers.get('range'), size)
+            except ValueError:
+                headers['content-range'] = f'bytes */{size}'
+                await self._send_head(send, 416, headers)
+                return
+
+        start, end = span if span is not None else (0, size - 1)
+        count = end - start + 1 if size else 0
+        headers['content-length'] = str(count)
+        status_code = 200
+        if span is not None:
+            status_code = 206
+            headers['content-range'] = f'bytes {start}-{end}/{size}'
+
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()],
+        })
+        if scope.get('method') == 'HEAD' or count == 0:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+
+        if 'http.response.zerocopysend' in scope.get('extensions', {}):
+            with open(self.path, 'rb') as f:
+                await send({'type': 'http.response.zerocopysend', 'file': f, 'offset': start, 'count': count})
+            return
+
+        async with await anyio.open_file(self.path, 'rb') as f:
+            await f.seek(start)
+            remaining = count
+            while remaining:
+                chunk = await f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining:
+                # The file shrank underneath us; close the body rather than hang the client
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def _send_head(self, send: Send, status_code: int, headers: dict):
+        if status_code == 304:
+            headers = {k: v for k, v in headers.items() if k != 'content-type'}
+        else:
+            headers['content-length'] = '0'
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
@@ -1,12 +1,52 @@
-from ._openai import get_llm_chain, OpenAIEmbeddings
-from ._duckdb import duckdb_connection as localdb
-from ._chromadb import get_vector_store
+from ._duckdb import checkpoint, verify_document_ids
+from ._blobstore import BlobStore, get_blob_store, export_document_contents
+from ._repository import LocalRepository, ChatRow, ExchangeRow, DocumentRow, Page, ConcurrentUpdateError
+from ._sessions import SessionCache, ChatSession
+from ._invalidation import ChangeBoard
+from ._archive import archive_idle_chats, run_archiver
+from ._metrics import MetricsRegistry, metrics, timed, count_cache, ingested_chunks, requests_in_flight
+from ._tracing import Tracer, Span, tracer, current_span, debug_sampled
+from ._readiness import Readiness, readiness
+from ._admission import AdmissionControl, AdmissionPool, Overloaded, get_admission
+from ._caches import LRUCache
+from ._profiling import ProfileStore, SamplingProfiler, get_profile_store
+from ._providers import (
+    get_localdb, get_repository, get_sessions, get_scheduler, get_embeddings, get_vectorstore, get_retriever,
+    get_llm_chat, get_encoding, LLMChat,
+)
+from ._state_server import maintain_storage
 
 
-embeddings = OpenAIEmbeddings()
-vectorstore = get_vector_store(embeddings)
-retriever = vectorstore.as_retriever()
+# The shared instances are still reachable under their old names, but are only built when first used
+_LAZY = {
+    'localdb': get_localdb,
+    'repository': get_repository,
+    'sessions': get_sessions,
+    'scheduler': get_scheduler,
+    'embeddings': get_embeddings,
+    'vectorstore': get_vectorstore,
+    'retriever': get_retriever,
+    'llm_chat': get_llm_chat,
+    'blob_store': get_blob_store,
+}
 
-llm_chat = get_llm_chain(retriever=retriever)
 
-__all__ = ('localdb', 'llm_chat', 'retriever', 'vectorstore',)
+def __getattr__(name):
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+__all__ = (
+    'localdb', 'llm_chat', 'retriever', 'vectorstore', 'embeddings', 'scheduler', 'checkpoint', 'verify_document_ids',
+    'repository', 'LocalRepository', 'ChatRow', 'ExchangeRow', 'DocumentRow', 'Page', 'ConcurrentUpdateError',
+    'sessions', 'SessionCache', 'ChatSession', 'ChangeBoard', 'archive_idle_chats', 'run_archiver',
+    'maintain_storage',
+    'blob_store', 'BlobStore', 'export_document_contents',
+    'metrics', 'MetricsRegistry', 'timed', 'count_cache', 'ingested_chunks', 'requests_in_flight',
+    'tracer', 'Tracer', 'Span', 'current_span', 'debug_sampled',
+    'ProfileStore', 'SamplingProfiler', 'get_profile_store', 'Readiness', 'readiness', 'LRUCache',
+    'AdmissionControl', 'AdmissionPool', 'Overloaded', 'get_admission',
+    'get_localdb', 'get_repository', 'get_sessions', 'get_scheduler', 'get_embeddings', 'get_vectorstore',
+    'get_retriever', 'get_llm_chat', 'get_blob_store', 'get_encoding', 'LLMChat',
+)
@@ -0,0 +1,115 @@
+import os
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from time import perf_counter
+from typing import AsyncIterator, Deque, Optional
+
+import anyio
+
+from ._metrics import admission_active, admission_queued, admission_rejected, admission_wait
+from ._tracing import current_span
+
+
+# Chat turns: each holds a slot for its retrieval and LLM call
+ADMISSION_INTERACTIVE_LIMIT = int(os.getenv('ADMISSION_INTERACTIVE_LIMIT', '32'))
+ADMISSION_INTERACTIVE_QUEUE = int(os.getenv('ADMISSION_INTERACTIVE_QUEUE', '64'))
+# Uploads, which embed and index whole files
+ADMISSION_BULK_LIMIT = int(os.getenv('ADMISSION_BULK_LIMIT', '2'))
+ADMISSION_BULK_QUEUE = int(os.getenv('ADMISSION_BULK_QUEUE', '8'))
+
+
+class Overloaded(Exception):
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f'{pool} pool is full, retry after {retry_after}s')
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """
+    Lets at most ``limit`` requests run at once and up to ``queue_size`` more wait, first come first
+    served. Past that, requests are turned away immediately with ``Overloaded``: under a burst, fast
+    rejections keep latency bounded for the admitted ones, and the upstream limiter would refuse
+    their LLM calls anyway.
+
+    Used from one event loop, so the counters need no lock.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int):
+        self.name = name
+        self.limit = max(limit, 1)
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters: Deque[anyio.Event] = deque()
+        # Moving average of how long a slot is held, for the Retry-After estimate
+        self._hold_seconds = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        # Time for the queue ahead to drain through the slots, in whole seconds as the header wants
+        return max(1, math.ceil(self._hold_seconds * (self.queued + 1) / self.limit))
+
+    async def _acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            admission_rejected.labels(pool=self.name).inc()
+            raise Overloaded(self.name, self.retry_after())
+        event = anyio.Event()
+        self._waiters.append(event)
+        admission_queued.labels(pool=self.name).inc()
+        try:
+            await event.wait()
+        except BaseException:
+            # A slot handed over just as the request was cancelled goes to the next in line
+            if event.is_set():
+                self._release()
+            else:
+                self._waiters.remove(event)
+            raise
+        finally:
+            admission_queued.labels(pool=self.name).dec()
+
+    def _release(self):
+        if self._waiters:
+            # The slot passes straight to the oldest waiter, so the active count stays put
+            self._waiters.popleft().set()
+        else:
+            self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        started = perf_counter()
+        await self._acquire()
+        waited = perf_counter() - started
+        admission_wait.labels(pool=self.name).observe(waited)
+        current_span().set(admission_wait_ms=round(waited * 1000, 3))
+        admission_active.labels(pool=self.name).inc()
+        held_from = perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (perf_counter() - held_from)
+            admission_active.labels(pool=self.name).dec()
+            self._release()
+
+
+class AdmissionControl:
+    """Separate pools, so that a burst of uploads cannot starve chat turns of slots or the reverse."""
+
+    def __init__(self, interactive: Optional[AdmissionPool] = None, bulk: Optional[AdmissionPool] = None):
+        self.interactive = interactive or AdmissionPool(
+            'interactive', ADMISSION_INTERACTIVE_LIMIT, ADMISSION_INTERACTIVE_QUEUE
+        )
+        self.bulk = bulk or AdmissionPool('bulk', ADMISSION_BULK_LIMIT, ADMISSION_BULK_QUEUE)
+
+
+@lru_cache(maxsize=1)
+def get_admission() -> AdmissionControl:
+    return AdmissionControl()
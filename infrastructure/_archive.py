@@ -0,0 +1,137 @@
+import os
+import logging
+from uuid import uuid4
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import anyio
+import duckdb
+
+
+logger = logging.getLogger(__name__)
+
+CHAT_ARCHIVE_DIRECTORY = os.getenv('CHAT_ARCHIVE_DIRECTORY', os.path.join('db', 'archive'))
+CHAT_ARCHIVE_AFTER_DAYS = float(os.getenv('CHAT_ARCHIVE_AFTER_DAYS', '30'))
+CHAT_ARCHIVE_INTERVAL = float(os.getenv('CHAT_ARCHIVE_INTERVAL', '3600'))
+CHAT_ARCHIVE_BATCH = int(os.getenv('CHAT_ARCHIVE_BATCH', '1000'))
+
+# One row per exchange, with the chat's columns repeated; zstd folds the repetition away
+SQL_COLD_EXCHANGES = '''
+SELECT c.id AS id_chat, c.name, c.summary, c.version, c.last_active,
+       e.seq, e.id_exchange, e.id_query, e.content_query, e.id_response, e.content_response
+FROM chats c JOIN exchanges e ON e.id_chat = c.id
+WHERE c.id IN (SELECT id FROM cold_chats WHERE day = '{day}')
+ORDER BY c.id, e.seq
+'''
+
+
+def _quote(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+
+def archive_idle_chats(
+    connection: duckdb.DuckDBPyConnection,
+    directory: str = CHAT_ARCHIVE_DIRECTORY,
+    idle: timedelta = timedelta(days=CHAT_ARCHIVE_AFTER_DAYS),
+    batch: int = CHAT_ARCHIVE_BATCH,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Move chats idle for longer than ``idle`` out of the hot tables into zstd Parquet files.
+
+    Files are partitioned by the day the chat was last active, ``<directory>/date=YYYY-MM-DD/``,
+    and ``archived_chats`` keeps each chat's listing columns and the file that holds its turns.
+    """
+    cutoff = (now or datetime.now()) - idle
+    cursor = connection.cursor()
+    written: List[str] = []
+    try:
+        cursor.execute('BEGIN TRANSACTION')
+        cursor.execute(
+            "CREATE TEMP TABLE cold_chats AS "
+            "SELECT id, strftime(last_active, '%Y-%m-%d') AS day FROM chats "
+            "WHERE last_active < ? ORDER BY last_active LIMIT ?",
+            [cutoff, batch],
+        )
+        days = [row[0] for row in cursor.execute("SELECT DISTINCT day FROM cold_chats ORDER BY day").fetchall()]
+        for day in days:
+            partition = os.path.join(directory, f'date={day}')
+            os.makedirs(partition, exist_ok=True)
+            path = os.path.join(partition, f'chats-{uuid4().hex}.parquet')
+            cursor.execute(
+                f"COPY ({SQL_COLD_EXCHANGES.format(day=day)}) TO {_quote(path)} (FORMAT PARQUET, COMPRESSION ZSTD)"
+            )
+            written.append(path)
+            cursor.execute(
+                "INSERT INTO archived_chats (id, name, summary, version, last_active, path) "
+                "SELECT id, name, summary, version, last_active, ? FROM chats "
+                "WHERE id IN (SELECT id FROM cold_chats WHERE day = ?)",
+                [path, day],
+            )
+        cursor.execute("DELETE FROM exchanges WHERE id_chat IN (SELECT id FROM cold_chats)")
+        cursor.execute("DELETE FROM chats WHERE id IN (SELECT id FROM cold_chats)")
+        archived = cursor.execute("SELECT COUNT(*) FROM cold_chats").fetchone()[0]
+        cursor.execute("DROP TABLE cold_chats")
+        cursor.execute('COMMIT')
+        return archived
+    except Exception:
+        cursor.execute('ROLLBACK')
+        for path in written:
+            os.remove(path)
+        raise
+    finally:
+        cursor.close()
+
+
+def archived_path(cursor: duckdb.DuckDBPyConnection, id_chat: int) -> Optional[str]:
+    row = cursor.execute("SELECT path FROM archived_chats WHERE id = ?", [id_chat]).fetchone()
+    return row[0] if row is not None else None
+
+
+def rehydrate_chat(cursor: duckdb.DuckDBPyConnection, id_chat: int) -> bool:
+    """Move an archived chat back into the hot tables; runs inside the caller's transaction."""
+    path = archived_path(cursor, id_chat)
+    if path is None:
+        return False
+    cursor.execute(
+        "INSERT INTO chats (id, name, summary, version, last_active) "
+        "SELECT id, name, summary, version, last_active FROM archived_chats WHERE id = ?",
+        [id_chat],
+    )
+    cursor.execute(
+        "INSERT INTO exchanges (id_chat, seq, id_exchange, id_query, content_query, id_response, content_response) "
+        "SELECT id_chat, seq, id_exchange, id_query, content_query, id_response, content_response "
+        "FROM read_parquet(?) WHERE id_chat = ?",
+        [path, id_chat],
+    )
+    cursor.execute("DELETE FROM archived_chats WHERE id = ?", [id_chat])
+    return True
+
+
+def prune_archive(connection: duckdb.DuckDBPyConnection, directory: str = CHAT_ARCHIVE_DIRECTORY) -> int:
+    """Delete archive files none of whose chats are still archived."""
+    cursor = connection.cursor()
+    try:
+        referenced = {row[0] for row in cursor.execute("SELECT DISTINCT path FROM archived_chats").fetchall()}
+    finally:
+        cursor.close()
+    removed = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith('.parquet') and path not in referenced:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+async def run_archiver(connection: duckdb.DuckDBPyConnection, interval: float = CHAT_ARCHIVE_INTERVAL):
+    while True:
+        await anyio.sleep(interval)
+        try:
+            archived = await anyio.to_thread.run_sync(archive_idle_chats, connection)
+            if archived:
+                logger.info('Archived %d idle chats', archived)
+            await anyio.to_thread.run_sync(prune_archive, connection)
+        except Exception:
+            logger.exception('Archiving idle chats failed')
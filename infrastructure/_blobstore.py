@@ -0,0 +1,96 @@
+import os
+import hashlib
+import tempfile
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import BinaryIO
+
+import duckdb
+
+
+BLOB_DIRECTORY = os.getenv('BLOB_DIRECTORY', os.path.join('uploads', 'blobs'))
+BLOB_COPY_CHUNK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class StagedBlob:
+    path: str
+    digest: str
+    size: int
+
+
+class BlobStore:
+    """
+    Content-addressed files under ``<root>/<sha256[:2]>/<sha256>``.
+
+    Identical uploads land on the same path, so a duplicate costs no extra disk. Files are written
+    to a staging area first and moved into place atomically once their hash is known.
+    """
+
+    def __init__(self, root: str = BLOB_DIRECTORY):
+        self.root = root
+        self.staging = os.path.join(root, 'staging')
+        os.makedirs(self.staging, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def stage(self, source: BinaryIO, suffix: str = '') -> StagedBlob:
+        # Hash while copying so the upload is read exactly once; the suffix lets loaders pick a parser
+        sha, size = hashlib.sha256(), 0
+        with tempfile.NamedTemporaryFile('wb', dir=self.staging, suffix=suffix, delete=False) as out:
+            while chunk := source.read(BLOB_COPY_CHUNK_SIZE):
+                sha.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        return StagedBlob(out.name, sha.hexdigest(), size)
+
+    def commit(self, staged: StagedBlob) -> str:
+        target = self.path(staged.digest)
+        if os.path.exists(target):
+            os.remove(staged.path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(staged.path, target)
+        return target
+
+    def discard(self, staged: StagedBlob):
+        if os.path.exists(staged.path):
+            os.remove(staged.path)
+
+    def put_bytes(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with tempfile.NamedTemporaryFile('wb', dir=self.staging, delete=False) as out:
+                out.write(data)
+            os.replace(out.name, target)
+        return digest
+
+
+def export_document_contents(connection: duckdb.DuckDBPyConnection, store: BlobStore) -> int:
+    """Move contents still held as BLOBs in ``documents`` into the blob store, one file at a time."""
+    cursor = connection.cursor()
+    try:
+        moved = 0
+        while True:
+            row = cursor.execute(
+                "SELECT hash, any_value(contents) FROM documents WHERE contents IS NOT NULL GROUP BY hash LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return moved
+            digest, contents = row
+            store.put_bytes(contents)
+            cursor.execute("UPDATE documents SET contents = NULL WHERE hash = ?", [digest])
+            moved += 1
+    finally:
+        cursor.close()
+
+
+@lru_cache(maxsize=None)
+def get_blob_store() -> BlobStore:
+    return BlobStore()
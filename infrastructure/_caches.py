@@ -0,0 +1,51 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+from ._metrics import count_cache
+
+
+# Query embeddings, keyed by the query text
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '4096'))
+# Completions of deterministic (temperature 0) prompts, keyed by the full prompt
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '1024'))
+
+V = TypeVar('V')
+
+
+class LRUCache(Generic[V]):
+    """A thread-safe LRU map reporting its hits and misses under ``cache_requests_total{cache=name}``."""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, V]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        count_cache(self.name, value is not None)
+        return value
+
+    def put(self, key: Hashable, value: V):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
@@ -1,10 +1,20 @@
+import os
+from urllib.parse import urlsplit
+
 from langchain_chroma import Chroma
 
 
 PERSIST_DIRECTORY = 'db'
+# A Chroma server shared by all workers, which then serializes their writes; the embedded store otherwise
+CHROMA_SERVER_URL = os.getenv('CHROMA_SERVER_URL')
 
 
 def get_vector_store(embeddings):
+    if CHROMA_SERVER_URL:
+        import chromadb
+        url = urlsplit(CHROMA_SERVER_URL)
+        client = chromadb.HttpClient(host=url.hostname, port=url.port or 8000, ssl=url.scheme == 'https')
+        return Chroma(client=client, embedding_function=embeddings)
     vectordb = Chroma(
         persist_directory=PERSIST_DIRECTORY,
         embedding_function=embeddings
@@ -1,21 +1,157 @@
+import os
+import logging
+from dataclasses import dataclass
+
 import duckdb
 
 
-duckdb_connection = duckdb.connect(':memory:', read_only=False)
-duckdb_connection.execute(
-    '''
-    CREATE TABLE IF NOT EXISTS chats (
-        id BIGINT PRIMARY KEY,
+logger = logging.getLogger(__name__)
+
+# ':memory:' keeps the previous throwaway behaviour; a file path makes chats and uploads survive restarts
+DUCKDB_DATABASE = os.getenv('DUCKDB_DATABASE', ':memory:')
+# WAL size that triggers an automatic checkpoint; small values keep restart replay short
+DUCKDB_CHECKPOINT_THRESHOLD = os.getenv('DUCKDB_CHECKPOINT_THRESHOLD', '16MB')
+DUCKDB_MEMORY_LIMIT = os.getenv('DUCKDB_MEMORY_LIMIT')
+DUCKDB_THREADS = os.getenv('DUCKDB_THREADS')
+VERIFY_PAGE_SIZE = int(os.getenv('DUCKDB_VERIFY_PAGE_SIZE', '100000'))
+
+
+def create_schema(connection: duckdb.DuckDBPyConnection):
+    connection.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS chats (
+            id BIGINT PRIMARY KEY,
+            name VARCHAR,
+            summary VARCHAR,
+            version BIGINT DEFAULT 0,
+            last_active TIMESTAMP DEFAULT current_localtimestamp()
+        )
+        '''
+    )
+    # Bumped on every write to the chat, so rendered responses can be cached per version
+    connection.execute('ALTER TABLE chats ADD COLUMN IF NOT EXISTS version BIGINT DEFAULT 0')
+    connection.execute('ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_active TIMESTAMP DEFAULT current_localtimestamp()')
+    # Chats moved to Parquet by the archiver: their listing columns and the file holding their turns
+    connection.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS archived_chats (
+            id BIGINT PRIMARY KEY,
+            name VARCHAR,
+            summary VARCHAR,
+            version BIGINT,
+            last_active TIMESTAMP,
+            path VARCHAR
+        )
+        '''
+    )
+    # One row per turn, appended in order; history reads are a range scan over (id_chat, seq)
+    connection.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS exchanges (
+            id_chat BIGINT,
+            seq BIGINT,
+            id_exchange UBIGINT,
+            id_query BIGINT,
+            content_query VARCHAR,
+            id_response UBIGINT,
+            content_response VARCHAR,
+            PRIMARY KEY (id_chat, seq)
+        )
+        '''
+    )
+    connection.execute('''
+    CREATE TABLE IF NOT EXISTS documents (
+        id VARCHAR PRIMARY KEY,
         name VARCHAR,
-        summary VARCHAR,
-        history VARCHAR
+        size BIGINT,
+        hash VARCHAR,
+        -- Files now live in the blob store under their hash; only older databases still hold BLOBs here
+        contents BLOB
+    )
+    ''')
+    # Databases created before listings became metadata-only get the columns added and backfilled
+    connection.execute('ALTER TABLE documents ADD COLUMN IF NOT EXISTS size BIGINT')
+    connection.execute('ALTER TABLE documents ADD COLUMN IF NOT EXISTS hash VARCHAR')
+    connection.execute(
+        'UPDATE documents SET size = octet_length(contents), hash = sha256(contents) '
+        'WHERE hash IS NULL AND contents IS NOT NULL'
     )
-    '''
-)
-duckdb_connection.execute('''
-CREATE TABLE IF NOT EXISTS documents (
-    id VARCHAR PRIMARY KEY,
-    name VARCHAR,
-    contents BLOB
-)
-''')
+    # New chat ids; databases that predate the sequence start it past every id already used
+    start = connection.execute(
+        'SELECT COALESCE(MAX(id) + 1, 0) FROM (SELECT id FROM chats UNION ALL SELECT id FROM archived_chats)'
+    ).fetchone()[0]
+    connection.execute(f'CREATE SEQUENCE IF NOT EXISTS chat_ids START WITH {int(start)} MINVALUE 0')
+
+
+def connect(database: str = DUCKDB_DATABASE) -> duckdb.DuckDBPyConnection:
+    config = {'checkpoint_threshold': DUCKDB_CHECKPOINT_THRESHOLD}
+    if DUCKDB_MEMORY_LIMIT:
+        config['memory_limit'] = DUCKDB_MEMORY_LIMIT
+    if DUCKDB_THREADS:
+        config['threads'] = int(DUCKDB_THREADS)
+    if database != ':memory:' and os.path.dirname(database):
+        os.makedirs(os.path.dirname(database), exist_ok=True)
+    connection = duckdb.connect(database, read_only=False, config=config)
+    create_schema(connection)
+    return connection
+
+
+def checkpoint(connection: duckdb.DuckDBPyConnection):
+    # Folding the WAL into the database file on shutdown leaves nothing to replay on the next start
+    connection.execute('CHECKPOINT')
+
+
+@dataclass
+class ConsistencyReport:
+    documents: int
+    vectors: int
+    missing_in_vectorstore: int
+    missing_in_duckdb: int
+
+    @property
+    def consistent(self) -> bool:
+        return not self.missing_in_vectorstore and not self.missing_in_duckdb
+
+
+def verify_document_ids(
+    connection: duckdb.DuckDBPyConnection, vectorstore, page_size: int = VERIFY_PAGE_SIZE, prune: bool = False
+) -> ConsistencyReport:
+    """
+    Compare the chunk ids in ``documents`` with the ids held by the vector store.
+
+    Vector ids are paged out of the store and bulk-loaded into a temporary table, so the comparison
+    is two anti-joins inside DuckDB rather than per-id lookups. With ``prune`` the rows whose chunks
+    no longer exist in the vector store are deleted.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute('CREATE OR REPLACE TEMP TABLE vector_ids (id VARCHAR)')
+        offset = 0
+        while True:
+            ids = vectorstore.get(include=[], limit=page_size, offset=offset)['ids']
+            if ids:
+                cursor.execute('INSERT INTO vector_ids SELECT unnest(?)', [ids])
+            if len(ids) < page_size:
+                break
+            offset += page_size
+
+        documents, vectors = cursor.execute(
+            'SELECT (SELECT COUNT(*) FROM documents), (SELECT COUNT(*) FROM vector_ids)'
+        ).fetchone()
+        missing_in_vectorstore = cursor.execute(
+            'SELECT COUNT(*) FROM documents ANTI JOIN vector_ids USING (id)'
+        ).fetchone()[0]
+        missing_in_duckdb = cursor.execute(
+            'SELECT COUNT(*) FROM vector_ids ANTI JOIN documents USING (id)'
+        ).fetchone()[0]
+        if prune and missing_in_vectorstore:
+            cursor.execute('DELETE FROM documents WHERE id NOT IN (SELECT id FROM vector_ids)')
+        cursor.execute('DROP TABLE vector_ids')
+    finally:
+        cursor.close()
+
+    report = ConsistencyReport(documents, vectors, missing_in_vectorstore, missing_in_duckdb)
+    if not report.consistent:
+        logger.warning('DuckDB and vector store disagree: %s', report)
+    return report
+
@@ -0,0 +1,59 @@
+import os
+import mmap
+import fcntl
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+# Every worker process of a host maps the same file
+CACHE_SIGNAL_PATH = os.getenv('CACHE_SIGNAL_PATH', os.path.join(tempfile.gettempdir(), 'convfinqa-cache-signal'))
+CACHE_SIGNAL_SLOTS = int(os.getenv('CACHE_SIGNAL_SLOTS', '65536'))
+
+_SLOT = struct.Struct('<Q')
+
+
+class ChangeBoard:
+    """
+    Per-chat change counters in a memory-mapped file shared by the worker processes of one host.
+
+    A writer bumps the chat's counter once its change is committed; a reader compares the counter
+    with the value it cached the chat under, which costs a memory read and no round trip. Chats
+    share counters by id modulo the slot count, so a collision only costs a needless reload.
+    """
+
+    def __init__(self, path: str = CACHE_SIGNAL_PATH, slots: int = CACHE_SIGNAL_SLOTS):
+        self.path = path
+        self.slots = slots
+        size = slots * _SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        # flock excludes other processes only; threads of this one take this lock as well
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def stamp(self, key: int) -> int:
+        return _SLOT.unpack_from(self._map, (key % self.slots) * _SLOT.size)[0]
+
+    def bump(self, key: int) -> int:
+        offset = (key % self.slots) * _SLOT.size
+        with self._lock, self._locked():
+            value = _SLOT.unpack_from(self._map, offset)[0] + 1
+            _SLOT.pack_into(self._map, offset, value)
+        return value
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
@@ -0,0 +1,212 @@
+import bisect
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from ._tracing import current_span, tracer
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self):
+        for key, child in sorted(self._children.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+
+class _Buckets:
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def _samples(self):
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound))
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(child.sum)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}'
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Registering the same name again hands back the existing metric, so modules can be re-imported
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics: List[_Metric] = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    'stage_duration_seconds', 'Time spent in each stage of an operation', ('operation', 'stage')
+)
+llm_tokens = metrics.counter('llm_tokens_total', 'Tokens reported by the LLM', ('model', 'kind'))
+embedding_requests = metrics.counter('embedding_requests_total', 'Calls to the embeddings API', ('kind',))
+cache_requests = metrics.counter('cache_requests_total', 'Lookups in in-process caches', ('cache', 'result'))
+ingested_chunks = metrics.counter('ingested_chunks_total', 'Chunks added to the vector store')
+requests_in_flight = metrics.gauge('http_requests_in_flight', 'HTTP requests being served', ('method',))
+scheduler_queue_depth = metrics.gauge(
+    'llm_scheduler_queue_depth', 'OpenAI calls waiting for rate limit capacity', ('priority',)
+)
+scheduler_wait = metrics.histogram(
+    'llm_scheduler_wait_seconds', 'Time OpenAI calls waited for rate limit capacity', ('priority',)
+)
+admission_wait = metrics.histogram(
+    'admission_queue_wait_seconds', 'Time requests waited for a slot in their admission pool', ('pool',)
+)
+admission_queued = metrics.gauge('admission_queue_depth', 'Requests waiting for a slot', ('pool',))
+admission_active = metrics.gauge('admission_active', 'Requests holding a slot', ('pool',))
+admission_rejected = metrics.counter('admission_rejected_total', 'Requests turned away with 429', ('pool',))
+
+
+@contextmanager
+def timed(operation: str, stage: str):
+    """Record the enclosed block under ``stage_duration_seconds`` and as a span of the current trace."""
+    with tracer.span(f'{operation}.{stage}') as span:
+        with stage_seconds.labels(operation=operation, stage=stage).time():
+            yield span
+
+
+def count_cache(cache: str, hit: bool):
+    cache_requests.labels(cache=cache, result='hit' if hit else 'miss').inc()
+    current_span().set(**{f'{cache}_cache_hit': hit})
@@ -1,6 +1,10 @@
+import os
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.chat_models import ChatOllama
 
 
-ollama_chat = ChatOllama(base_url='http://172.235.38.66:8080', model='llama3-chatqa')
-ollama_embeddings = OllamaEmbeddings(model='llama3-chatqa', base_url='http://172.235.38.66:8080', show_progress=True)
+OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3-chatqa')
+
+ollama_chat = ChatOllama(base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL)
+ollama_embeddings = OllamaEmbeddings(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, show_progress=True)
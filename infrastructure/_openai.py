@@ -1,23 +1,124 @@
 import os
-from typing import List
+from copy import deepcopy
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
 
-from langchain.chains import ConversationalRetrievalChain
 from langchain.vectorstores.base import VectorStoreRetriever
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage, AIMessage
+from langchain.schema import BaseMessage, HumanMessage
 
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 
+from ._scheduler import (
+    COMPLETION_TOKENS_ESTIMATE,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    estimate_tokens,
+    get_http_client,
+    get_scheduler,
+)
+from ._caches import ANSWER_CACHE_SIZE, EMBEDDING_CACHE_SIZE, LRUCache
+from ._prompt import PromptBuilder
+from ._metrics import embedding_requests, timed
+from ._tracing import current_span
+from ._routing import MODEL_LADDER, ModelRouter, ModelTier, parse_ladder
+
 load_dotenv()
-openai_api_key=os.getenv('OPENAI_API_KEY')
+# Single switch that points every chat and embedding client at the local stand-in server
+LLM_STANDIN_URL = os.getenv('LLM_STANDIN_URL')
+openai_api_key=os.getenv('OPENAI_API_KEY') or ('standin' if LLM_STANDIN_URL else None)
+
+
+def _client_kwargs() -> dict:
+    return {'openai_api_base': LLM_STANDIN_URL} if LLM_STANDIN_URL else {}
+
+
+class ScheduledEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, scheduler: RequestScheduler):
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+        self.queries: LRUCache[Tuple[float, ...]] = LRUCache('embeddings', EMBEDDING_CACHE_SIZE)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for batch, tokens in self._batches(texts):
+            embedding_requests.labels(kind='documents').inc()
+            with timed('embedding', 'documents'):
+                vectors.extend(self.scheduler.submit(
+                    self.embeddings.embed_documents, batch, tokens=tokens, priority=PRIORITY_BULK
+                ))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.queries.get(text)
+        if cached is not None:
+            return list(cached)
+        embedding_requests.labels(kind='query').inc()
+        with timed('embedding', 'query'):
+            vector = self.scheduler.submit(
+                self.embeddings.embed_query, text, tokens=estimate_tokens([text]), priority=PRIORITY_INTERACTIVE
+            )
+        self.queries.put(text, tuple(vector))
+        return vector
+
+    def _batches(self, texts: List[str]):
+        # Split so that no single request asks for more tokens than the bucket can ever hold
+        batch, batch_tokens = [], 0
+        for text in texts:
+            tokens = estimate_tokens([text])
+            if batch and batch_tokens + tokens > self.scheduler.max_request_tokens:
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+
+def get_embeddings(scheduler: Optional[RequestScheduler] = None) -> ScheduledEmbeddings:
+    # The stand-in takes raw strings, which also spares tiktoken a download of its BPE files
+    stand_in = {'check_embedding_ctx_length': False, 'openai_api_key': openai_api_key} if LLM_STANDIN_URL else {}
+    embeddings = OpenAIEmbeddings(http_client=get_http_client(), max_retries=0, **stand_in, **_client_kwargs())
+    return ScheduledEmbeddings(embeddings, scheduler or get_scheduler())
+
+
+DEFAULT_INSTRUCTIONS = "You are a helpful assistant. Use the conversation so far and the retrieved context to answer the user's question."
 
 
 class MessageAwareRAG:
-    def __init__(self, retriever: VectorStoreRetriever, openai_api_key: str, model_name: str = "gpt-4", temperature: float = 0.0):
-        self.llm = ChatOpenAI(openai_api_key=openai_api_key, model_name=model_name, temperature=temperature)
+    def __init__(
+        self,
+        retriever: VectorStoreRetriever,
+        openai_api_key: str,
+        model_name: str = "gpt-4",
+        temperature: float = 0.0,
+        scheduler: Optional[RequestScheduler] = None,
+        router: Optional[ModelRouter] = None,
+        prompt_builder: Optional[PromptBuilder] = None,
+    ):
+        self.llm = ChatOpenAI(
+            openai_api_key=openai_api_key,
+            model_name=model_name,
+            temperature=temperature,
+            http_client=get_http_client(),
+            max_retries=0,
+            **_client_kwargs(),
+        )
         self.retriever = retriever
-
-    def invoke(self, messages: List[BaseMessage]):
+        self.scheduler = scheduler
+        self.router = router
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        # Only a deterministic model gives the same answer to the same prompt
+        self.answers = LRUCache('answers', ANSWER_CACHE_SIZE if temperature == 0 else 0)
+
+    def invoke(
+        self,
+        messages: List[BaseMessage],
+        instructions: Optional[str] = None,
+        context: Optional[str] = None,
+        summary: str = '',
+    ):
         history = messages[:-1]
         query_msg = messages[-1] # the current HumanMessage
 
@@ -25,33 +126,65 @@ class MessageAwareRAG:
             raise ValueError(
                 "Last message must be a HumanMessage representing the current user query.")
 
-        history_str = ""
-        for msg in history:
-            if isinstance(msg, HumanMessage):
-                history_str += f"User: {msg.content}\n"
-            elif isinstance(msg, AIMessage):
-                history_str += f"Assistant: {msg.content}\n"
-
-        docs = self.retriever.get_relevant_documents(query_msg.content)
-        context = "\n".join(doc.page_content for doc in docs)
-
-        system_prompt = SystemMessage(content=f"""You are a helpful assistant. Use the conversation history and the retrieved context to answer the user's question.
-
-    Conversation History:
-    {history_str}
-
-    Context:
-    {context}
-    """)
-
-        final_messages = [
-            system_prompt,
-            query_msg
-        ]
-
-        return self.llm.invoke(final_messages)
+        if context is None:
+            docs = self.retriever.get_relevant_documents(query_msg.content)
+            context = "\n".join(doc.page_content for doc in docs)
+
+        with timed('chain', 'build_prompt'):
+            final_messages, breakdown = self.prompt_builder.build(
+                instructions=instructions or DEFAULT_INSTRUCTIONS,
+                history=history,
+                context=context,
+                query=query_msg,
+                summary=summary,
+            )
+
+        key = tuple((msg.type, msg.content) for msg in final_messages)
+        response = self.answers.get(key)
+        if response is not None:
+            response = deepcopy(response)
+        else:
+            with timed('chain', 'complete'):
+                response = self._complete(final_messages, query_msg.content, context)
+            self.answers.put(key, deepcopy(response))
+        response.response_metadata['prompt_breakdown'] = breakdown.as_dict()
+        current_span().set(prompt_tokens=breakdown.total)
+        return response
+
+    def _complete(self, final_messages: List[BaseMessage], question: str, context: str):
+        if self.router is not None:
+            return self.router.invoke(final_messages, question=question, context=context)
+
+        if self.scheduler is None:
+            return self.llm.invoke(final_messages)
+
+        tokens = estimate_tokens(msg.content for msg in final_messages) + COMPLETION_TOKENS_ESTIMATE
+        return self.scheduler.submit(
+            self.llm.invoke, final_messages, tokens=tokens, priority=PRIORITY_INTERACTIVE
+        )
+
+
+def get_router(scheduler: Optional[RequestScheduler] = None, temperature: float = 0.0) -> ModelRouter:
+    def llm_factory(tier: ModelTier) -> ChatOpenAI:
+        return ChatOpenAI(
+            openai_api_key=openai_api_key,
+            model_name=tier.model_name,
+            temperature=temperature,
+            http_client=get_http_client(),
+            request_timeout=router.request_timeout(tier),
+            max_retries=0,
+            **_client_kwargs(),
+        )
+    router = ModelRouter(parse_ladder(MODEL_LADDER), llm_factory=llm_factory, scheduler=scheduler)
+    return router
 
 
 # Your new get_llm_chain
 def get_llm_chain(retriever):
-    return MessageAwareRAG(retriever=retriever, openai_api_key=openai_api_key)
+    scheduler = get_scheduler()
+    return MessageAwareRAG(
+        retriever=retriever,
+        openai_api_key=openai_api_key,
+        scheduler=scheduler,
+        router=get_router(scheduler),
+    )
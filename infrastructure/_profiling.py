@@ -0,0 +1,156 @@
+import os
+import re
+import sys
+import threading
+from time import time
+from uuid import uuid4
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+
+# Profiling is off unless an admin token is configured
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+PROFILE_DIRECTORY = os.getenv('PROFILE_DIRECTORY', 'profiles')
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+
+PROFILE_NAME_PATTERN = re.compile(r'^[\w.-]+\.folded$')
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread at a fixed interval.
+
+    Unlike cProfile, which only sees the thread that enabled it, this also covers the worker
+    threads that run LLM calls and DuckDB queries. Stacks are counted in collapsed form
+    (``thread;outer;...;inner``), the input format of flame graph tools.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+class ProfileInfo(NamedTuple):
+    name: str
+    size: int
+    created: float
+
+
+class ProfileStore:
+    """
+    Collapsed-stack profiles on disk, keeping only the newest ``max_files``.
+
+    One request is profiled at a time; the sampler sees the whole process, so requests served
+    concurrently with a profiled one show up in its profile too.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIRECTORY, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self._busy = threading.Lock()
+
+    def start(self, interval: float = PROFILE_INTERVAL) -> Optional[SamplingProfiler]:
+        """A running profiler, or None while another request is being profiled."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        return profiler
+
+    def new_name(self, label: str) -> str:
+        slug = re.sub(r'[^\w-]+', '-', label).strip('-')[:60]
+        return f'{int(time() * 1000)}-{slug}-{uuid4().hex[:8]}.folded'
+
+    def stop(self, profiler: SamplingProfiler, name: str) -> str:
+        try:
+            samples = profiler.stop()
+        finally:
+            self._busy.release()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        self._prune()
+        return name
+
+    def list(self) -> List[ProfileInfo]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if PROFILE_NAME_PATTERN.match(name):
+                stat = os.stat(os.path.join(self.directory, name))
+                profiles.append(ProfileInfo(name, stat.st_size, stat.st_mtime))
+        # Names start with the creation time in milliseconds
+        return sorted(profiles, key=lambda info: info.name, reverse=True)
+
+    def path(self, name: str) -> Optional[str]:
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def summary(self, name: str, limit: int = 30) -> Optional[Dict[str, List]]:
+        """Functions with the most samples, on top of the stack (self) and anywhere in it (total)."""
+        path = self.path(name)
+        if path is None:
+            return None
+        own, total, samples = Counter(), Counter(), 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                frames, count = stack.split(';')[1:], int(count)
+                samples += count
+                if frames:
+                    own[frames[-1]] += count
+                for frame in set(frames):
+                    total[frame] += count
+        return {
+            'samples': samples,
+            'self': own.most_common(limit),
+            'total': total.most_common(limit),
+        }
+
+    def _prune(self):
+        for info in self.list()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, info.name))
+            except FileNotFoundError:
+                pass
+
+
+@lru_cache(maxsize=1)
+def get_profile_store() -> ProfileStore:
+    return ProfileStore()
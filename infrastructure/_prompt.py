@@ -0,0 +1,135 @@
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from ._scheduler import get_encoding, estimate_tokens
+
+
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '6000'))
+# Guaranteed share of the budget per segment; whatever a segment leaves unused flows to history and context
+PROMPT_BUDGET_SHARES = {'instructions': 0.10, 'summary': 0.10, 'history': 0.40, 'context': 0.40}
+# History is trimmed by whole blocks of exchanges so the kept prefix stays identical for several turns
+HISTORY_TRIM_BLOCK = int(os.getenv('PROMPT_HISTORY_TRIM_BLOCK', '4'))
+# Per-message overhead of the chat format (role markers and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@dataclass
+class PromptBreakdown:
+    instructions: int = 0
+    summary: int = 0
+    history: int = 0
+    context: int = 0
+    query: int = 0
+    dropped_exchanges: int = 0
+    context_truncated: bool = False
+
+    @property
+    def total(self) -> int:
+        return self.instructions + self.summary + self.history + self.context + self.query
+
+    def as_dict(self) -> Dict[str, int]:
+        return {**asdict(self), 'total': self.total}
+
+
+class PromptBuilder:
+    """
+    Assembles the chat prompt within a fixed token budget.
+
+    Segments are laid out from most to least stable -- instructions, summary, history, retrieved
+    context, query -- so consecutive turns of a chat share a byte-identical prefix that providers
+    can serve from their prompt cache.
+    """
+
+    def __init__(
+        self,
+        budget: int = PROMPT_TOKEN_BUDGET,
+        shares: Optional[Dict[str, float]] = None,
+        trim_block: int = HISTORY_TRIM_BLOCK,
+        encoding_name: str = 'cl100k_base',
+    ):
+        self.budget = budget
+        self.shares = shares or PROMPT_BUDGET_SHARES
+        self.trim_block = max(1, trim_block)
+        self.encoding_name = encoding_name
+
+    def count(self, text: str) -> int:
+        return estimate_tokens([text], self.encoding_name) + MESSAGE_OVERHEAD_TOKENS
+
+    def truncate(self, text: str, tokens: int) -> str:
+        limit = max(0, tokens - MESSAGE_OVERHEAD_TOKENS)
+        encoding = get_encoding(self.encoding_name)
+        if encoding is None:
+            # Mirror the ``len // 4 + 1`` estimate used when tiktoken is unavailable
+            return text[:max(0, limit - 1) * 4]
+        encoded = encoding.encode(text, disallowed_special=())
+        truncated = encoding.decode(encoded[:limit])
+        # Decoding a cut can merge into different tokens, so re-check against the budget
+        while limit > 0 and self.count(truncated) > tokens:
+            limit -= 1
+            truncated = encoding.decode(encoded[:limit])
+        return truncated
+
+    def build(
+        self,
+        instructions: str,
+        history: List[BaseMessage],
+        context: str,
+        query: HumanMessage,
+        summary: str = '',
+    ) -> Tuple[List[BaseMessage], PromptBreakdown]:
+        breakdown = PromptBreakdown()
+
+        instructions = self._fit(instructions, self._share('instructions'))
+        breakdown.instructions = self.count(instructions)
+        messages: List[BaseMessage] = [SystemMessage(content=instructions)]
+
+        if summary:
+            summary = self._fit(f"Conversation summary:\n{summary}", self._share('summary'))
+            breakdown.summary = self.count(summary)
+            messages.append(SystemMessage(content=summary))
+
+        breakdown.query = self.count(query.content)
+        remaining = self.budget - breakdown.instructions - breakdown.summary - breakdown.query
+
+        # History takes whatever the context does not need, but only its own share when the context needs
+        # the room, and never what the context's share reserves when a long query leaves less than both
+        context_text = f"Context:\n{context}" if context else ''
+        context_tokens = self.count(context_text) if context_text else 0
+        context_reserve = min(context_tokens, self._share('context'))
+        history_budget = max(0, min(
+            max(self._share('history'), remaining - context_tokens), remaining - context_reserve
+        ))
+        kept, breakdown.dropped_exchanges = self._trim_history(
+            [msg for msg in history if isinstance(msg, (HumanMessage, AIMessage))], history_budget
+        )
+        breakdown.history = sum(self.count(msg.content) for msg in kept)
+        messages.extend(kept)
+
+        if context_text:
+            context_budget = max(0, remaining - breakdown.history)
+            if context_tokens > context_budget:
+                context_text = self.truncate(context_text, context_budget)
+                breakdown.context_truncated = True
+            if context_text:
+                breakdown.context = self.count(context_text)
+                messages.append(SystemMessage(content=context_text))
+
+        messages.append(query)
+        return messages, breakdown
+
+    def _share(self, segment: str) -> int:
+        return int(self.budget * self.shares.get(segment, 0.0))
+
+    def _fit(self, text: str, tokens: int) -> str:
+        return text if self.count(text) <= tokens else self.truncate(text, tokens)
+
+    def _trim_history(self, history: List[BaseMessage], tokens: int) -> Tuple[List[BaseMessage], int]:
+        costs = [self.count(msg.content) for msg in history]
+        block = 2 * self.trim_block
+        start = 0
+        while start < len(history) and sum(costs[start:]) > tokens:
+            start = min(len(history), start + block)
+        return history[start:], start // 2
@@ -0,0 +1,92 @@
+import os
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, List, Optional, Protocol
+
+import duckdb
+
+from ._duckdb import connect, verify_document_ids
+from ._invalidation import ChangeBoard
+from ._repository import LocalRepository
+from ._sessions import SessionCache
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from ._routing import ModelRouter
+
+
+# Each shared component is built on first use and then reused; FastAPI endpoints receive them
+# through ``Depends``, so tests swap them with ``app.dependency_overrides``. The heavy clients
+# (OpenAI, embeddings, Chroma, the chain) are only imported when first asked for.
+
+# Set when several worker processes share one database through the state server
+STATE_SERVER_URL = os.getenv('STATE_SERVER_URL')
+
+
+@lru_cache(maxsize=1)
+def get_localdb() -> duckdb.DuckDBPyConnection:
+    return connect()
+
+
+@lru_cache(maxsize=1)
+def get_repository() -> LocalRepository:
+    if STATE_SERVER_URL:
+        from ._remote_repository import RemoteRepository
+        return RemoteRepository(STATE_SERVER_URL)
+    return LocalRepository(get_localdb())
+
+
+@lru_cache(maxsize=1)
+def get_sessions() -> SessionCache:
+    # Other workers change chats too, so cached ones are checked against the host's change board
+    return SessionCache(get_repository(), board=ChangeBoard() if STATE_SERVER_URL else None)
+
+
+def get_scheduler():
+    from ._scheduler import get_scheduler as build_scheduler
+    return build_scheduler()
+
+
+def get_encoding(encoding_name: str = 'cl100k_base'):
+    from ._scheduler import get_encoding as load_encoding
+    return load_encoding(encoding_name)
+
+
+@lru_cache(maxsize=1)
+def get_embeddings():
+    from ._openai import get_embeddings as build_embeddings
+    return build_embeddings(get_scheduler())
+
+
+@lru_cache(maxsize=1)
+def get_vectorstore():
+    from ._chromadb import get_vector_store
+    vectorstore = get_vector_store(get_embeddings())
+    if not STATE_SERVER_URL:
+        # The process that owns the database checks it against the store once something needs the store,
+        # in the background since paging every id out of a large store takes a while
+        threading.Thread(target=verify_document_ids, args=(get_localdb(), vectorstore), daemon=True).start()
+    return vectorstore
+
+
+@lru_cache(maxsize=1)
+def get_retriever():
+    return get_vectorstore().as_retriever()
+
+
+class LLMChat(Protocol):
+    """The chat chain as its users see it, without importing ``MessageAwareRAG`` and its OpenAI clients."""
+
+    router: Optional['ModelRouter']
+
+    def invoke(
+        self, messages: List['BaseMessage'], instructions: Optional[str] = None, context: Optional[str] = None,
+        summary: str = '',
+    ) -> Any:
+        ...
+
+
+@lru_cache(maxsize=1)
+def get_llm_chat() -> LLMChat:
+    from ._openai import get_llm_chain
+    return get_llm_chain(retriever=get_retriever())
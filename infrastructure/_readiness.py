@@ -0,0 +1,54 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Progress of the startup warmup, for the readiness probe.
+
+    Each step records how long it took and whether it failed. A failed step is logged and
+    skipped: a cold cache is slow, not broken, so it must not keep the process out of rotation.
+    """
+
+    def __init__(self):
+        self._ready = threading.Event()
+        self._steps: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        record: Dict[str, Any] = {'name': name, 'status': 'running'}
+        with self._lock:
+            self._steps.append(record)
+        started = time.perf_counter()
+        try:
+            yield
+            record['status'] = 'done'
+        except Exception as e:
+            logger.warning('Warmup step %s failed: %r', name, e)
+            record.update(status='failed', error=repr(e))
+        record['seconds'] = round(time.perf_counter() - started, 3)
+
+    def mark_ready(self):
+        self._ready.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = [dict(record) for record in self._steps]
+        return {'ready': self.ready, 'steps': steps}
+
+
+readiness = Readiness()
@@ -0,0 +1,77 @@
+import os
+from typing import Any, List, Optional, Tuple
+
+import httpx
+
+from ._repository import ChatRow, ConcurrentUpdateError, DocumentRow, ExchangeRow, Page
+
+
+STATE_SERVER_TIMEOUT = float(os.getenv('STATE_SERVER_TIMEOUT', '10'))
+STATE_SERVER_MAX_CONNECTIONS = int(os.getenv('STATE_SERVER_MAX_CONNECTIONS', '64'))
+
+
+class RemoteRepository:
+    """The LocalRepository interface, answered by the state server that owns the database."""
+
+    def __init__(self, base_url: str = '', client: Optional[httpx.AsyncClient] = None):
+        self.client = client or httpx.AsyncClient(
+            base_url=base_url,
+            timeout=STATE_SERVER_TIMEOUT,
+            limits=httpx.Limits(max_connections=STATE_SERVER_MAX_CONNECTIONS),
+        )
+
+    async def _get(self, path: str, **params) -> Any:
+        response = await self.client.get(path, params={k: v for k, v in params.items() if v is not None})
+        response.raise_for_status()
+        return response.json()
+
+    async def _post(self, path: str, body: Optional[dict] = None) -> httpx.Response:
+        response = await self.client.post(path, json=body)
+        response.raise_for_status()
+        return response
+
+    async def list_chats(self, after: Optional[int] = None, limit: Optional[int] = None) -> Page:
+        page = await self._get('/chats', after=after, limit=limit)
+        return Page([ChatRow._make(row) for row in page['rows']], page['next_after'])
+
+    async def get_chat(self, id_chat: int) -> Optional[ChatRow]:
+        row = await self._get(f'/chats/{id_chat}')
+        return ChatRow._make(row) if row is not None else None
+
+    async def get_chat_details_json(self, id_chat: int) -> Optional[Tuple[int, str]]:
+        row = await self._get(f'/chats/{id_chat}/details')
+        return (row[0], row[1]) if row is not None else None
+
+    async def allocate_chat_id(self) -> int:
+        return (await self._post('/chats/ids')).json()
+
+    async def get_history(self, id_chat: int, last_n: Optional[int] = None) -> List[ExchangeRow]:
+        return [ExchangeRow._make(row) for row in await self._get(f'/chats/{id_chat}/history', last_n=last_n)]
+
+    async def next_sequence(self, id_chat: int) -> int:
+        return await self._get(f'/chats/{id_chat}/next-sequence')
+
+    async def record_exchange(
+        self, id_chat: int, name: str, summary: str, exchange: ExchangeRow, expected_version: Optional[int] = None,
+    ):
+        body = {'name': name, 'summary': summary, 'exchange': list(exchange), 'expected_version': expected_version}
+        try:
+            await self._post(f'/chats/{id_chat}/exchanges', body)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 409:
+                raise ConcurrentUpdateError(id_chat) from e
+            raise
+
+    async def list_documents(self, after: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        page = await self._get('/documents', after=after, limit=limit)
+        return Page([DocumentRow._make(row) for row in page['rows']], page['next_after'])
+
+    async def get_document(self, id_document: str) -> Optional[DocumentRow]:
+        row = await self._get(f'/documents/{id_document}')
+        return DocumentRow._make(row) if row is not None else None
+
+    async def insert_documents(self, ids: List[str], name: str, size: int, digest: str):
+        await self._post('/documents', {'ids': ids, 'name': name, 'size': size, 'digest': digest})
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,257 @@
+import os
+from functools import wraps
+from contextlib import contextmanager
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple
+
+import anyio
+import duckdb
+
+from ._archive import archived_path, rehydrate_chat
+
+
+class ConcurrentUpdateError(RuntimeError):
+    """The chat was written by someone else since the caller read it."""
+
+
+class ChatRow(NamedTuple):
+    id: int
+    name: str
+    summary: str
+    version: int = 0
+
+
+class ExchangeRow(NamedTuple):
+    seq: int
+    id_exchange: int
+    id_query: int
+    content_query: str
+    id_response: int
+    content_response: str
+
+
+class DocumentRow(NamedTuple):
+    id: str
+    name: str
+    size: Optional[int]
+    hash: Optional[str]
+
+
+class Page(NamedTuple):
+    rows: List[Any]
+    # Key of the last row, to be passed back as ``after``; None on the last page
+    next_after: Optional[Any]
+
+
+LISTING_PAGE_SIZE = int(os.getenv('LISTING_PAGE_SIZE', '50'))
+LISTING_MAX_PAGE_SIZE = int(os.getenv('LISTING_MAX_PAGE_SIZE', '200'))
+
+
+# Keyset pagination: each page is an index range scan after the last key seen, never an OFFSET
+# Listings and lookups cover archived chats too, through their catalog rows
+SQL_ALL_CHATS = (
+    "(SELECT id, name, summary, version FROM chats "
+    "UNION ALL SELECT id, name, summary, version FROM archived_chats)"
+)
+SQL_LIST_CHATS = f"SELECT * FROM {SQL_ALL_CHATS} ORDER BY id LIMIT ?"
+SQL_LIST_CHATS_AFTER = f"SELECT * FROM {SQL_ALL_CHATS} WHERE id > ? ORDER BY id LIMIT ?"
+SQL_GET_CHAT = "SELECT id, name, summary, version FROM chats WHERE id = ?"
+SQL_GET_ARCHIVED_CHAT = "SELECT id, name, summary, version FROM archived_chats WHERE id = ?"
+# The whole ChatDetails document is assembled by DuckDB in one statement, so it matches the version read with it
+SQL_GET_CHAT_DETAILS_JSON = """
+SELECT c.version, to_json({{
+    'id_chat': c.id, 'name': c.name, 'summary': c.summary,
+    'history': COALESCE((
+        SELECT list({{
+            'id_exchange': e.id_exchange, 'id_chat': e.id_chat,
+            'query': {{'id_query': e.id_query, 'content_query': e.content_query}},
+            'response': {{'id_response': e.id_response, 'content_response': e.content_response}}
+        }} ORDER BY e.seq)
+        FROM {exchanges} e WHERE e.id_chat = c.id
+    ), [])
+}})
+FROM {chats} c WHERE c.id = ?
+"""
+SQL_GET_HOT_CHAT_DETAILS_JSON = SQL_GET_CHAT_DETAILS_JSON.format(chats='chats', exchanges='exchanges')
+SQL_GET_ARCHIVED_CHAT_DETAILS_JSON = SQL_GET_CHAT_DETAILS_JSON.format(
+    chats='archived_chats', exchanges='read_parquet(?)'
+)
+# Ids come from a sequence, so concurrent new chats never get the same one; ids already taken
+# by a chat created under an explicit id are skipped
+SQL_NEXT_CHAT_ID = "SELECT nextval('chat_ids')"
+SQL_CHAT_ID_TAKEN = f"SELECT 1 FROM {SQL_ALL_CHATS} WHERE id = ?"
+SQL_UPSERT_CHAT = (
+    "INSERT INTO chats (id, name, summary, version, last_active) VALUES (?, ?, ?, 1, current_localtimestamp()) "
+    "ON CONFLICT (id) DO UPDATE SET name = excluded.name, summary = excluded.summary, "
+    "version = version + 1, last_active = excluded.last_active"
+)
+# Compare-and-swap on the version the writer read: zero rows changed means someone else got there first
+SQL_INSERT_CHAT = (
+    "INSERT INTO chats (id, name, summary, version, last_active) VALUES (?, ?, ?, 1, current_localtimestamp())"
+)
+SQL_UPDATE_CHAT_IF_VERSION = (
+    "UPDATE chats SET name = ?, summary = ?, version = version + 1, last_active = current_localtimestamp() "
+    "WHERE id = ? AND version = ?"
+)
+# Newest first so that LIMIT keeps the latest turns; callers get them back in chronological order
+SQL_GET_HISTORY = (
+    "SELECT seq, id_exchange, id_query, content_query, id_response, content_response "
+    "FROM exchanges WHERE id_chat = ? ORDER BY seq DESC"
+)
+SQL_GET_HISTORY_LAST_N = SQL_GET_HISTORY + " LIMIT ?"
+SQL_GET_ARCHIVED_HISTORY = SQL_GET_HISTORY.replace("FROM exchanges", "FROM read_parquet(?)")
+SQL_GET_ARCHIVED_HISTORY_LAST_N = SQL_GET_ARCHIVED_HISTORY + " LIMIT ?"
+SQL_NEXT_SEQUENCE = "SELECT COALESCE(MAX(seq) + 1, 0) FROM exchanges WHERE id_chat = ?"
+SQL_APPEND_EXCHANGE = (
+    "INSERT INTO exchanges (id_chat, seq, id_exchange, id_query, content_query, id_response, content_response) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_LIST_DOCUMENTS = "SELECT id, name, size, hash FROM documents ORDER BY id LIMIT ?"
+SQL_LIST_DOCUMENTS_AFTER = "SELECT id, name, size, hash FROM documents WHERE id > ? ORDER BY id LIMIT ?"
+SQL_GET_DOCUMENT = "SELECT id, name, size, hash FROM documents WHERE id = ?"
+SQL_INSERT_DOCUMENT = "INSERT OR IGNORE INTO documents (id, name, size, hash) VALUES (?, ?, ?, ?)"
+
+
+def page_size(limit: Optional[int] = None) -> int:
+    return max(1, min(limit or LISTING_PAGE_SIZE, LISTING_MAX_PAGE_SIZE))
+
+
+def _paginate(cursor, sql_first: str, sql_after: str, after: Optional[Any], limit: Optional[int], row_type) -> Page:
+    size = page_size(limit)
+    # One extra row tells whether another page follows
+    if after is None:
+        rows = cursor.execute(sql_first, [size + 1]).fetchall()
+    else:
+        rows = cursor.execute(sql_after, [after, size + 1]).fetchall()
+    rows = list(map(row_type._make, rows))
+    if len(rows) > size:
+        return Page(rows[:size], rows[size - 1].id)
+    return Page(rows, None)
+
+
+def _swap_chat(cursor, id_chat: int, name: str, summary: str, expected_version: int):
+    try:
+        if expected_version == 0:
+            cursor.execute(SQL_INSERT_CHAT, [id_chat, name, summary])
+            return
+        changed = cursor.execute(SQL_UPDATE_CHAT_IF_VERSION, [name, summary, id_chat, expected_version]).fetchone()[0]
+    except (duckdb.ConstraintException, duckdb.TransactionException) as e:
+        # A duplicate new chat, or a concurrent transaction that updated the same row first
+        raise ConcurrentUpdateError(id_chat) from e
+    if changed != 1:
+        raise ConcurrentUpdateError(id_chat)
+
+
+def _off_loop(method):
+    """Run a query method in a worker thread on a cursor of its own, so it never blocks the event loop."""
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        def work():
+            with self.cursor() as cursor:
+                return method(self, cursor, *args, **kwargs)
+        return await anyio.to_thread.run_sync(work)
+    return wrapper
+
+
+class LocalRepository:
+    """
+    Typed queries over the local DuckDB database.
+
+    DuckDB connections must not be shared between threads, so every call runs on its own cursor
+    (a lightweight connection to the same database) inside a worker thread.
+    """
+
+    def __init__(self, connection: duckdb.DuckDBPyConnection):
+        self.connection = connection
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        cursor = self.connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @_off_loop
+    def list_chats(self, cursor, after: Optional[int] = None, limit: Optional[int] = None) -> Page:
+        return _paginate(cursor, SQL_LIST_CHATS, SQL_LIST_CHATS_AFTER, after, limit, ChatRow)
+
+    @_off_loop
+    def get_chat(self, cursor, id_chat: int) -> Optional[ChatRow]:
+        row = cursor.execute(SQL_GET_CHAT, [id_chat]).fetchone()
+        if row is None:
+            row = cursor.execute(SQL_GET_ARCHIVED_CHAT, [id_chat]).fetchone()
+        return ChatRow._make(row) if row is not None else None
+
+    @_off_loop
+    def get_chat_details_json(self, cursor, id_chat: int) -> Optional[Tuple[int, str]]:
+        row = cursor.execute(SQL_GET_HOT_CHAT_DETAILS_JSON, [id_chat]).fetchone()
+        if row is None:
+            path = archived_path(cursor, id_chat)
+            if path is not None:
+                row = cursor.execute(SQL_GET_ARCHIVED_CHAT_DETAILS_JSON, [path, id_chat]).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    @_off_loop
+    def allocate_chat_id(self, cursor) -> int:
+        while True:
+            id_chat = int(cursor.execute(SQL_NEXT_CHAT_ID).fetchone()[0])
+            if cursor.execute(SQL_CHAT_ID_TAKEN, [id_chat]).fetchone() is None:
+                return id_chat
+
+    @_off_loop
+    def get_history(self, cursor, id_chat: int, last_n: Optional[int] = None) -> List[ExchangeRow]:
+        if last_n is None:
+            rows = cursor.execute(SQL_GET_HISTORY, [id_chat]).fetchall()
+        else:
+            rows = cursor.execute(SQL_GET_HISTORY_LAST_N, [id_chat, last_n]).fetchall()
+        # Hot chats always have turns, so only an empty result can mean the chat was archived
+        path = archived_path(cursor, id_chat) if not rows else None
+        if path is not None:
+            if last_n is None:
+                rows = cursor.execute(SQL_GET_ARCHIVED_HISTORY, [path, id_chat]).fetchall()
+            else:
+                rows = cursor.execute(SQL_GET_ARCHIVED_HISTORY_LAST_N, [path, id_chat, last_n]).fetchall()
+        return list(map(ExchangeRow._make, reversed(rows)))
+
+    @_off_loop
+    def next_sequence(self, cursor, id_chat: int) -> int:
+        return int(cursor.execute(SQL_NEXT_SEQUENCE, [id_chat]).fetchone()[0])
+
+    @_off_loop
+    def record_exchange(
+        self, cursor, id_chat: int, name: str, summary: str, exchange: ExchangeRow,
+        expected_version: Optional[int] = None,
+    ):
+        """
+        Append a turn and update the chat's name and summary in one transaction.
+
+        With ``expected_version`` the chat row is only written if its version is still the one the
+        caller read (0 for a chat that does not exist yet); otherwise ConcurrentUpdateError is raised.
+        """
+        cursor.execute('BEGIN TRANSACTION')
+        try:
+            # A chat that is used again moves back from the archive before it grows
+            rehydrate_chat(cursor, id_chat)
+            if expected_version is None:
+                cursor.execute(SQL_UPSERT_CHAT, [id_chat, name, summary])
+            else:
+                _swap_chat(cursor, id_chat, name, summary, expected_version)
+            cursor.execute(SQL_APPEND_EXCHANGE, [id_chat, *exchange])
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+
+    @_off_loop
+    def list_documents(self, cursor, after: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        return _paginate(cursor, SQL_LIST_DOCUMENTS, SQL_LIST_DOCUMENTS_AFTER, after, limit, DocumentRow)
+
+    @_off_loop
+    def get_document(self, cursor, id_document: str) -> Optional[DocumentRow]:
+        row = cursor.execute(SQL_GET_DOCUMENT, [id_document]).fetchone()
+        return DocumentRow._make(row) if row is not None else None
+
+    @_off_loop
+    def insert_documents(self, cursor, ids: List[str], name: str, size: int, digest: str):
+        # The file itself lives in the blob store under its digest; chunks already registered are skipped
+        cursor.executemany(SQL_INSERT_DOCUMENT, [[_id, name, size, digest] for _id in ids])
@@ -0,0 +1,203 @@
+import os
+import re
+from time import monotonic, perf_counter
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from openai import APITimeoutError
+
+from ._metrics import llm_tokens
+from ._tracing import current_span
+from ._scheduler import (
+    COMPLETION_TOKENS_ESTIMATE,
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    estimate_tokens,
+)
+
+
+# Comma separated ``model:latency_budget_seconds`` pairs, cheapest and fastest first
+MODEL_LADDER = os.getenv('MODEL_LADDER', 'gpt-4o-mini:10,gpt-4:30')
+
+LONG_QUESTION_TOKENS = int(os.getenv('ROUTING_LONG_QUESTION_TOKENS', '40'))
+LARGE_CONTEXT_TOKENS = int(os.getenv('ROUTING_LARGE_CONTEXT_TOKENS', '3000'))
+# Latencies older than this no longer count, so a rung skipped after a slow spell is tried again
+ROUTING_STATS_MAX_AGE = float(os.getenv('ROUTING_STATS_MAX_AGE', '300'))
+# Share of a lower rung's latency budget its calls may take, so a timed-out turn still has time to escalate
+ROUTING_TIMEOUT_SHARE = float(os.getenv('ROUTING_TIMEOUT_SHARE', '0.5'))
+
+ARITHMETIC_WORDS = re.compile(
+    r'\b(?:sum|total|difference|change|ratio|percent(?:age)?|average|growth|divide|multiply|'
+    r'subtract|add|increase|decrease|proportion|rate)\b',
+    re.IGNORECASE,
+)
+# An operator between two numbers; operands glued to letters, as in Q3/Q4, are labels rather than numbers
+OPERATION_PATTERN = re.compile(r'(?<![\w.])\$?(\d[\d,]*(?:\.\d+)?)%?\s*([-+*/^])\s*\$?(\d[\d,]*(?:\.\d+)?)(?![\w.])')
+YEAR_PATTERN = re.compile(r'(?:19|20)\d\d')
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    model_name: str
+    latency_budget: float
+
+
+@dataclass
+class TierStats:
+    window: int = 512
+    max_age: float = ROUTING_STATS_MAX_AGE
+    clock: Callable[[], float] = monotonic
+    requests: int = 0
+    escalations: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # (observed at, seconds) pairs, oldest first
+    latencies: deque = field(default_factory=deque)
+
+    def observe(self, seconds: float, usage: Dict[str, int]):
+        self.requests += 1
+        self.prompt_tokens += usage.get('prompt_tokens', 0)
+        self.completion_tokens += usage.get('completion_tokens', 0)
+        self.latencies.append((self.clock(), seconds))
+        while len(self.latencies) > self.window:
+            self.latencies.popleft()
+
+    def percentile(self, q: float) -> Optional[float]:
+        cutoff = self.clock() - self.max_age
+        ordered = sorted(seconds for observed_at, seconds in list(self.latencies) if observed_at >= cutoff)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def parse_ladder(spec: str) -> List[ModelTier]:
+    tiers = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        model_name, _, budget = item.partition(':')
+        tiers.append(ModelTier(model_name=model_name, latency_budget=float(budget or 30)))
+    return tiers
+
+
+def classify_request(question: str, context: str = '') -> int:
+    """Cheap local estimate of how much model a turn needs: 0 for the bottom rung, +1 per hard feature."""
+    score = 0
+    if estimate_tokens([question]) > LONG_QUESTION_TOKENS:
+        score += 1
+    if _has_arithmetic(question):
+        score += 1
+    if context and estimate_tokens([context]) > LARGE_CONTEXT_TOKENS:
+        score += 1
+    return score
+
+
+def _has_arithmetic(question: str) -> bool:
+    if ARITHMETIC_WORDS.search(question):
+        return True
+    for left, operator, right in OPERATION_PATTERN.findall(question):
+        # 2008-2009 and 2008/2009 are periods, not a subtraction or a ratio
+        if operator in '-/' and YEAR_PATTERN.fullmatch(left) and YEAR_PATTERN.fullmatch(right):
+            continue
+        return True
+    return False
+
+
+def _token_usage(response: Any) -> Dict[str, int]:
+    usage = getattr(response, 'usage_metadata', None) or {}
+    if usage:
+        return {'prompt_tokens': usage.get('input_tokens', 0), 'completion_tokens': usage.get('output_tokens', 0)}
+    metadata = getattr(response, 'response_metadata', None) or {}
+    return metadata.get('token_usage', {}) or {}
+
+
+class ModelRouter:
+    """
+    Sends each turn to a rung of the model ladder picked by ``classify_request``.
+
+    Every rung below the top is called with ``ROUTING_TIMEOUT_SHARE`` of its latency budget as the
+    request timeout; a timeout, or a rung whose p95 over the last ``ROUTING_STATS_MAX_AGE`` seconds
+    exceeds its budget, escalates the turn to the next rung up.
+    """
+
+    def __init__(
+        self,
+        ladder: Sequence[ModelTier],
+        llm_factory: Callable[[ModelTier], Any],
+        scheduler: Optional[RequestScheduler] = None,
+        classifier: Callable[[str, str], int] = classify_request,
+    ):
+        if not ladder:
+            raise ValueError('Model ladder must contain at least one tier.')
+        self.ladder = list(ladder)
+        self.scheduler = scheduler
+        self.classifier = classifier
+        self.stats = {tier.model_name: TierStats() for tier in self.ladder}
+        self._llm_factory = llm_factory
+        self._llms: Dict[str, Any] = {}
+
+    def llm_for(self, tier: ModelTier):
+        if tier.model_name not in self._llms:
+            self._llms[tier.model_name] = self._llm_factory(tier)
+        return self._llms[tier.model_name]
+
+    def select_tier(self, question: str, context: str = '') -> int:
+        index = min(max(self.classifier(question, context), 0), len(self.ladder) - 1)
+        while index < len(self.ladder) - 1 and self._over_budget(self.ladder[index]):
+            index += 1
+        return index
+
+    def invoke(self, messages: List[Any], question: str, context: str = ''):
+        index = self.select_tier(question, context)
+        while True:
+            tier = self.ladder[index]
+            started = perf_counter()
+            try:
+                response = self._call(tier, messages)
+            except APITimeoutError:
+                self.stats[tier.model_name].observe(perf_counter() - started, {})
+                if index == len(self.ladder) - 1:
+                    raise
+                self.stats[tier.model_name].escalations += 1
+                index += 1
+                continue
+            usage = _token_usage(response)
+            self.stats[tier.model_name].observe(perf_counter() - started, usage)
+            llm_tokens.labels(model=tier.model_name, kind='prompt').inc(usage.get('prompt_tokens', 0))
+            llm_tokens.labels(model=tier.model_name, kind='completion').inc(usage.get('completion_tokens', 0))
+            current_span().set(model=tier.model_name, tier=index, **usage)
+            return response
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'model_name': tier.model_name,
+                'latency_budget': tier.latency_budget,
+                'requests': self.stats[tier.model_name].requests,
+                'escalations': self.stats[tier.model_name].escalations,
+                'p50': self.stats[tier.model_name].percentile(0.50),
+                'p95': self.stats[tier.model_name].percentile(0.95),
+                'prompt_tokens': self.stats[tier.model_name].prompt_tokens,
+                'completion_tokens': self.stats[tier.model_name].completion_tokens,
+            }
+            for tier in self.ladder
+        ]
+
+    def request_timeout(self, tier: ModelTier) -> float:
+        # A lower rung is cut off well within its budget, leaving the rest for the rung it escalates to
+        if tier == self.ladder[-1]:
+            return tier.latency_budget
+        return tier.latency_budget * ROUTING_TIMEOUT_SHARE
+
+    def _over_budget(self, tier: ModelTier) -> bool:
+        p95 = self.stats[tier.model_name].percentile(0.95)
+        return p95 is not None and p95 > tier.latency_budget
+
+    def _call(self, tier: ModelTier, messages: List[Any]):
+        llm = self.llm_for(tier)
+        if self.scheduler is None:
+            return llm.invoke(messages)
+        tokens = estimate_tokens(msg.content for msg in messages) + COMPLETION_TOKENS_ESTIMATE
+        # Escalating on timeouts is the router's job, so the scheduler only retries the other failures
+        return self.scheduler.submit(
+            llm.invoke, messages, tokens=tokens, priority=PRIORITY_INTERACTIVE, give_up_on=(APITimeoutError,)
+        )
@@ -0,0 +1,244 @@
+import os
+import heapq
+import random
+import threading
+import itertools
+from time import monotonic, sleep
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Type
+
+import httpx
+import tiktoken
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from ._metrics import scheduler_queue_depth, scheduler_wait
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BULK: 'bulk'}
+
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '500'))
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '30000'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '6'))
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+OPENAI_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', '60'))
+# Expected completion size charged against the TPM budget before the response is known
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv('OPENAI_COMPLETION_TOKENS_ESTIMATE', '256'))
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """One pooled, keep-alive HTTP client shared by every OpenAI chat and embedding call."""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+        ),
+        timeout=OPENAI_REQUEST_TIMEOUT,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str):
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        # tiktoken fetches its BPE files on first use; fall back to a character estimate offline
+        return None
+
+
+def estimate_tokens(texts: Iterable[str], encoding_name: str = 'cl100k_base') -> int:
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return sum(len(text) // 4 + 1 for text in texts)
+    return sum(len(encoding.encode(text, disallowed_special=())) for text in texts)
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float, clock: Callable[[], float] = monotonic):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._clock = clock
+        self._available = float(capacity)
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self._available
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until ``amount`` can be consumed; 0.0 when it can be consumed now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._available >= amount:
+            return 0.0
+        return (amount - self._available) / self.refill_per_second
+
+    def consume(self, amount: float):
+        self._refill()
+        self._available -= min(amount, self.capacity)
+
+
+class SchedulerMetrics:
+    def __init__(self, window: int = 1024):
+        self.queue_depth: Dict[str, int] = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._recent_waits = deque(maxlen=window)
+
+    def observe_wait(self, seconds: float):
+        self.requests += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        self._recent_waits.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self._recent_waits)
+
+        def percentile(q: float) -> float:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] if waits else 0.0
+
+        return {
+            'queue_depth': dict(self.queue_depth),
+            'requests': self.requests,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'wait_seconds': {
+                'total': self.wait_seconds_total,
+                'max': self.wait_seconds_max,
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+            },
+        }
+
+
+class RequestScheduler:
+    """
+    Admits OpenAI calls against the organisation's RPM/TPM limits.
+
+    Callers queue by priority (interactive chat before bulk embedding), each request is charged its
+    estimated token count up front, and retryable failures are retried with full-jitter exponential
+    backoff, honouring ``Retry-After`` when the server sends one.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = OPENAI_RPM_LIMIT,
+        tokens_per_minute: int = OPENAI_TPM_LIMIT,
+        max_retries: int = OPENAI_MAX_RETRIES,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        clock: Callable[[], float] = monotonic,
+        sleeper: Callable[[float], None] = sleep,
+    ):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0, clock=clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = SchedulerMetrics()
+        self._clock = clock
+        self._sleep = sleeper
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    @property
+    def max_request_tokens(self) -> int:
+        return int(self.tokens.capacity)
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Block until the request may be sent; returns the seconds spent queued."""
+        ticket = (priority, next(self._sequence))
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        started = self._clock()
+        depth = scheduler_queue_depth.labels(priority=name)
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            self.metrics.queue_depth[name] = self.metrics.queue_depth.get(name, 0) + 1
+            depth.inc()
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == ticket:
+                        timeout = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+                        if timeout == 0.0:
+                            heapq.heappop(self._waiting)
+                            self.requests.consume(1)
+                            self.tokens.consume(tokens)
+                            self._condition.notify_all()
+                            break
+                    self._condition.wait(timeout=timeout)
+            finally:
+                self.metrics.queue_depth[name] -= 1
+                depth.dec()
+                if ticket in self._waiting:
+                    # Interrupted while queued: a ticket left at the head would block everyone behind it
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+            waited = self._clock() - started
+            self.metrics.observe_wait(waited)
+        scheduler_wait.labels(priority=name).observe(waited)
+        return waited
+
+    def backoff_delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        tokens: int,
+        priority: int = PRIORITY_INTERACTIVE,
+        retry_on: Tuple[Type[Exception], ...] = RETRYABLE_ERRORS,
+        give_up_on: Tuple[Type[Exception], ...] = (),
+        **kwargs,
+    ):
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            try:
+                return fn(*args, **kwargs)
+            except retry_on as error:
+                # Matched by isinstance, so that subclasses of a retryable error can still be excluded
+                if isinstance(error, give_up_on):
+                    raise
+                if isinstance(error, RateLimitError):
+                    self.metrics.rate_limited += 1
+                if attempt >= self.max_retries:
+                    raise
+                self.metrics.retries += 1
+                self._sleep(self.backoff_delay(attempt, error))
+                attempt += 1
+
+
+def _retry_after_seconds(error: Optional[Exception]) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    value = response.headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_scheduler() -> RequestScheduler:
+    return RequestScheduler()
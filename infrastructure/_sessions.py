@@ -0,0 +1,267 @@
+import os
+import math
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import AsyncIterator, Dict, List, Optional
+
+import anyio
+from anyio.abc import TaskGroup
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from ._admission import Overloaded
+from ._invalidation import ChangeBoard
+from ._metrics import admission_rejected, count_cache, timed
+from ._repository import ExchangeRow, LocalRepository
+
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '256'))
+SESSION_CACHE_MAX_BYTES = int(os.getenv('SESSION_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Turns of history a prompt window covers; older turns can never make it into a prompt
+SESSION_HISTORY_TURNS = int(os.getenv('CHAT_HISTORY_TURNS', '32'))
+# Windows start on a multiple of the prompt's trim block, so their prefix only moves when a whole block drops
+HISTORY_WINDOW_BLOCK = max(1, int(os.getenv('PROMPT_HISTORY_TRIM_BLOCK', '4')))
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('WRITE_BEHIND_QUEUE_SIZE', '1024'))
+# Turns of one chat that may wait behind the one running; further turns are turned away
+CHAT_LOCK_QUEUE = int(os.getenv('CHAT_LOCK_QUEUE', '4'))
+
+
+@dataclass
+class ChatSession:
+    id_chat: int
+    name: str
+    summary: str
+    next_seq: int
+    messages: List[BaseMessage] = field(default_factory=list)
+    nbytes: int = 0
+    # Version of the chat row this session has seen; 0 until the chat exists
+    version: int = 0
+    # The chat's counter on the change board when this copy was known to be current
+    stamp: int = 0
+
+    def history(self, turns: int, block: int = HISTORY_WINDOW_BLOCK) -> List[BaseMessage]:
+        """
+        The last ``turns`` turns, extended back to the previous multiple of ``block``, so that the window
+        keeps its first turn for ``block`` turns in a row instead of sliding forward by one every turn.
+        """
+        if turns <= 0:
+            return []
+        first_held = self.next_seq - len(self.messages) // 2
+        start = max(first_held, (self.next_seq - turns) // block * block)
+        return list(self.messages[2 * (start - first_held):])
+
+    def append(self, query: str, response: str, keep_turns: int):
+        self.messages.extend((HumanMessage(content=query), AIMessage(content=response)))
+        if len(self.messages) > 2 * keep_turns:
+            del self.messages[:len(self.messages) - 2 * keep_turns]
+        self.nbytes = sum(len(msg.content) for msg in self.messages)
+
+
+@dataclass(frozen=True)
+class PendingWrite:
+    id_chat: int
+    name: str
+    summary: str
+    exchange: ExchangeRow
+    expected_version: int
+
+
+@dataclass
+class _ChatLock:
+    lock: anyio.Lock = field(default_factory=anyio.Lock)
+    holders: int = 0
+
+
+class SessionCache:
+    """
+    Active chats kept in memory with their parsed messages and running summary.
+
+    Bounded by count and by the size of the cached messages, evicting the least recently used.
+    Once ``start`` has been called, new turns are persisted in the background in the order they
+    were recorded and ``flush`` drains them on shutdown; before that, writes go straight through.
+
+    Each write carries the chat version it was based on, so a turn recorded from a stale copy
+    (another worker, or a session reloaded mid-flight) is refused by the database instead of
+    overwriting the other turn.
+
+    With a ``board`` shared by several worker processes, turns are always written through, and a
+    cached chat that another process has changed since is reloaded instead of used.
+    """
+
+    def __init__(
+        self,
+        repository: LocalRepository,
+        max_sessions: int = SESSION_CACHE_SIZE,
+        max_bytes: int = SESSION_CACHE_MAX_BYTES,
+        # Enough for a window that starts up to a block before the last CHAT_HISTORY_TURNS turns
+        history_turns: int = SESSION_HISTORY_TURNS + HISTORY_WINDOW_BLOCK - 1,
+        queue_size: int = WRITE_BEHIND_QUEUE_SIZE,
+        board: Optional[ChangeBoard] = None,
+        lock_queue: int = CHAT_LOCK_QUEUE,
+    ):
+        self.repository = repository
+        self.board = board
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.history_turns = history_turns
+        self.queue_size = queue_size
+        self.lock_queue = lock_queue
+        self._sessions: 'OrderedDict[int, ChatSession]' = OrderedDict()
+        self._pending: Dict[int, int] = {}
+        self._settled: Dict[int, anyio.Event] = {}
+        self._locks: Dict[int, _ChatLock] = {}
+        # Moving average of how long a turn holds its chat, for the Retry-After estimate
+        self._hold_seconds = 1.0
+        self._send = None
+        self._stopped: Optional[anyio.Event] = None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(session.nbytes for session in self._sessions.values())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def get(self, id_chat: int) -> ChatSession:
+        session = self._sessions.get(id_chat)
+        if session is not None and self.board is not None and self.board.stamp(id_chat) != session.stamp:
+            self.invalidate(id_chat)
+            session = None
+        count_cache('sessions', session is not None)
+        if session is not None:
+            self._sessions.move_to_end(id_chat)
+            return session
+
+        # A chat evicted with turns still queued must not be reloaded without them
+        await self.settled(id_chat)
+        # Read before the chat itself, so a change made while loading is noticed next time
+        stamp = self.board.stamp(id_chat) if self.board is not None else 0
+        chat = await self.repository.get_chat(id_chat)
+        rows = await self.repository.get_history(id_chat, last_n=self.history_turns)
+        session = ChatSession(
+            id_chat=id_chat,
+            name=chat.name if chat else '',
+            summary=chat.summary if chat else '',
+            next_seq=rows[-1].seq + 1 if rows else 0,
+            version=chat.version if chat else 0,
+            stamp=stamp,
+        )
+        for row in rows:
+            session.append(row.content_query, row.content_response, self.history_turns)
+        self._store(session)
+        return session
+
+    @asynccontextmanager
+    async def lock(self, id_chat: int) -> AsyncIterator[None]:
+        """
+        Hold the chat for one read-respond-record cycle.
+
+        Turns of the same chat queue up in arrival order, different chats never wait on each other.
+        Past ``lock_queue`` waiting turns the chat is ``Overloaded``, like a full admission pool.
+        """
+        entry = self._locks.setdefault(id_chat, _ChatLock())
+        if entry.holders > self.lock_queue:
+            admission_rejected.labels(pool='chat').inc()
+            raise Overloaded('chat', max(1, math.ceil(self._hold_seconds * entry.holders)))
+        entry.holders += 1
+        try:
+            with timed('sessions', 'lock_wait'):
+                await entry.lock.acquire()
+            held_from = perf_counter()
+            try:
+                yield
+            finally:
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (perf_counter() - held_from)
+                entry.lock.release()
+        finally:
+            entry.holders -= 1
+            if not entry.holders:
+                del self._locks[id_chat]
+
+    async def record(self, session: ChatSession, name: str, summary: str, exchange: ExchangeRow):
+        write = PendingWrite(session.id_chat, name, summary, exchange, session.version)
+        session.name, session.summary = name, summary
+        session.next_seq = exchange.seq + 1
+        session.version += 1
+        session.append(exchange.content_query, exchange.content_response, self.history_turns)
+        self._store(session)
+
+        # A chat's first turn is written through so the new id is taken before anyone asks for the next one.
+        # Shared with other workers, every turn is: the next one may be served by another process
+        if self._send is None or exchange.seq == 0 or self.board is not None:
+            try:
+                await self._persist(write)
+            except Exception:
+                self.invalidate(write.id_chat)
+                raise
+            return
+        self._pending[write.id_chat] = self._pending.get(write.id_chat, 0) + 1
+        self._settled.setdefault(write.id_chat, anyio.Event())
+        # Blocks when the queue is full, which pushes back on writers instead of growing without bound
+        await self._send.send(write)
+
+    async def settled(self, id_chat: int):
+        """Wait until every queued turn of this chat has reached the database."""
+        event = self._settled.get(id_chat)
+        if event is not None:
+            await event.wait()
+
+    def start(self, task_group: TaskGroup):
+        self._send, receive = anyio.create_memory_object_stream[PendingWrite](self.queue_size)
+        self._stopped = anyio.Event()
+        task_group.start_soon(self._write_behind, receive)
+
+    async def flush(self):
+        """Stop accepting background writes and wait until the queue is drained."""
+        if self._send is None:
+            return
+        send, self._send = self._send, None
+        await send.aclose()
+        await self._stopped.wait()
+
+    def invalidate(self, id_chat: int):
+        self._sessions.pop(id_chat, None)
+
+    def _store(self, session: ChatSession):
+        self._sessions[session.id_chat] = session
+        self._sessions.move_to_end(session.id_chat)
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self.nbytes > self.max_bytes
+        ):
+            self._sessions.popitem(last=False)
+
+    async def _persist(self, write: PendingWrite):
+        await self.repository.record_exchange(
+            write.id_chat, write.name, write.summary, write.exchange, expected_version=write.expected_version
+        )
+        if self.board is not None:
+            stamp = self.board.bump(write.id_chat)
+            session = self._sessions.get(write.id_chat)
+            # Our own write leaves our copy current, unless another process wrote in between
+            if session is not None and session.stamp == stamp - 1:
+                session.stamp = stamp
+
+    async def _write_behind(self, receive):
+        try:
+            async with receive:
+                async for write in receive:
+                    try:
+                        await self._persist(write)
+                    except Exception:
+                        # Drop the cached copy so the next turn starts from what was actually stored
+                        logger.exception('Persisting turn %s of chat %s failed', write.exchange.seq, write.id_chat)
+                        self.invalidate(write.id_chat)
+                    finally:
+                        self._done(write.id_chat)
+        finally:
+            self._stopped.set()
+
+    def _done(self, id_chat: int):
+        self._pending[id_chat] -= 1
+        if not self._pending[id_chat]:
+            del self._pending[id_chat]
+            self._settled.pop(id_chat).set()
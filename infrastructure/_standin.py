@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import base64
+import random
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+import anyio
+import numpy as np
+from fastapi import FastAPI, Body, HTTPException
+from fastapi.responses import ORJSONResponse
+
+
+STANDIN_EMBEDDING_DIMENSIONS = int(os.getenv('STANDIN_EMBEDDING_DIMENSIONS', '1536'))
+STANDIN_PROFILE = os.getenv('STANDIN_PROFILE', 'instant')
+STANDIN_COMPLETION_TEMPLATE = os.getenv(
+    'STANDIN_COMPLETION_TEMPLATE', 'Stand-in answer from {model} to: {question}'
+)
+# Optional JSON object mapping a substring of the user's question to a canned reply
+STANDIN_CANNED_RESPONSES = os.getenv('STANDIN_CANNED_RESPONSES')
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    base_latency: float = 0.0
+    per_token_latency: float = 0.0
+    jitter: float = 0.0
+    max_concurrency: int = 0
+    requests_per_minute: int = 0
+
+
+LATENCY_PROFILES = {
+    'instant': LatencyProfile(),
+    'fast': LatencyProfile(base_latency=0.05, per_token_latency=0.001, jitter=0.01),
+    'realistic': LatencyProfile(base_latency=0.4, per_token_latency=0.02, jitter=0.1, max_concurrency=64),
+    'rate_limited': LatencyProfile(base_latency=0.2, per_token_latency=0.01, jitter=0.05, requests_per_minute=60),
+}
+
+
+def count_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def deterministic_embedding(text: Union[str, List[int]], dimensions: int = STANDIN_EMBEDDING_DIMENSIONS) -> List[float]:
+    """Unit vector seeded by a hash of the input, so equal inputs always embed identically."""
+    seed = int.from_bytes(hashlib.sha256(json.dumps(text).encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def template_completion(model: str, messages: List[Dict[str, Any]], canned: Dict[str, str]) -> str:
+    user_messages = [msg.get('content') or '' for msg in messages if msg.get('role') == 'user']
+    question = user_messages[-1] if user_messages else ''
+    for needle, reply in canned.items():
+        if needle.lower() in question.lower():
+            return reply
+    return STANDIN_COMPLETION_TEMPLATE.format(model=model, question=question, turns=len(user_messages))
+
+
+class StandIn:
+    def __init__(self, profile: LatencyProfile, canned: Optional[Dict[str, str]] = None):
+        self.profile = profile
+        self.canned = canned or {}
+        self.requests = 0
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._window_started = time.monotonic()
+        self._window_requests = 0
+
+    def check_rate_limit(self):
+        if not self.profile.requests_per_minute:
+            return
+        now = time.monotonic()
+        if now - self._window_started >= 60:
+            self._window_started, self._window_requests = now, 0
+        self._window_requests += 1
+        if self._window_requests > self.profile.requests_per_minute:
+            retry_after = max(1, int(60 - (now - self._window_started)))
+            raise HTTPException(
+                status_code=429,
+                detail={'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                headers={'Retry-After': str(retry_after)},
+            )
+
+    async def delay(self, tokens: int):
+        self.requests += 1
+        seconds = self.profile.base_latency + tokens * self.profile.per_token_latency
+        if self.profile.jitter:
+            seconds += random.uniform(0, self.profile.jitter)
+        if seconds <= 0:
+            return
+        if not self.profile.max_concurrency:
+            await anyio.sleep(seconds)
+            return
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.profile.max_concurrency)
+        async with self._limiter:
+            await anyio.sleep(seconds)
+
+
+def _encode(vector: List[float], as_base64: bool) -> Union[str, List[float]]:
+    # The OpenAI client asks for base64-packed float32 by default
+    if not as_base64:
+        return vector
+    return base64.b64encode(np.asarray(vector, dtype='float32').tobytes()).decode('ascii')
+
+
+def _load_canned(path: Optional[str]) -> Dict[str, str]:
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def create_app(profile: Optional[LatencyProfile] = None, canned: Optional[Dict[str, str]] = None) -> FastAPI:
+    standin = StandIn(
+        profile or LATENCY_PROFILES[STANDIN_PROFILE],
+        canned if canned is not None else _load_canned(STANDIN_CANNED_RESPONSES),
+    )
+    application = FastAPI(title='OpenAI stand-in')
+    application.state.standin = standin
+
+    @application.get('/v1/models', response_class=ORJSONResponse)
+    async def list_models():
+        return {'object': 'list', 'data': [{'id': 'standin', 'object': 'model', 'owned_by': 'standin'}]}
+
+    @application.post('/v1/chat/completions', response_class=ORJSONResponse)
+    async def chat_completions(body: Dict[str, Any] = Body(...)):
+        standin.check_rate_limit()
+        model = body.get('model', 'standin')
+        messages = body.get('messages', [])
+        content = template_completion(model, messages, standin.canned)
+        prompt_tokens = sum(count_tokens(str(msg.get('content') or '')) for msg in messages)
+        completion_tokens = count_tokens(content)
+        await standin.delay(completion_tokens)
+        return {
+            'id': f'chatcmpl-standin-{standin.requests}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+                'logprobs': None,
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+
+    @application.post('/v1/embeddings', response_class=ORJSONResponse)
+    async def embeddings(body: Dict[str, Any] = Body(...)):
+        standin.check_rate_limit()
+        inputs = body.get('input', [])
+        # A single string or a single token array is one input, as in the OpenAI API
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = int(body.get('dimensions') or STANDIN_EMBEDDING_DIMENSIONS)
+        as_base64 = body.get('encoding_format') == 'base64'
+        prompt_tokens = sum(len(item) if isinstance(item, list) else count_tokens(item) for item in inputs)
+        await standin.delay(0)
+        return {
+            'object': 'list',
+            'model': body.get('model', 'standin'),
+            'data': [
+                {'object': 'embedding', 'index': index, 'embedding': _encode(deterministic_embedding(item, dimensions), as_base64)}
+                for index, item in enumerate(inputs)
+            ],
+            'usage': {'prompt_tokens': prompt_tokens, 'total_tokens': prompt_tokens},
+        }
+
+    return application
+
+
+app = create_app()
@@ -0,0 +1,130 @@
+import threading
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import anyio
+import duckdb
+from fastapi import Body, Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+from typing_extensions import Annotated
+
+from ._archive import run_archiver
+from ._blobstore import export_document_contents, get_blob_store
+from ._duckdb import checkpoint, verify_document_ids
+from ._providers import STATE_SERVER_URL, get_localdb
+from ._repository import ConcurrentUpdateError, ExchangeRow, LocalRepository
+
+
+def _reconcile_storage(localdb: duckdb.DuckDBPyConnection, verify_vectors: bool):
+    export_document_contents(localdb, get_blob_store())
+    if verify_vectors:
+        # Only the ids are read, so the store is opened without the embeddings client and its API key
+        from ._chromadb import get_vector_store
+        verify_document_ids(localdb, get_vector_store(None))
+
+
+@asynccontextmanager
+async def _maintain_local_storage(verify_vectors: bool = False) -> AsyncIterator[duckdb.DuckDBPyConnection]:
+    localdb = get_localdb()
+    # Reconciling with the stores can take a while on large ones, so it must not delay serving
+    threading.Thread(target=_reconcile_storage, args=(localdb, verify_vectors), daemon=True).start()
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(run_archiver, localdb)
+        yield localdb
+        task_group.cancel_scope.cancel()
+    checkpoint(localdb)
+
+
+def maintain_storage():
+    """
+    Upkeep of the database by the process that owns it: moving contents to the blob store,
+    archiving idle chats and a checkpoint on the way out. Its chunk ids are checked against the
+    vector store by ``get_vectorstore`` when that is first built. Workers behind a state server
+    leave all of it to that server.
+    """
+    if not STATE_SERVER_URL:
+        return _maintain_local_storage()
+    from ._chromadb import CHROMA_SERVER_URL
+    if not CHROMA_SERVER_URL:
+        # Each worker would open its own embedded store under db/, and their writes would clobber each other
+        raise RuntimeError('STATE_SERVER_URL is set without CHROMA_SERVER_URL; workers must share a Chroma server.')
+    return nullcontext()
+
+
+def _repository(request: Request) -> LocalRepository:
+    return request.app.state.repository
+
+
+RepositoryDep = Annotated[LocalRepository, Depends(_repository)]
+
+
+def create_app(repository: Optional[LocalRepository] = None) -> FastAPI:
+    """
+    The repository over HTTP, so that any number of worker processes can share one DuckDB database.
+
+    Run it as a single process next to the workers, which find it through ``STATE_SERVER_URL``. It is
+    built by this factory rather than at import, since every worker imports this module too.
+    """
+
+    @asynccontextmanager
+    async def lifespan(application: FastAPI):
+        # No process here builds the vector store, so the state server checks the ids against it itself
+        async with _maintain_local_storage(verify_vectors=True) as localdb:
+            application.state.repository = LocalRepository(localdb)
+            yield
+
+    application = FastAPI(title='Shared state', lifespan=None if repository is not None else lifespan)
+    application.state.repository = repository
+
+    @application.get('/chats', response_class=ORJSONResponse)
+    async def list_chats(repository: RepositoryDep, after: Optional[int] = None, limit: Optional[int] = None):
+        page = await repository.list_chats(after=after, limit=limit)
+        return {'rows': page.rows, 'next_after': page.next_after}
+
+    @application.post('/chats/ids', response_class=ORJSONResponse)
+    async def allocate_chat_id(repository: RepositoryDep) -> int:
+        return await repository.allocate_chat_id()
+
+    @application.get('/chats/{id_chat}', response_class=ORJSONResponse)
+    async def get_chat(repository: RepositoryDep, id_chat: int):
+        return await repository.get_chat(id_chat)
+
+    @application.get('/chats/{id_chat}/details', response_class=ORJSONResponse)
+    async def get_chat_details_json(repository: RepositoryDep, id_chat: int):
+        return await repository.get_chat_details_json(id_chat)
+
+    @application.get('/chats/{id_chat}/history', response_class=ORJSONResponse)
+    async def get_history(repository: RepositoryDep, id_chat: int, last_n: Optional[int] = None):
+        return await repository.get_history(id_chat, last_n=last_n)
+
+    @application.get('/chats/{id_chat}/next-sequence', response_class=ORJSONResponse)
+    async def next_sequence(repository: RepositoryDep, id_chat: int) -> int:
+        return await repository.next_sequence(id_chat)
+
+    @application.post('/chats/{id_chat}/exchanges', status_code=204)
+    async def record_exchange(repository: RepositoryDep, id_chat: int, body: Annotated[Dict[str, Any], Body()]):
+        try:
+            await repository.record_exchange(
+                id_chat, body['name'], body['summary'], ExchangeRow._make(body['exchange']),
+                expected_version=body.get('expected_version'),
+            )
+        except ConcurrentUpdateError:
+            raise HTTPException(status_code=409, detail='Chat was updated concurrently')
+        return Response(status_code=204)
+
+    @application.get('/documents', response_class=ORJSONResponse)
+    async def list_documents(repository: RepositoryDep, after: Optional[str] = None, limit: Optional[int] = None):
+        page = await repository.list_documents(after=after, limit=limit)
+        return {'rows': page.rows, 'next_after': page.next_after}
+
+    @application.get('/documents/{id_document}', response_class=ORJSONResponse)
+    async def get_document(repository: RepositoryDep, id_document: str):
+        return await repository.get_document(id_document)
+
+    @application.post('/documents', status_code=204)
+    async def insert_documents(repository: RepositoryDep, body: Annotated[Dict[str, Any], Body()]):
+        ids: List[str] = body['ids']
+        await repository.insert_documents(ids, body['name'], body['size'], body['digest'])
+        return Response(status_code=204)
+
+    return application
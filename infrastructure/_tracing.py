@@ -0,0 +1,101 @@
+import os
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter, time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '512'))
+# Fraction of requests whose prompts are also written out in full; off unless asked for
+TRACE_DEBUG_SAMPLE_RATE = float(os.getenv('TRACE_DEBUG_SAMPLE_RATE', '0'))
+
+
+@dataclass
+class Span:
+    name: str
+    started_at: float = field(default_factory=time)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    children: List['Span'] = field(default_factory=list)
+    duration: Optional[float] = None
+    debug: bool = False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'attributes': dict(self.attributes),
+            'children': [child.as_dict() for child in list(self.children)],
+        }
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+class Tracer:
+    """
+    Nested spans per request, kept in memory for the last ``capacity`` requests.
+
+    The current span travels in a context variable, so spans opened in worker threads started with
+    ``anyio.to_thread`` nest under the request that started them.
+    """
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE, debug_sample_rate: float = TRACE_DEBUG_SAMPLE_RATE):
+        self.debug_sample_rate = debug_sample_rate
+        self._traces: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, debug: Optional[bool] = None, **attributes) -> Iterator[Span]:
+        parent = _current.get()
+        if parent is None and debug is None:
+            debug = random.random() < self.debug_sample_rate
+        span = Span(name, attributes=attributes, debug=parent.debug if parent is not None else bool(debug))
+        if parent is not None:
+            parent.children.append(span)
+        token = _current.set(span)
+        started = perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = perf_counter() - started
+            _current.reset(token)
+            if parent is None:
+                with self._lock:
+                    self._traces.append(span)
+
+    def slowest(self, limit: int = 20) -> List[Span]:
+        with self._lock:
+            traces = list(self._traces)
+        return sorted(traces, key=lambda span: span.duration, reverse=True)[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+class _NoSpan:
+    debug = False
+
+    def set(self, **attributes):
+        pass
+
+
+def current_span():
+    """The innermost open span, or a stand-in that ignores attributes outside of any trace."""
+    return _current.get() or _NoSpan()
+
+
+def debug_sampled() -> bool:
+    """Whether the current request was sampled for verbose debug output."""
+    return current_span().debug
+
+
+tracer = Tracer()
@@ -1,12 +1,43 @@
+from contextlib import asynccontextmanager
+
+import anyio
+
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse, RedirectResponse
 
-from endpoints import api_doc_ingest, api_RAG
+from endpoints import (
+    api_doc_ingest, api_RAG, api_metrics, api_traces, api_profiles, api_health,
+    InFlightMiddleware, TracingMiddleware, ProfilingMiddleware,
+)
+from infrastructure import get_sessions, maintain_storage
+from usecases import start_warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The database and session cache are opened up front; the LLM clients and the vector index are
+    # warmed up in the background while /ready answers 503
+    async with maintain_storage():
+        sessions = get_sessions()
+        start_warmup()
+        async with anyio.create_task_group() as task_group:
+            sessions.start(task_group)
+            yield
+            # Queued turns reach the database before the final checkpoint
+            await sessions.flush()
+            task_group.cancel_scope.cancel()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(api_doc_ingest, tags=['Document Ingestion',])
 app.include_router(api_RAG, tags=['Retrieval Augmented Generation'])
+app.include_router(api_metrics, tags=['Operations'])
+app.include_router(api_traces, tags=['Operations'])
+app.include_router(api_profiles, tags=['Operations'])
+app.include_router(api_health, tags=['Operations'])
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(InFlightMiddleware)
 
 
 @app.get('/', response_class=ORJSONResponse)
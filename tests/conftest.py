@@ -10,42 +10,47 @@ from endpoints import api_doc_ingest, api_RAG
 @pytest.fixture(autouse=True)
 def fresh_db(monkeypatch):
     """
-    Every test gets a clean in-memory DuckDB with the right schema,
-    and `infrastructure.localdb` is patched to point at this new conn.
+    Every test gets a clean in-memory DuckDB with the right schema.
     """
-    conn = duckdb.connect(database=":memory:")
-    conn.execute(
-        "CREATE TABLE IF NOT EXISTS chats ("
-        "  id BIGINT PRIMARY KEY,"
-        "  name VARCHAR,"
-        "  summary VARCHAR,"
-        "  history VARCHAR"
-        ")"
-    )
-    conn.execute(
-        "CREATE TABLE IF NOT EXISTS documents ("
-        "  id VARCHAR PRIMARY KEY,"
-        "  name VARCHAR,"
-        "  contents BLOB"
-        ")"
-    )
-    # Patch the **exported** localdb
-    monkeypatch.setattr(infra_pkg, "localdb", conn)
-    # Patch the module-level duckdb_connection as well
     import infrastructure._duckdb as _duckdb_mod
-    monkeypatch.setattr(_duckdb_mod, "duckdb_connection", conn)
+    conn = duckdb.connect(database=":memory:")
+    _duckdb_mod.create_schema(conn)
+    # Chat ids repeat across fresh databases, so rendered responses must not carry over
+    import endpoints._api_RAG as _api_rag_mod
+    monkeypatch.setattr(_api_rag_mod, "chat_responses", _api_rag_mod.SerializedCache())
     yield conn
     conn.close()
 
 @pytest.fixture
-def app() -> FastAPI:
+def repository(fresh_db):
+    return infra_pkg.LocalRepository(fresh_db)
+
+@pytest.fixture
+def sessions(repository):
+    return infra_pkg.SessionCache(repository)
+
+@pytest.fixture(autouse=True)
+def blob_store(tmp_path):
+    """
+    Uploaded files go to a per-test blob store instead of ./uploads.
+    """
+    return infra_pkg.BlobStore(str(tmp_path / 'blobs'))
+
+@pytest.fixture
+def app(fresh_db, repository, sessions, blob_store) -> FastAPI:
     """
     Construct a FastAPI() with your two routers mounted
-    via their **public** names.
+    via their **public** names, wired to the per-test database and blob store.
     """
     application = FastAPI()
     application.include_router(api_doc_ingest)
     application.include_router(api_RAG)
+    application.dependency_overrides.update({
+        infra_pkg.get_localdb: lambda: fresh_db,
+        infra_pkg.get_repository: lambda: repository,
+        infra_pkg.get_sessions: lambda: sessions,
+        infra_pkg.get_blob_store: lambda: blob_store,
+    })
     return application
 
 @pytest.fixture
@@ -53,4 +58,5 @@ def client(app: FastAPI) -> TestClient:
     """
     A TestClient to hit your test_endpoints.
     """
-    return TestClient(app)
+    # Endpoints answer with 302 redirects, which the tests assert on
+    return TestClient(app, follow_redirects=False)
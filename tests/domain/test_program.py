@@ -0,0 +1,81 @@
+import pytest
+
+from domain import (
+    ProgramError,
+    execute_program,
+    extract_program,
+    format_program_result,
+    table_from_context,
+)
+
+
+TABLE = [
+    ['', '2009', '2008', '2007'],
+    ['net revenue', '$ 1,200', '$ 1,000', '(100)'],
+    ['operating income', '300', '250', '200'],
+]
+
+
+def test_execute_program_chains_step_references():
+    result = execute_program('subtract(206588, 181001), divide(#0, 181001)')
+    assert result == pytest.approx((206588 - 181001) / 181001)
+
+
+def test_execute_program_constants_and_comparisons():
+    assert execute_program('multiply(0.25, const_100)') == pytest.approx(25.0)
+    assert execute_program('add(5, const_m1)') == pytest.approx(4.0)
+    assert execute_program('greater(3, 2)') is True
+    assert execute_program('exp(2, 10)') == pytest.approx(1024.0)
+
+
+def test_execute_program_table_operations():
+    assert execute_program('table_sum(net revenue, none)', TABLE) == pytest.approx(2100.0)
+    assert execute_program('table_max(operating income, none)', TABLE) == pytest.approx(300.0)
+    assert execute_program('table_average(Operating Income, none)', TABLE) == pytest.approx(250.0)
+    assert execute_program('table_min(net revenue, none), multiply(#0, const_m1)', TABLE) == pytest.approx(100.0)
+
+
+@pytest.mark.parametrize('program', [
+    '__import__("os").system("ls")',
+    'divide(1, 0)',
+    'subtract(1, 2), divide(#3, 2)',
+    'pow(2, 3)',
+    'add(1)',
+    'add(one, two)',
+    'exp(10, 100000)',
+    'table_sum(net revenue, none)',
+    ', '.join(['add(1, 1)'] * 17),
+])
+def test_execute_program_rejects_invalid_programs(program):
+    with pytest.raises(ProgramError):
+        execute_program(program)
+
+
+def test_percentages_are_fractions():
+    table = [['', '2009', '2008'], ['growth rate', '5%', '(3.5 %)']]
+    assert execute_program('table_max(growth rate, none)', table) == pytest.approx(0.05)
+    assert execute_program('table_min(growth rate, none)', table) == pytest.approx(-0.035)
+    assert execute_program('multiply(1200, 5%)') == pytest.approx(60.0)
+
+
+def test_table_operation_requires_known_row():
+    with pytest.raises(ProgramError):
+        execute_program('table_sum(missing row, none)', TABLE)
+
+
+def test_extract_program_from_model_output():
+    reply = 'Sure!\n```\nProgram: subtract(5, 3), divide(#0, 3)\n```'
+    assert extract_program(reply) == 'subtract(5, 3), divide(#0, 3)'
+    with pytest.raises(ProgramError):
+        extract_program('The answer is 12%.')
+
+
+def test_table_from_context_reads_pipe_separated_rows():
+    context = 'pre text\n\nTABLE:\n\n | 2009 | 2008\nnet revenue | 1200 | 1000\n\nQ: question'
+    assert table_from_context(context) == [['', '2009', '2008'], ['net revenue', '1200', '1000']]
+
+
+def test_format_program_result():
+    assert format_program_result(0.141363859) == '0.14136'
+    assert format_program_result(206588.0) == '206588'
+    assert format_program_result(False) == 'no'
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from domain import ChatDetailsDTO, SerializedCache, chat_details_json
+
+
+def details_payload(history_length=2):
+    return json.dumps({
+        'id_chat': 3, 'name': 'chat', 'summary': 's',
+        'history': [
+            {
+                'id_exchange': 2 ** 64 - 1 - i, 'id_chat': 3,
+                'query': {'id_query': i, 'content_query': f'q{i}'},
+                'response': {'id_response': i, 'content_response': f'r{i}'},
+            }
+            for i in range(history_length)
+        ],
+    })
+
+
+def test_chat_details_json_matches_model_serialization():
+    body = chat_details_json(details_payload())
+    model = ChatDetailsDTO.model_validate_json(details_payload())
+
+    assert body == model.model_dump_json().encode()
+    assert json.loads(body)['history'][1]['query']['content_query'] == 'q1'
+
+
+def test_chat_details_json_rejects_invalid_history():
+    payload = json.loads(details_payload())
+    del payload['history'][0]['response']
+    with pytest.raises(ValidationError):
+        chat_details_json(json.dumps(payload))
+
+
+def test_serialized_cache_is_keyed_by_version_and_bounded():
+    cache = SerializedCache(maxsize=2)
+    cache.put(1, 1, b'one')
+    cache.put(2, 1, b'two')
+
+    assert cache.get(1, 1) == b'one'
+    assert cache.get(1, 2) is None
+
+    # Chat 2 is the least recently used entry
+    cache.put(3, 1, b'three')
+    assert cache.get(2, 1) is None
+    assert len(cache) == 2
@@ -0,0 +1,53 @@
+import anyio
+import pytest
+
+from infrastructure import AdmissionPool, Overloaded
+from infrastructure._metrics import admission_rejected, admission_wait
+
+
+def test_pool_queues_up_to_its_depth_then_rejects():
+    pool = AdmissionPool('test-depth', limit=1, queue_size=1)
+    order = []
+
+    async def scenario():
+        release = anyio.Event()
+
+        async def hold(name):
+            async with pool.admit():
+                order.append(name)
+                await release.wait()
+
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(hold, 'first')
+            await anyio.wait_all_tasks_blocked()
+            task_group.start_soon(hold, 'second')
+            await anyio.wait_all_tasks_blocked()
+            assert (pool.active, pool.queued) == (1, 1)
+
+            with pytest.raises(Overloaded) as rejected:
+                async with pool.admit():
+                    pass
+            assert rejected.value.retry_after >= 1
+            release.set()
+
+    anyio.run(scenario)
+    assert order == ['first', 'second']
+    assert (pool.active, pool.queued) == (0, 0)
+    assert admission_rejected.labels(pool='test-depth').value == 1
+    assert sum(admission_wait.labels(pool='test-depth').counts) == 2
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    pool = AdmissionPool('test-cancel', limit=1, queue_size=4)
+
+    async def scenario():
+        async with pool.admit():
+            with anyio.move_on_after(0.01):
+                async with pool.admit():
+                    pass
+            assert pool.queued == 0
+        async with pool.admit():
+            assert pool.active == 1
+
+    anyio.run(scenario)
+    assert pool.active == 0
@@ -0,0 +1,83 @@
+import os
+from datetime import datetime, timedelta
+
+import anyio
+import pytest
+
+from infrastructure._archive import archive_idle_chats, prune_archive
+from infrastructure._repository import LocalRepository, ExchangeRow
+
+
+@pytest.fixture
+def repository(fresh_db):
+    return LocalRepository(fresh_db)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return tmp_path / 'archive'
+
+
+def seed(repository, fresh_db, chats, turns=3):
+    async def scenario():
+        for id_chat in chats:
+            for seq in range(turns):
+                await repository.record_exchange(
+                    id_chat, f'chat {id_chat}', f'#{seq + 1}',
+                    ExchangeRow(seq, seq, seq, f'q{id_chat}.{seq}', seq, f'a{id_chat}.{seq}'),
+                )
+
+    anyio.run(scenario)
+
+
+def test_idle_chats_move_to_partitioned_parquet(repository, fresh_db, archive):
+    seed(repository, fresh_db, [1, 2, 3])
+    fresh_db.execute("UPDATE chats SET last_active = TIMESTAMP '2026-01-05 10:00:00' WHERE id IN (1, 2)")
+
+    archived = archive_idle_chats(fresh_db, str(archive), idle=timedelta(days=30), now=datetime(2026, 3, 1))
+
+    assert archived == 2
+    assert fresh_db.execute("SELECT id FROM chats").fetchall() == [(3,)]
+    assert fresh_db.execute("SELECT DISTINCT id_chat FROM exchanges").fetchall() == [(3,)]
+    (partition,) = os.listdir(archive)
+    assert partition == 'date=2026-01-05'
+    (path,) = fresh_db.execute("SELECT DISTINCT path FROM archived_chats").fetchone()
+    assert fresh_db.execute("SELECT DISTINCT compression FROM parquet_metadata(?)", [path]).fetchall() == [('ZSTD',)]
+
+
+def test_reads_fall_back_to_the_archive(repository, fresh_db, archive):
+    seed(repository, fresh_db, [1, 2])
+    fresh_db.execute("UPDATE chats SET last_active = TIMESTAMP '2026-01-05 10:00:00' WHERE id = 1")
+    archive_idle_chats(fresh_db, str(archive), idle=timedelta(days=30), now=datetime(2026, 3, 1))
+
+    async def scenario():
+        return (
+            await repository.get_chat(1),
+            await repository.get_history(1, last_n=2),
+            await repository.get_chat_details_json(1),
+            await repository.list_chats(),
+            await repository.allocate_chat_id(),
+        )
+
+    chat, history, (version, details), page, next_id = anyio.run(scenario)
+    assert (chat.name, chat.version) == ('chat 1', 3)
+    assert [row.content_query for row in history] == ['q1.1', 'q1.2']
+    assert version == 3 and '"q1.0"' in details
+    assert [row.id for row in page.rows] == [1, 2]
+    assert next_id not in (1, 2)
+
+
+def test_used_chat_moves_back_to_the_hot_tables(repository, fresh_db, archive):
+    seed(repository, fresh_db, [1])
+    fresh_db.execute("UPDATE chats SET last_active = TIMESTAMP '2026-01-05 10:00:00'")
+    archive_idle_chats(fresh_db, str(archive), idle=timedelta(days=30), now=datetime(2026, 3, 1))
+
+    anyio.run(repository.record_exchange, 1, 'chat 1', '#4', ExchangeRow(3, 3, 3, 'q1.3', 3, 'a1.3'))
+
+    assert fresh_db.execute("SELECT COUNT(*) FROM archived_chats").fetchone()[0] == 0
+    assert fresh_db.execute("SELECT version FROM chats WHERE id = 1").fetchone() == (4,)
+    rows = fresh_db.execute("SELECT seq FROM exchanges WHERE id_chat = 1 ORDER BY seq").fetchall()
+    assert rows == [(0,), (1,), (2,), (3,)]
+
+    # The file no longer backs any archived chat
+    assert prune_archive(fresh_db, str(archive)) == 1
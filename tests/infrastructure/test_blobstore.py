@@ -0,0 +1,47 @@
+import io
+import hashlib
+
+import duckdb
+
+from infrastructure._blobstore import BlobStore, export_document_contents
+from infrastructure._duckdb import create_schema
+
+
+def test_stage_and_commit_deduplicates(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = store.stage(io.BytesIO(b'payload'), suffix='.json')
+    second = store.stage(io.BytesIO(b'payload'))
+
+    assert first.digest == second.digest == hashlib.sha256(b'payload').hexdigest()
+    assert first.size == 7
+    assert first.path.endswith('.json')
+
+    assert store.commit(first) == store.commit(second) == store.path(first.digest)
+    assert store.exists(first.digest)
+    assert list((tmp_path / 'staging').iterdir()) == []
+
+
+def test_discard_removes_staged_file(tmp_path):
+    store = BlobStore(str(tmp_path))
+    staged = store.stage(io.BytesIO(b'rejected'))
+    store.discard(staged)
+
+    assert not store.exists(staged.digest)
+    assert list((tmp_path / 'staging').iterdir()) == []
+
+
+def test_export_document_contents_moves_blobs_out_of_duckdb(tmp_path):
+    conn = duckdb.connect(':memory:')
+    create_schema(conn)
+    conn.executemany(
+        "INSERT INTO documents (id, name, contents) VALUES (?, 'f', ?)",
+        [['a', b'one'], ['b', b'one'], ['c', b'two']],
+    )
+    # Backfills size and hash the way an older database is migrated on connect
+    create_schema(conn)
+    store = BlobStore(str(tmp_path))
+
+    assert export_document_contents(conn, store) == 2
+    assert conn.execute("SELECT COUNT(*) FROM documents WHERE contents IS NOT NULL").fetchone()[0] == 0
+    with open(store.path(hashlib.sha256(b'two').hexdigest()), 'rb') as f:
+        assert f.read() == b'two'
@@ -0,0 +1,83 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+import infrastructure._openai as openai_module
+from infrastructure._caches import LRUCache
+from infrastructure._metrics import cache_requests
+from infrastructure._scheduler import RequestScheduler
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache('test', maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache_requests.labels(cache='test', result='hit').value >= 3
+
+
+def test_lru_cache_of_size_zero_is_disabled():
+    cache = LRUCache('test', maxsize=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 1.0]
+
+
+def test_query_embeddings_are_cached():
+    inner = CountingEmbeddings()
+    embeddings = openai_module.ScheduledEmbeddings(inner, RequestScheduler(requests_per_minute=6000))
+
+    first = embeddings.embed_query('what was the revenue?')
+    first.append(99.0)  # callers get a copy
+    assert embeddings.embed_query('what was the revenue?') == [21.0, 1.0]
+    assert inner.queries == ['what was the revenue?']
+
+
+class CountingLLM:
+    def __init__(self, **kwargs):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=f'answer {self.calls}')
+
+
+class StaticRetriever:
+    def get_relevant_documents(self, query):
+        return []
+
+
+def test_deterministic_answers_are_cached(monkeypatch):
+    monkeypatch.setattr(openai_module, 'ChatOpenAI', CountingLLM)
+    rag = openai_module.MessageAwareRAG(StaticRetriever(), openai_api_key='k')
+
+    first = rag.invoke([HumanMessage(content='Q')], context='ctx')
+    second = rag.invoke([HumanMessage(content='Q')], context='ctx')
+    other = rag.invoke([HumanMessage(content='Q')], context='other ctx')
+
+    assert rag.llm.calls == 2
+    assert first.content == second.content == 'answer 1'
+    assert other.content == 'answer 2'
+    # Each response is annotated separately from the cached one
+    assert second is not first and 'prompt_breakdown' in second.response_metadata
+
+
+def test_sampled_answers_are_not_cached(monkeypatch):
+    monkeypatch.setattr(openai_module, 'ChatOpenAI', CountingLLM)
+    rag = openai_module.MessageAwareRAG(StaticRetriever(), openai_api_key='k', temperature=0.7)
+
+    rag.invoke([HumanMessage(content='Q')], context='ctx')
+    rag.invoke([HumanMessage(content='Q')], context='ctx')
+
+    assert rag.llm.calls == 2
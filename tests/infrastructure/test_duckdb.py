@@ -3,20 +3,21 @@ import pytest
 from infrastructure import _duckdb as db_module
 
 
-def test_duckdb_connection_has_execute():
+def test_connect_creates_the_schema():
     """
-    Ensure the module-level duckdb_connection exists and has an execute method.
+    A fresh connection comes back with the schema in place.
     """
-    conn = db_module.duckdb_connection
-    assert hasattr(conn, 'execute'), 'duckdb_connection should have an execute() method'
+    conn = db_module.connect(':memory:')
+    assert hasattr(conn, 'execute'), 'connect() should return a connection with an execute() method'
+    assert conn.execute("SELECT COUNT(*) FROM chats").fetchone() == (0,)
 
 
-def test_chats_table_schema():
+def test_chats_table_schema(fresh_db):
     """
     Verify that the 'chats' table exists with the expected columns and types.
     """
     # Query information_schema for column definitions
-    rows = db_module.duckdb_connection.execute(
+    rows = fresh_db.execute(
         """
         SELECT column_name, data_type
         FROM information_schema.columns
@@ -30,16 +31,56 @@ def test_chats_table_schema():
         ('id', 'BIGINT'),
         ('name', 'VARCHAR'),
         ('summary', 'VARCHAR'),
-        ('history', 'VARCHAR'),
+        ('version', 'BIGINT'),
+        ('last_active', 'TIMESTAMP'),
     ]
     assert cols == expected, f"Expected chats schema {expected}, got {cols}"
 
 
-def test_documents_table_schema():
+def test_exchanges_table_schema(fresh_db):
+    """
+    Verify that the append-only 'exchanges' table exists with the expected columns and types.
+    """
+    rows = fresh_db.execute(
+        """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = 'exchanges'
+        ORDER BY ordinal_position
+        """
+    ).fetchall()
+    cols = [(name, dtype.upper()) for name, dtype in rows]
+    expected = [
+        ('id_chat', 'BIGINT'),
+        ('seq', 'BIGINT'),
+        ('id_exchange', 'UBIGINT'),
+        ('id_query', 'BIGINT'),
+        ('content_query', 'VARCHAR'),
+        ('id_response', 'UBIGINT'),
+        ('content_response', 'VARCHAR'),
+    ]
+    assert cols == expected, f"Expected exchanges schema {expected}, got {cols}"
+
+
+def test_exchanges_primary_key_rejects_duplicate_sequence():
+    """
+    Two exchanges of the same chat cannot share a sequence number.
+    """
+    import duckdb
+
+    conn = duckdb.connect(':memory:')
+    db_module.create_schema(conn)
+    insert = "INSERT INTO exchanges VALUES (1, 0, 1, 0, 'q', 1, 'r')"
+    conn.execute(insert)
+    with pytest.raises(duckdb.ConstraintException):
+        conn.execute(insert)
+
+
+def test_documents_table_schema(fresh_db):
     """
     Verify that the 'documents' table exists with the expected columns and types.
     """
-    rows = db_module.duckdb_connection.execute(
+    rows = fresh_db.execute(
         """
         SELECT column_name, data_type
         FROM information_schema.columns
@@ -51,20 +92,101 @@ def test_documents_table_schema():
     expected = [
         ('id', 'VARCHAR'),
         ('name', 'VARCHAR'),
+        ('size', 'BIGINT'),
+        ('hash', 'VARCHAR'),
         ('contents', 'BLOB'),
     ]
     assert cols == expected, f"Expected documents schema {expected}, got {cols}"
 
 
-def test_tables_are_empty_initially():
+def test_create_schema_backfills_document_metadata():
+    """
+    A documents table from before the size/hash columns is migrated in place.
+    """
+    import duckdb
+
+    conn = duckdb.connect(':memory:')
+    conn.execute("CREATE TABLE documents (id VARCHAR PRIMARY KEY, name VARCHAR, contents BLOB)")
+    conn.execute("INSERT INTO documents VALUES ('a', 'f', 'hello'::BLOB)")
+    db_module.create_schema(conn)
+
+    assert conn.execute("SELECT size, hash FROM documents").fetchone() == (
+        5, '2cf24dba5fb0a30e26e83b2ac5b9e29e1b161e5c1fa7425e73043362938b9824'
+    )
+
+
+def test_chat_id_sequence_starts_past_existing_chats():
+    """
+    A database from before the sequence does not hand out ids that are already taken.
+    """
+    import duckdb
+
+    conn = duckdb.connect(':memory:')
+    conn.execute("CREATE TABLE chats (id BIGINT PRIMARY KEY, name VARCHAR, summary VARCHAR)")
+    conn.execute("INSERT INTO chats VALUES (4, 'n', 's')")
+    db_module.create_schema(conn)
+    db_module.create_schema(conn)
+
+    assert conn.execute("SELECT nextval('chat_ids')").fetchone() == (5,)
+
+
+def test_tables_are_empty_initially(fresh_db):
     """
     Ensure that both tables start out empty in the fresh DB.
     """
-    count_chats = db_module.duckdb_connection.execute(
+    count_chats = fresh_db.execute(
         "SELECT COUNT(*) FROM chats"
     ).fetchone()[0]
-    count_docs = db_module.duckdb_connection.execute(
+    count_docs = fresh_db.execute(
         "SELECT COUNT(*) FROM documents"
     ).fetchone()[0]
     assert count_chats == 0, 'Expected chats table to be empty initially'
     assert count_docs == 0, 'Expected documents table to be empty initially'
+
+
+class DummyVectorStore:
+    def __init__(self, ids):
+        self.ids = ids
+        self.pages = []
+
+    def get(self, include, limit, offset):
+        self.pages.append((limit, offset))
+        return {'ids': self.ids[offset:offset + limit]}
+
+
+def test_connect_file_database_survives_reconnect(tmp_path):
+    """
+    A file-backed database keeps its rows across connections and reopens with the schema intact.
+    """
+    path = str(tmp_path / 'nested' / 'local.duckdb')
+    conn = db_module.connect(path)
+    conn.execute("INSERT INTO chats (id, name, summary) VALUES (1, 'name', 'summary')")
+    db_module.checkpoint(conn)
+    conn.close()
+
+    # Reconnecting re-runs the idempotent schema creation
+    conn = db_module.connect(path)
+    assert conn.execute("SELECT name FROM chats WHERE id = 1").fetchone() == ('name',)
+    conn.close()
+
+
+def test_verify_document_ids_reports_and_prunes_orphans():
+    """
+    Chunk ids are compared in bulk, paging through the vector store.
+    """
+    import duckdb
+
+    conn = duckdb.connect(':memory:')
+    db_module.create_schema(conn)
+    conn.executemany("INSERT INTO documents (id, name) VALUES (?, 'f')", [['a'], ['b'], ['orphan']])
+    store = DummyVectorStore(['a', 'b', 'c', 'd', 'e'])
+
+    report = db_module.verify_document_ids(conn, store, page_size=2)
+    assert (report.documents, report.vectors) == (3, 5)
+    assert report.missing_in_vectorstore == 1
+    assert report.missing_in_duckdb == 3
+    assert not report.consistent
+    assert store.pages == [(2, 0), (2, 2), (2, 4)]
+
+    db_module.verify_document_ids(conn, store, page_size=2, prune=True)
+    assert conn.execute("SELECT id FROM documents ORDER BY id").fetchall() == [('a',), ('b',)]
@@ -0,0 +1,34 @@
+import multiprocessing
+
+from infrastructure._invalidation import ChangeBoard
+
+
+def bump_many(path, key, times):
+    board = ChangeBoard(path, slots=8)
+    for _ in range(times):
+        board.bump(key)
+    board.close()
+
+
+def test_counters_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'board')
+    board, other = ChangeBoard(path, slots=8), ChangeBoard(path, slots=8)
+
+    assert board.stamp(3) == 0
+    assert other.bump(3) == 1
+    assert board.stamp(3) == 1
+    # Keys share slots modulo the slot count
+    assert board.stamp(11) == 1 and board.stamp(4) == 0
+
+
+def test_bumps_from_several_processes_are_not_lost(tmp_path):
+    path = str(tmp_path / 'board')
+    board = ChangeBoard(path, slots=8)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=bump_many, args=(path, 5, 200)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert board.stamp(5) == 800
@@ -0,0 +1,65 @@
+import threading
+
+from infrastructure._metrics import MetricsRegistry
+
+
+def test_counters_and_gauges_render_per_label_set():
+    registry = MetricsRegistry()
+    tokens = registry.counter('tokens_total', 'Tokens', ('kind',))
+    tokens.labels(kind='prompt').inc(5)
+    tokens.labels(kind='prompt').inc(2)
+    tokens.labels(kind='completion').inc()
+    in_flight = registry.gauge('in_flight', 'Requests')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    assert registry.render().splitlines() == [
+        '# HELP tokens_total Tokens',
+        '# TYPE tokens_total counter',
+        'tokens_total{kind="completion"} 1.0',
+        'tokens_total{kind="prompt"} 7.0',
+        '# HELP in_flight Requests',
+        '# TYPE in_flight gauge',
+        'in_flight 1.0',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.labels(stage='llm').observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'latency_seconds_bucket{stage="llm",le="0.1"} 1',
+        'latency_seconds_bucket{stage="llm",le="1.0"} 3',
+        'latency_seconds_bucket{stage="llm",le="+Inf"} 4',
+        'latency_seconds_sum{stage="llm"} 4.25',
+        'latency_seconds_count{stage="llm"} 4',
+    ]
+
+
+def test_label_values_are_escaped_and_names_registered_once():
+    registry = MetricsRegistry()
+    first = registry.counter('hits_total', 'Hits', ('path',))
+    assert registry.counter('hits_total', 'Hits', ('path',)) is first
+    first.labels(path='a"b\\c').inc()
+    assert 'hits_total{path="a\\"b\\\\c"} 1.0' in registry.render()
+
+
+def test_updates_from_many_threads_are_not_lost():
+    registry = MetricsRegistry()
+    counter = registry.counter('events_total', 'Events')
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 'events_total 8000.0' in registry.render()
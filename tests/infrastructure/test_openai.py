@@ -6,7 +6,7 @@ import infrastructure._openai as openai_module
 
 
 class DummyLLM:
-    def __init__(self, openai_api_key: str, model_name: str, temperature: float):
+    def __init__(self, openai_api_key: str, model_name: str, temperature: float, **client_kwargs):
         # capture constructor args
         self.openai_api_key = openai_api_key
         self.model_name = model_name
@@ -16,7 +16,7 @@ class DummyLLM:
     def invoke(self, messages: List):
         # capture the messages and return a dummy response
         self.invoked_with = messages
-        return 'dummy_response'
+        return AIMessage(content='dummy_response')
 
 
 class DummyRetriever:
@@ -70,21 +70,47 @@ def test_invoke_calls_llm_with_correct_messages_and_context():
     # Invoke
     result = rag.invoke(history + [query])
 
-    # Should return dummy_response
-    assert result == 'dummy_response'
+    # Should return dummy_response with the per-turn token breakdown attached
+    assert result.content == 'dummy_response'
+    breakdown = result.response_metadata['prompt_breakdown']
+    assert breakdown['total'] == sum(
+        breakdown[segment] for segment in ('instructions', 'summary', 'history', 'context', 'query')
+    )
 
-    # Check that llm.invoke was called with [SystemMessage, query]
+    # Segments go from most to least stable: instructions, history, context, then the query
     invoked = rag.llm.invoked_with
-    assert len(invoked) == 2
-    sys_msg, query_msg = invoked
+    assert len(invoked) == 5
+    sys_msg, user_msg, ai_msg, context_msg, query_msg = invoked
     assert isinstance(sys_msg, SystemMessage)
+    assert sys_msg.content == openai_module.DEFAULT_INSTRUCTIONS
+    assert user_msg.content == 'Hi'
+    assert ai_msg.content == 'Hello back'
+    assert isinstance(context_msg, SystemMessage)
+    assert 'Doc1' in context_msg.content
+    assert 'Doc2' in context_msg.content
     assert query_msg is query
 
-    # Verify system prompt content includes history and context
-    sys_text = sys_msg.content
-    # History formatting: 'User: Hi', 'Assistant: Hello back'
-    assert 'User: Hi' in sys_text
-    assert 'Assistant: Hello back' in sys_text
-    # Context formatting: joined docs
-    assert 'Doc1' in sys_text
-    assert 'Doc2' in sys_text
+
+def test_invoke_prefix_is_stable_across_turns():
+    retriever = DummyRetriever(['turn specific context'])
+    rag = openai_module.MessageAwareRAG(retriever, openai_api_key='k')
+
+    first_turn = [HumanMessage(content='Q1'), AIMessage(content='A1'), HumanMessage(content='Q2')]
+    rag.invoke(first_turn)
+    first_prompt = [msg.content for msg in rag.llm.invoked_with]
+
+    rag.invoke(first_turn + [AIMessage(content='A2'), HumanMessage(content='Q3')])
+    second_prompt = [msg.content for msg in rag.llm.invoked_with]
+
+    # Everything before the previous turn's context is byte-identical
+    assert second_prompt[:3] == first_prompt[:3]
+
+
+def test_standin_url_switches_client_base(monkeypatch):
+    monkeypatch.setattr(openai_module, 'LLM_STANDIN_URL', 'http://127.0.0.1:8001/v1')
+    assert openai_module._client_kwargs() == {'openai_api_base': 'http://127.0.0.1:8001/v1'}
+    rag = openai_module.MessageAwareRAG(DummyRetriever([]), openai_api_key='standin')
+    assert isinstance(rag.llm, DummyLLM)
+
+    monkeypatch.setattr(openai_module, 'LLM_STANDIN_URL', None)
+    assert openai_module._client_kwargs() == {}
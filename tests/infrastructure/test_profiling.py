@@ -0,0 +1,47 @@
+import time
+
+from infrastructure._profiling import ProfileStore, SamplingProfiler
+
+
+def busy_wait(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_sees_other_threads():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    busy_wait(0.05)
+    samples = profiler.stop()
+
+    assert sum(samples.values()) > 0
+    assert any('busy_wait' in stack for stack in samples)
+    assert all(not stack.startswith('profiler;') for stack in samples)
+
+
+def test_store_profiles_one_request_at_a_time_and_keeps_the_newest(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    names = []
+    for i in range(3):
+        profiler = store.start(interval=0.001)
+        assert store.start() is None
+        busy_wait(0.01)
+        names.append(store.stop(profiler, store.new_name(f'GET /chats/{i}')))
+        time.sleep(0.002)
+
+    assert [info.name for info in store.list()] == names[:0:-1]
+    assert '-GET-chats-0-' in names[0]
+    summary = store.summary(names[-1])
+    assert summary['samples'] > 0
+    assert any('busy_wait' in frame for frame, _ in summary['total'])
+
+
+def test_path_rejects_names_outside_the_store(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    (tmp_path / 'secret.txt').write_text('x')
+
+    assert store.path('../secret.txt') is None
+    assert store.path('secret.txt') is None
+    assert store.path('missing.folded') is None
+    assert store.summary('missing.folded') is None
@@ -0,0 +1,85 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from infrastructure._prompt import PromptBuilder
+
+
+def make_history(turns, words=20):
+    history = []
+    for i in range(turns):
+        history.append(HumanMessage(content=f'question {i} ' + 'word ' * words))
+        history.append(AIMessage(content=f'answer {i} ' + 'word ' * words))
+    return history
+
+
+def test_build_orders_segments_from_most_to_least_stable():
+    builder = PromptBuilder(budget=2000)
+    history = make_history(2, words=2)
+    query = HumanMessage(content='and in 2009?')
+
+    messages, breakdown = builder.build('instructions', history, 'the context', query, summary='so far')
+
+    assert [type(msg) for msg in messages] == [
+        SystemMessage, SystemMessage, HumanMessage, AIMessage, HumanMessage, AIMessage, SystemMessage, HumanMessage
+    ]
+    assert messages[0].content == 'instructions'
+    assert 'so far' in messages[1].content
+    assert messages[-2].content == 'Context:\nthe context'
+    assert messages[-1] is query
+    assert breakdown.dropped_exchanges == 0
+    assert not breakdown.context_truncated
+
+
+def test_build_respects_budget():
+    builder = PromptBuilder(budget=500)
+    messages, breakdown = builder.build(
+        'instructions', make_history(30), 'context ' * 2000, HumanMessage(content='q')
+    )
+
+    assert breakdown.total <= 500
+    assert breakdown.dropped_exchanges > 0
+    assert breakdown.context_truncated
+    assert sum(builder.count(msg.content) for msg in messages) == breakdown.total
+
+
+def test_history_is_trimmed_in_blocks_so_prefix_survives_several_turns():
+    builder = PromptBuilder(budget=1200, trim_block=4)
+    prefixes = []
+    for turns in range(20, 24):
+        messages, _ = builder.build('instructions', make_history(turns), 'ctx', HumanMessage(content='q'))
+        prefixes.append([msg.content for msg in messages[:4]])
+
+    # Consecutive turns keep dropping the same whole block, so most turns share their prefix
+    assert sum(prefixes[i] == prefixes[i + 1] for i in range(len(prefixes) - 1)) >= 2
+
+
+def test_unused_context_budget_goes_to_history():
+    builder = PromptBuilder(budget=1000)
+    history = make_history(8)
+    _, with_context = builder.build('i', history, 'context ' * 1000, HumanMessage(content='q'))
+    _, without_context = builder.build('i', history, '', HumanMessage(content='q'))
+
+    assert without_context.history >= with_context.history
+    assert without_context.context == 0
+
+
+def test_long_query_does_not_let_history_crowd_out_context():
+    builder = PromptBuilder(budget=1000)
+    # The query leaves less than the history and context shares together
+    query = HumanMessage(content='why ' * 700)
+    messages, breakdown = builder.build('i', make_history(30), 'context ' * 300, query)
+
+    assert breakdown.total <= 1000
+    assert breakdown.context > 0
+    assert breakdown.dropped_exchanges > 0
+    assert sum(builder.count(msg.content) for msg in messages) == breakdown.total
+
+
+def test_history_keeps_to_its_share_when_context_needs_the_room():
+    builder = PromptBuilder(budget=1000, trim_block=1)
+    messages, breakdown = builder.build('i', make_history(30), 'context ' * 2000, HumanMessage(content='q'))
+
+    # Both segments want more than they get: history stops at its share and the context takes the rest
+    assert breakdown.history <= builder._share('history')
+    assert breakdown.context > builder._share('context')
+    assert breakdown.total <= 1000
+    assert sum(builder.count(msg.content) for msg in messages) == breakdown.total
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import infrastructure as infra_pkg
+from infrastructure import _providers
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_providers_build_once(monkeypatch):
+    monkeypatch.setattr(_providers, 'connect', lambda: object())
+    _providers.get_localdb.cache_clear()
+    _providers.get_repository.cache_clear()
+    try:
+        assert _providers.get_localdb() is _providers.get_localdb()
+        assert _providers.get_repository().connection is _providers.get_localdb()
+        # The package-level names resolve to the same instances
+        assert infra_pkg.localdb is _providers.get_localdb()
+    finally:
+        _providers.get_localdb.cache_clear()
+        _providers.get_repository.cache_clear()
+
+
+def test_importing_the_app_builds_nothing(tmp_path):
+    cwd = tmp_path / 'cwd'
+    cwd.mkdir()
+    env = {k: v for k, v in os.environ.items() if k != 'OPENAI_API_KEY'}
+    env['PYTHONPATH'] = ROOT
+    # No API key and a working directory without db/: importing must neither fail nor create files
+    subprocess.run(
+        [sys.executable, '-c', 'import main, infrastructure._providers as p; '
+         'assert all(f.cache_info().currsize == 0 for f in (p.get_localdb, p.get_vectorstore, p.get_llm_chat))'],
+        cwd=cwd, env=env, check=True,
+    )
+    assert os.listdir(cwd) == []
+
+
+def test_building_the_vector_store_checks_it_against_the_database(fresh_db, monkeypatch):
+    import threading
+    import infrastructure._chromadb as chromadb_module
+    checked = threading.Event()
+    monkeypatch.setattr(_providers, 'get_embeddings', lambda: 'embeddings')
+    monkeypatch.setattr(_providers, 'get_localdb', lambda: fresh_db)
+    monkeypatch.setattr(chromadb_module, 'get_vector_store', lambda embeddings: 'store')
+    monkeypatch.setattr(_providers, 'verify_document_ids', lambda localdb, store: checked.set())
+    _providers.get_vectorstore.cache_clear()
+    try:
+        assert _providers.get_vectorstore() == 'store'
+        assert checked.wait(5)
+    finally:
+        _providers.get_vectorstore.cache_clear()
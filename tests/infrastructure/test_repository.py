@@ -0,0 +1,141 @@
+import threading
+
+import anyio
+import pytest
+
+from infrastructure._repository import LocalRepository, ChatRow, ExchangeRow, DocumentRow, ConcurrentUpdateError
+
+
+@pytest.fixture
+def repository(fresh_db):
+    return LocalRepository(fresh_db)
+
+
+def exchange(seq):
+    return ExchangeRow(seq, 100 + seq, seq, f'q{seq}', seq, f'a{seq}')
+
+
+def test_chats_round_trip(repository):
+    async def scenario():
+        assert await repository.allocate_chat_id() == 0
+        assert await repository.get_chat(0) is None
+        await repository.record_exchange(0, 'first', 's #1', exchange(0))
+        await repository.record_exchange(0, 'renamed', 's #2', exchange(1))
+        return await repository.list_chats(), await repository.allocate_chat_id()
+
+    page, next_id = anyio.run(scenario)
+    assert page.rows == [ChatRow(0, 'renamed', 's #2', version=2)]
+    assert page.next_after is None
+    assert next_id == 1
+
+
+def test_history_is_chronological_and_limited(repository):
+    async def scenario():
+        for seq in range(5):
+            await repository.record_exchange(7, 'chat', 's', exchange(seq))
+        return (
+            await repository.get_history(7),
+            await repository.get_history(7, last_n=2),
+            await repository.next_sequence(7),
+        )
+
+    history, latest, next_seq = anyio.run(scenario)
+    assert [row.seq for row in history] == [0, 1, 2, 3, 4]
+    assert latest == [exchange(3), exchange(4)]
+    assert next_seq == 5
+
+
+def test_record_exchange_is_atomic(repository):
+    async def scenario():
+        await repository.record_exchange(1, 'chat', 's #1', exchange(0))
+        with pytest.raises(Exception):
+            # Duplicate (id_chat, seq) must not leave a renamed chat behind
+            await repository.record_exchange(1, 'renamed', 's #2', exchange(0))
+        return await repository.get_chat(1)
+
+    assert anyio.run(scenario) == ChatRow(1, 'chat', 's #1', version=1)
+
+
+def test_insert_documents_skips_existing(repository):
+    async def scenario():
+        await repository.insert_documents(['a', 'b'], 'first.pdf', 3, 'one')
+        await repository.insert_documents(['b', 'c'], 'second.pdf', 5, 'two')
+        return await repository.list_documents(), await repository.get_document('missing')
+
+    page, missing = anyio.run(scenario)
+    assert page.rows == [
+        DocumentRow('a', 'first.pdf', 3, 'one'),
+        DocumentRow('b', 'first.pdf', 3, 'one'),
+        DocumentRow('c', 'second.pdf', 5, 'two'),
+    ]
+    assert missing is None
+
+
+def test_listings_page_by_key(repository):
+    async def scenario():
+        for id_chat in range(7):
+            await repository.record_exchange(id_chat, f'chat {id_chat}', 's', exchange(0))
+        pages, after = [], None
+        while True:
+            page = await repository.list_chats(after=after, limit=3)
+            pages.append([row.id for row in page.rows])
+            if page.next_after is None:
+                return pages
+            after = page.next_after
+
+    assert anyio.run(scenario) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_queries_run_off_the_event_loop_on_their_own_cursor(repository, monkeypatch):
+    seen = []
+    original = repository.cursor
+
+    def tracking_cursor():
+        seen.append(threading.get_ident())
+        return original()
+
+    monkeypatch.setattr(repository, 'cursor', tracking_cursor)
+
+    async def scenario():
+        async with anyio.create_task_group() as tg:
+            for _ in range(8):
+                tg.start_soon(repository.list_chats)
+        return threading.get_ident()
+
+    loop_thread = anyio.run(scenario)
+    assert len(seen) == 8
+    assert loop_thread not in seen
+
+
+def test_allocated_chat_ids_are_unique_and_skip_taken_ids(repository):
+    async def scenario():
+        await repository.record_exchange(1, 'explicit id', 's', exchange(0))
+        ids = []
+
+        async def allocate():
+            ids.append(await repository.allocate_chat_id())
+
+        async with anyio.create_task_group() as tg:
+            for _ in range(10):
+                tg.start_soon(allocate)
+        return ids
+
+    ids = anyio.run(scenario)
+    assert len(set(ids)) == 10
+    assert 1 not in ids
+
+
+def test_record_exchange_refuses_a_stale_version(repository):
+    async def scenario():
+        await repository.record_exchange(2, 'chat', 's #1', exchange(0), expected_version=0)
+        await repository.record_exchange(2, 'chat', 's #2', exchange(1), expected_version=1)
+        with pytest.raises(ConcurrentUpdateError):
+            # Written from a copy that has not seen turn 1
+            await repository.record_exchange(2, 'stale', 's #2', exchange(2), expected_version=1)
+        with pytest.raises(ConcurrentUpdateError):
+            await repository.record_exchange(2, 'duplicate', 's #1', exchange(5), expected_version=0)
+        return await repository.get_chat(2), await repository.next_sequence(2)
+
+    chat, next_seq = anyio.run(scenario)
+    assert chat == ChatRow(2, 'chat', 's #2', version=2)
+    assert next_seq == 2
@@ -0,0 +1,136 @@
+import httpx
+import pytest
+from openai import APITimeoutError
+from langchain_core.messages import AIMessage, HumanMessage
+
+from infrastructure._routing import (
+    ModelRouter,
+    ModelTier,
+    TierStats,
+    classify_request,
+    parse_ladder,
+)
+from infrastructure._scheduler import RequestScheduler
+
+
+LADDER = [ModelTier('small', 1.0), ModelTier('medium', 5.0), ModelTier('large', 20.0)]
+
+
+class DummyTierLLM:
+    def __init__(self, tier, fail_with=None):
+        self.tier = tier
+        self.fail_with = fail_with
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.fail_with is not None:
+            raise self.fail_with
+        return AIMessage(
+            content=f'answer from {self.tier.model_name}',
+            usage_metadata={'input_tokens': 10, 'output_tokens': 2, 'total_tokens': 12},
+        )
+
+
+def make_router(failing=(), classifier=None, scheduler=None):
+    timeout = APITimeoutError(request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+    llms = {}
+
+    def factory(tier):
+        llms[tier.model_name] = DummyTierLLM(tier, fail_with=timeout if tier.model_name in failing else None)
+        return llms[tier.model_name]
+
+    kwargs = {'classifier': classifier} if classifier else {}
+    return ModelRouter(LADDER, llm_factory=factory, scheduler=scheduler, **kwargs), llms
+
+
+def test_parse_ladder():
+    assert parse_ladder('gpt-4o-mini:8, gpt-4:30') == [ModelTier('gpt-4o-mini', 8.0), ModelTier('gpt-4', 30.0)]
+
+
+def test_classify_request_scores_features():
+    assert classify_request('and in 2009?') == 0
+    assert classify_request('what was the percentage change in revenue?') == 1
+    assert classify_request('what was the change?', context='word ' * 20000) == 2
+
+
+@pytest.mark.parametrize('question', [
+    'and in 2008-2009?',
+    'what about 2008 / 2009?',
+    'and for Q3/Q4?',
+    'what was it for the 10-K?',
+])
+def test_classify_request_does_not_take_ranges_and_labels_for_arithmetic(question):
+    assert classify_request(question) == 0
+
+
+@pytest.mark.parametrize('question', ['and 206588 - 181001?', 'what is 1,200/3?', 'and $5 * 4?'])
+def test_classify_request_takes_operators_between_numbers_for_arithmetic(question):
+    assert classify_request(question) == 1
+
+
+def test_lower_rungs_time_out_within_their_budget():
+    router, _ = make_router()
+    assert router.request_timeout(LADDER[0]) < LADDER[0].latency_budget
+    assert router.request_timeout(LADDER[1]) < LADDER[1].latency_budget
+    # The top rung has nowhere to escalate to, so it gets its whole budget
+    assert router.request_timeout(LADDER[-1]) == LADDER[-1].latency_budget
+
+
+def test_router_sends_trivial_follow_up_to_cheapest_tier():
+    router, llms = make_router()
+    response = router.invoke([HumanMessage(content='and in 2009?')], question='and in 2009?')
+    assert response.content == 'answer from small'
+    assert set(llms) == {'small'}
+
+
+def test_router_escalates_on_timeout():
+    router, llms = make_router(failing={'small'})
+    response = router.invoke([HumanMessage(content='q')], question='q')
+    assert response.content == 'answer from medium'
+    report = {row['model_name']: row for row in router.report()}
+    assert report['small']['escalations'] == 1
+    assert report['medium']['requests'] == 1
+    assert report['medium']['prompt_tokens'] == 10
+    assert report['medium']['completion_tokens'] == 2
+
+
+def test_scheduler_does_not_retry_a_timed_out_tier():
+    scheduler = RequestScheduler(requests_per_minute=6000, max_retries=6, sleeper=lambda seconds: None)
+    router, llms = make_router(failing={'small'}, scheduler=scheduler, classifier=lambda question, context: 0)
+
+    response = router.invoke([HumanMessage(content='q')], question='q')
+
+    # APITimeoutError subclasses a retryable error, yet the timeout escalates at once
+    assert (llms['small'].calls, llms['medium'].calls) == (1, 1)
+    assert response.content == 'answer from medium'
+
+
+def test_router_raises_when_top_tier_times_out():
+    router, _ = make_router(failing={'small', 'medium', 'large'})
+    with pytest.raises(APITimeoutError):
+        router.invoke([HumanMessage(content='q')], question='q')
+
+
+def test_router_skips_tier_whose_p95_exceeds_budget():
+    router, _ = make_router(classifier=lambda question, context: 0)
+    for _ in range(10):
+        router.stats['small'].observe(3.0, {})
+    assert router.select_tier('q') == 1
+
+
+def test_skipped_tier_is_tried_again_once_its_latencies_age_out():
+    now = [0.0]
+    router, _ = make_router(classifier=lambda question, context: 0)
+    router.stats['small'] = TierStats(max_age=60, clock=lambda: now[0])
+    for _ in range(10):
+        router.stats['small'].observe(3.0, {})
+    assert router.select_tier('q') == 1
+
+    now[0] += 61
+    assert router.select_tier('q') == 0
+
+
+def test_router_requires_a_tier():
+    with pytest.raises(ValueError):
+        ModelRouter([], llm_factory=lambda tier: None)
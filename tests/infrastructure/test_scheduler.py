@@ -0,0 +1,167 @@
+import threading
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+import infrastructure._scheduler as scheduler_module
+from infrastructure._scheduler import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_rate_limit_error(retry_after=None):
+    headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    response = httpx.Response(429, headers=headers, request=request)
+    return RateLimitError('rate limited', response=response, body=None)
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=60, refill_per_second=1, clock=clock)
+    bucket.consume(60)
+    assert bucket.time_until(10) == pytest.approx(10.0)
+    clock.advance(5)
+    assert bucket.available() == pytest.approx(5.0)
+    clock.advance(100)
+    # Never refills past capacity
+    assert bucket.available() == pytest.approx(60.0)
+
+
+def test_token_bucket_clamps_oversized_requests():
+    bucket = TokenBucket(capacity=10, refill_per_second=1, clock=FakeClock())
+    assert bucket.time_until(1000) == 0.0
+
+
+def test_submit_retries_rate_limit_with_retry_after(monkeypatch):
+    slept = []
+    scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=10 ** 6, sleeper=slept.append)
+    calls = {'n': 0}
+
+    def flaky():
+        calls['n'] += 1
+        if calls['n'] < 3:
+            raise make_rate_limit_error(retry_after=2)
+        return 'ok'
+
+    assert scheduler.submit(flaky, tokens=10) == 'ok'
+    assert slept == [2.0, 2.0]
+    snapshot = scheduler.metrics.snapshot()
+    assert snapshot['retries'] == 2
+    assert snapshot['rate_limited'] == 2
+    assert snapshot['requests'] == 3
+
+
+def test_submit_gives_up_after_max_retries():
+    scheduler = RequestScheduler(
+        requests_per_minute=6000, tokens_per_minute=10 ** 6, max_retries=1, sleeper=lambda s: None
+    )
+
+    def always_limited():
+        raise make_rate_limit_error()
+
+    with pytest.raises(RateLimitError):
+        scheduler.submit(always_limited, tokens=1)
+
+
+def test_backoff_delay_is_jittered_and_capped(monkeypatch):
+    scheduler = RequestScheduler(base_delay=1.0, max_delay=5.0)
+    monkeypatch.setattr(scheduler_module.random, 'uniform', lambda low, high: high)
+    assert scheduler.backoff_delay(0) == 1.0
+    assert scheduler.backoff_delay(2) == 4.0
+    assert scheduler.backoff_delay(10) == 5.0
+
+
+def test_interactive_requests_are_admitted_before_bulk():
+    scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=10 ** 6)
+    # Drain the request bucket so that everyone has to queue
+    scheduler.requests.consume(scheduler.requests.capacity)
+    order = []
+
+    def worker(priority):
+        scheduler.acquire(1, priority)
+        order.append(priority)
+
+    bulk = threading.Thread(target=worker, args=(PRIORITY_BULK,))
+    bulk.start()
+    while scheduler.metrics.queue_depth['bulk'] == 0:
+        pass
+    interactive = threading.Thread(target=worker, args=(PRIORITY_INTERACTIVE,))
+    interactive.start()
+    while scheduler.metrics.queue_depth['interactive'] == 0:
+        pass
+    bulk.join(timeout=5)
+    interactive.join(timeout=5)
+
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_BULK]
+    assert scheduler.metrics.snapshot()['queue_depth'] == {'interactive': 0, 'bulk': 0}
+
+
+def test_interrupted_wait_leaves_the_queue():
+    from infrastructure._metrics import scheduler_queue_depth, scheduler_wait
+
+    clock = FakeClock()
+    scheduler = RequestScheduler(requests_per_minute=60, tokens_per_minute=10 ** 6, clock=clock)
+    scheduler.requests.consume(scheduler.requests.capacity)
+
+    class Interrupted(Exception):
+        pass
+
+    def interrupted_wait(timeout=None):
+        raise Interrupted()
+
+    original_wait = scheduler._condition.wait
+    scheduler._condition.wait = interrupted_wait
+    with pytest.raises(Interrupted):
+        scheduler.acquire(1, PRIORITY_BULK)
+    scheduler._condition.wait = original_wait
+
+    assert scheduler._waiting == []
+    assert scheduler_queue_depth.labels(priority='bulk').value == 0
+    # The next caller is not stuck behind the abandoned ticket
+    clock.advance(1)
+    observed = sum(scheduler_wait.labels(priority='interactive').counts)
+    assert scheduler.acquire(1, PRIORITY_INTERACTIVE) == 0.0
+    assert sum(scheduler_wait.labels(priority='interactive').counts) == observed + 1
+
+
+def test_scheduled_embeddings_batches_within_token_budget():
+    from infrastructure._openai import ScheduledEmbeddings
+
+    class DummyEmbeddings:
+        def __init__(self):
+            self.batches = []
+
+        def embed_documents(self, texts):
+            self.batches.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        def embed_query(self, text):
+            return [0.0]
+
+    scheduler = RequestScheduler(requests_per_minute=6000)
+    # Small bucket that refills quickly, so batches split without slowing the test down
+    scheduler.tokens = TokenBucket(capacity=10, refill_per_second=1000)
+    inner = DummyEmbeddings()
+    embeddings = ScheduledEmbeddings(inner, scheduler)
+    # Every text costs a handful of tokens, so the 10-token bucket forces several batches
+    vectors = embeddings.embed_documents(['alpha beta gamma'] * 4)
+
+    assert len(vectors) == 4
+    assert len(inner.batches) > 1
+    assert embeddings.embed_query('q') == [0.0]
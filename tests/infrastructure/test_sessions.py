@@ -0,0 +1,194 @@
+import anyio
+import pytest
+
+from infrastructure._repository import LocalRepository, ExchangeRow, ConcurrentUpdateError
+from infrastructure._invalidation import ChangeBoard
+from infrastructure._sessions import SessionCache
+
+
+@pytest.fixture
+def repository(fresh_db):
+    return LocalRepository(fresh_db)
+
+
+def exchange(seq, text='x'):
+    return ExchangeRow(seq, 100 + seq, seq, f'q{seq} {text}', seq, f'a{seq} {text}')
+
+
+def test_session_is_loaded_once_and_kept_in_memory(repository, monkeypatch):
+    cache = SessionCache(repository, history_turns=2)
+    loads = []
+    original = repository.get_history
+
+    async def counting_get_history(*args, **kwargs):
+        loads.append(args)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(repository, 'get_history', counting_get_history)
+
+    async def scenario():
+        for seq in range(3):
+            session = await cache.get(5)
+            assert session.next_seq == seq
+            await cache.record(session, 'chat', f'#{seq + 1}', exchange(seq))
+        return await cache.get(5)
+
+    session = anyio.run(scenario)
+    assert len(loads) == 1
+    # Only the last history_turns turns stay parsed in memory
+    assert [msg.content for msg in session.messages] == ['q1 x', 'a1 x', 'q2 x', 'a2 x']
+    assert session.summary == '#3'
+
+
+def test_reload_after_eviction_resumes_from_the_database(repository):
+    cache = SessionCache(repository, max_sessions=1)
+
+    async def scenario():
+        first = await cache.get(1)
+        await cache.record(first, 'one', '#1', exchange(0))
+        await cache.get(2)
+        assert len(cache) == 1
+        return await cache.get(1)
+
+    session = anyio.run(scenario)
+    assert session.next_seq == 1
+    assert session.name == 'one'
+
+
+def test_cache_is_bounded_by_message_bytes(repository):
+    cache = SessionCache(repository, max_bytes=1000)
+
+    async def scenario():
+        for id_chat in range(5):
+            session = await cache.get(id_chat)
+            await cache.record(session, 'chat', '#1', exchange(0, text='y' * 200))
+
+    anyio.run(scenario)
+    assert cache.nbytes <= 1000
+    assert len(cache) == 2
+
+
+def test_write_behind_persists_in_order_and_flushes(repository, fresh_db):
+    cache = SessionCache(repository)
+
+    async def scenario():
+        async with anyio.create_task_group() as task_group:
+            cache.start(task_group)
+            session = await cache.get(3)
+            for seq in range(4):
+                await cache.record(session, 'chat', f'#{seq + 1}', exchange(seq))
+            # Readers wait for the chat's queued turns
+            await cache.settled(3)
+            persisted = fresh_db.execute("SELECT COUNT(*) FROM exchanges WHERE id_chat = 3").fetchone()[0]
+            await cache.record(session, 'chat', '#5', exchange(4))
+            await cache.flush()
+        return persisted
+
+    assert anyio.run(scenario) == 4
+    rows = fresh_db.execute("SELECT seq FROM exchanges WHERE id_chat = 3 ORDER BY seq").fetchall()
+    assert rows == [(seq,) for seq in range(5)]
+    assert fresh_db.execute("SELECT summary FROM chats WHERE id = 3").fetchone() == ('#5',)
+
+
+def test_failed_write_drops_the_cached_session(repository):
+    cache = SessionCache(repository)
+
+    async def scenario():
+        async with anyio.create_task_group() as task_group:
+            cache.start(task_group)
+            session = await cache.get(9)
+            await cache.record(session, 'chat', '#1', exchange(0))
+            await cache.record(session, 'chat', '#2', exchange(1))
+            # Same sequence number again violates the primary key in the background
+            await cache.record(session, 'chat', '#3', exchange(1))
+            await cache.flush()
+
+    anyio.run(scenario)
+    assert len(cache) == 0
+
+
+def test_chat_lock_orders_turns_of_one_chat_and_not_others(repository):
+    cache = SessionCache(repository)
+    events = []
+
+    async def turn(id_chat, label, delay):
+        async with cache.lock(id_chat):
+            events.append(('start', label))
+            await anyio.sleep(delay)
+            events.append(('end', label))
+
+    async def scenario():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(turn, 1, 'a1', 0.05)
+            await anyio.sleep(0.01)
+            tg.start_soon(turn, 1, 'a2', 0)
+            tg.start_soon(turn, 2, 'b1', 0)
+
+    anyio.run(scenario)
+    # b1 ran while a1 held chat 1; a2 waited for a1 to finish
+    assert events.index(('end', 'b1')) < events.index(('end', 'a1'))
+    assert events.index(('end', 'a1')) < events.index(('start', 'a2'))
+    assert cache._locks == {}
+
+
+def test_write_from_a_stale_session_is_refused(repository):
+    other = SessionCache(repository)
+    cache = SessionCache(repository)
+
+    async def scenario():
+        session = await cache.get(4)
+        await cache.record(session, 'chat', '#1', exchange(0))
+        # Another worker appends a turn the cached session has not seen
+        elsewhere = await other.get(4)
+        await other.record(elsewhere, 'chat', '#2', exchange(1, 'other'))
+        with pytest.raises(ConcurrentUpdateError):
+            await cache.record(session, 'chat', '#2', exchange(1))
+        return await cache.get(4)
+
+    session = anyio.run(scenario)
+    assert [msg.content for msg in session.messages][-1] == 'a1 other'
+    assert session.version == 2
+
+
+def test_change_board_makes_workers_reload_chats_changed_elsewhere(repository, tmp_path, monkeypatch):
+    board = ChangeBoard(str(tmp_path / 'board'), slots=16)
+    cache = SessionCache(repository, board=board)
+    other = SessionCache(repository, board=ChangeBoard(board.path, slots=16))
+    loads = []
+    original = repository.get_chat
+
+    async def counting_get_chat(*args, **kwargs):
+        loads.append(args)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(repository, 'get_chat', counting_get_chat)
+
+    async def scenario():
+        session = await cache.get(4)
+        await cache.record(session, 'chat', '#1', exchange(0))
+        # The worker's own write leaves its copy current
+        assert await cache.get(4) is session
+        elsewhere = await other.get(4)
+        await other.record(elsewhere, 'chat', '#2', exchange(1, 'other'))
+        # So the next turn here starts from the other worker's turn instead of failing
+        session = await cache.get(4)
+        await cache.record(session, 'chat', '#3', exchange(2))
+        return session
+
+    session = anyio.run(scenario)
+    assert len(loads) == 3
+    assert [msg.content for msg in session.messages][-3:] == ['a1 other', 'q2 x', 'a2 x']
+    assert session.version == 3
+
+
+def test_history_window_starts_on_a_block():
+    from infrastructure._sessions import ChatSession
+    session = ChatSession(id_chat=1, name='', summary='', next_seq=0)
+    for seq in range(10):
+        session.append(f'q{seq}', f'a{seq}', keep_turns=8)
+        session.next_seq = seq + 1
+
+    # The last 3 turns are 7..9; the window reaches back to turn 6, the start of their block of 2
+    assert [msg.content for msg in session.history(3, block=2)][::2] == ['q6', 'q7', 'q8', 'q9']
+    # Never further back than the turns still held
+    assert [msg.content for msg in session.history(20, block=4)][::2] == [f'q{seq}' for seq in range(2, 10)]
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from infrastructure._standin import (
+    LatencyProfile,
+    create_app,
+    deterministic_embedding,
+)
+
+
+@pytest.fixture
+def standin_client() -> TestClient:
+    return TestClient(create_app(LatencyProfile(), canned={'2009': 'canned reply'}))
+
+
+def test_deterministic_embedding_is_stable_and_normalised():
+    first = deterministic_embedding('revenue in 2009', dimensions=32)
+    assert first == deterministic_embedding('revenue in 2009', dimensions=32)
+    assert first != deterministic_embedding('revenue in 2008', dimensions=32)
+    assert sum(x * x for x in first) == pytest.approx(1.0)
+
+
+def test_chat_completions_templated_and_canned(standin_client: TestClient):
+    body = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': 'what was revenue?'}]}
+    resp = standin_client.post('/v1/chat/completions', json=body)
+    assert resp.status_code == status.HTTP_200_OK
+    data = resp.json()
+    assert data['choices'][0]['message']['content'] == 'Stand-in answer from gpt-4 to: what was revenue?'
+    assert data['usage']['total_tokens'] == data['usage']['prompt_tokens'] + data['usage']['completion_tokens']
+
+    body['messages'][0]['content'] = 'and in 2009?'
+    resp = standin_client.post('/v1/chat/completions', json=body)
+    assert resp.json()['choices'][0]['message']['content'] == 'canned reply'
+
+
+def test_embeddings_accept_strings_and_token_arrays(standin_client: TestClient):
+    resp = standin_client.post('/v1/embeddings', json={'input': ['a', 'b'], 'dimensions': 8})
+    data = resp.json()['data']
+    assert [item['index'] for item in data] == [0, 1]
+    assert all(len(item['embedding']) == 8 for item in data)
+
+    resp = standin_client.post('/v1/embeddings', json={'input': [1, 2, 3], 'dimensions': 8})
+    assert len(resp.json()['data']) == 1
+
+
+def test_rate_limited_profile_returns_429_with_retry_after():
+    client = TestClient(create_app(LatencyProfile(requests_per_minute=1), canned={}))
+    body = {'model': 'm', 'messages': [{'role': 'user', 'content': 'q'}]}
+    assert client.post('/v1/chat/completions', json=body).status_code == status.HTTP_200_OK
+    resp = client.post('/v1/chat/completions', json=body)
+    assert resp.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(resp.headers['retry-after']) >= 1
+
+
+def test_langchain_openai_clients_talk_to_standin(standin_client: TestClient):
+    # The real clients, pointed at the stand-in through its base URL
+    chat = ChatOpenAI(
+        openai_api_key='standin', openai_api_base='http://testserver/v1', http_client=standin_client, max_retries=0
+    )
+    reply = chat.invoke([HumanMessage(content='hello')])
+    assert reply.content.endswith('to: hello')
+
+    embeddings = OpenAIEmbeddings(
+        openai_api_key='standin',
+        openai_api_base='http://testserver/v1',
+        http_client=standin_client,
+        check_embedding_ctx_length=False,
+        max_retries=0,
+    )
+    vectors = embeddings.embed_documents(['x', 'y'])
+    assert len(vectors) == 2
+    assert embeddings.embed_query('x') == pytest.approx(vectors[0])
@@ -0,0 +1,96 @@
+import anyio
+import httpx
+import pytest
+
+from infrastructure._remote_repository import RemoteRepository
+from infrastructure._repository import ChatRow, ConcurrentUpdateError, DocumentRow, ExchangeRow, LocalRepository
+from infrastructure._sessions import SessionCache
+from infrastructure._state_server import create_app
+
+
+def exchange(seq):
+    return ExchangeRow(seq, 100 + seq, seq, f'q{seq}', seq, f'a{seq}')
+
+
+@pytest.fixture
+def remote(fresh_db):
+    app = create_app(LocalRepository(fresh_db))
+    return RemoteRepository(client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://state'))
+
+
+def test_remote_repository_round_trips_through_the_state_server(remote):
+    async def scenario():
+        id_chat = await remote.allocate_chat_id()
+        assert await remote.get_chat(id_chat) is None
+        await remote.record_exchange(id_chat, 'chat', '#1', exchange(0), expected_version=0)
+        await remote.record_exchange(id_chat, 'chat', '#2', exchange(1), expected_version=1)
+        with pytest.raises(ConcurrentUpdateError):
+            await remote.record_exchange(id_chat, 'chat', '#2', exchange(1), expected_version=1)
+        await remote.insert_documents(['d1', 'd2'], 'report.json', 10, 'abc')
+        results = (
+            id_chat,
+            await remote.allocate_chat_id(),
+            await remote.get_chat(id_chat),
+            await remote.list_chats(limit=1),
+            await remote.get_history(id_chat, last_n=1),
+            await remote.next_sequence(id_chat),
+            await remote.get_chat_details_json(id_chat),
+            await remote.list_documents(),
+            await remote.get_document('d2'),
+            await remote.get_document('missing'),
+        )
+        await remote.aclose()
+        return results
+
+    (id_chat, next_id, chat, page, history, seq, details, documents, document, missing) = anyio.run(scenario)
+    assert next_id == id_chat + 1
+    assert chat == ChatRow(id_chat, 'chat', '#2', 2)
+    assert page.rows == [chat] and page.next_after is None
+    assert history == [exchange(1)]
+    assert seq == 2
+    assert details[0] == 2 and '"q1"' in details[1]
+    assert [row.id for row in documents.rows] == ['d1', 'd2']
+    assert document == DocumentRow('d2', 'report.json', 10, 'abc')
+    assert missing is None
+
+
+def test_sessions_work_over_the_state_server(remote, fresh_db):
+    cache = SessionCache(remote)
+
+    async def scenario():
+        session = await cache.get(3)
+        await cache.record(session, 'chat', '#1', exchange(0))
+        cache.invalidate(3)
+        return await cache.get(3)
+
+    session = anyio.run(scenario)
+    assert session.version == 1 and session.next_seq == 1
+    assert fresh_db.execute('SELECT count(*) FROM exchanges WHERE id_chat = 3').fetchone()[0] == 1
+
+
+def test_reconcile_opens_the_vector_store_only_when_asked_and_without_embeddings(fresh_db, blob_store, monkeypatch):
+    import infrastructure._chromadb as chromadb_module
+    import infrastructure._state_server as state_server_module
+    opened, checked = [], []
+    monkeypatch.setattr(state_server_module, 'get_blob_store', lambda: blob_store)
+    monkeypatch.setattr(chromadb_module, 'get_vector_store', lambda embeddings: opened.append(embeddings) or 'store')
+    monkeypatch.setattr(state_server_module, 'verify_document_ids', lambda localdb, store: checked.append(store))
+
+    state_server_module._reconcile_storage(fresh_db, verify_vectors=False)
+    assert (opened, checked) == ([], [])
+
+    state_server_module._reconcile_storage(fresh_db, verify_vectors=True)
+    assert (opened, checked) == ([None], ['store'])
+
+
+def test_workers_refuse_to_start_without_a_shared_chroma_server(monkeypatch):
+    import infrastructure._chromadb as chromadb_module
+    import infrastructure._state_server as state_server_module
+    monkeypatch.setattr(state_server_module, 'STATE_SERVER_URL', 'http://state')
+    monkeypatch.setattr(chromadb_module, 'CHROMA_SERVER_URL', None)
+    with pytest.raises(RuntimeError, match='CHROMA_SERVER_URL'):
+        state_server_module.maintain_storage()
+
+    monkeypatch.setattr(chromadb_module, 'CHROMA_SERVER_URL', 'http://chroma')
+    with state_server_module.maintain_storage():
+        pass
@@ -0,0 +1,59 @@
+import time
+
+import anyio
+
+from infrastructure._tracing import Tracer, current_span
+
+
+def test_spans_nest_and_only_roots_are_recorded():
+    tracer = Tracer(capacity=10)
+    with tracer.span('request') as root:
+        with tracer.span('retrieve', k=4):
+            current_span().set(cache_hit=False)
+        with tracer.span('llm'):
+            pass
+
+    (trace,) = tracer.slowest()
+    assert trace is root
+    tree = trace.as_dict()
+    assert [child['name'] for child in tree['children']] == ['retrieve', 'llm']
+    assert tree['children'][0]['attributes'] == {'k': 4, 'cache_hit': False}
+    assert tree['duration_ms'] >= 0
+
+
+def test_ring_buffer_keeps_the_latest_and_sorts_by_duration():
+    tracer = Tracer(capacity=3)
+    for delay in (0.03, 0.0, 0.02, 0.01):
+        with tracer.span(f'request {delay}'):
+            time.sleep(delay)
+
+    assert [span.name for span in tracer.slowest()] == ['request 0.02', 'request 0.01', 'request 0.0']
+    assert [span.name for span in tracer.slowest(1)] == ['request 0.02']
+
+
+def test_spans_in_worker_threads_join_the_request():
+    tracer = Tracer()
+
+    def blocking_work():
+        with tracer.span('in thread'):
+            pass
+
+    async def scenario():
+        with tracer.span('request'):
+            await anyio.to_thread.run_sync(blocking_work)
+
+    anyio.run(scenario)
+    (trace,) = tracer.slowest()
+    assert [child.name for child in trace.children] == ['in thread']
+
+
+def test_debug_output_is_sampled_per_request():
+    never, always = Tracer(debug_sample_rate=0.0), Tracer(debug_sample_rate=1.0)
+    with never.span('request'):
+        with never.span('child') as child:
+            assert not child.debug
+    with always.span('request'):
+        with always.span('child') as child:
+            assert child.debug
+    # Outside of any trace there is nothing to sample
+    assert current_span().debug is False
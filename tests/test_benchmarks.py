@@ -0,0 +1,49 @@
+import benchmarks.bench_suite as suite
+import usecases.doc_ingest._build_index as build_index_module
+import usecases.RAG._generate_responses as generate_module
+import usecases.RAG._retrieve_context as retrieve_module
+import usecases.RAG._warmup as warmup_module
+
+
+def test_compare_flags_only_results_beyond_the_tolerance():
+    baselines = {
+        'ingest[50]': {'value': 100.0, 'unit': 'chunks/s', 'higher_is_better': True},
+        'retrieve_p50[50]': {'value': 2.0, 'unit': 'ms', 'higher_is_better': False},
+    }
+    within = [suite.Result('ingest[50]', 80.0, 'chunks/s', True), suite.Result('retrieve_p50[50]', 2.5, 'ms', False)]
+    beyond = [suite.Result('ingest[50]', 70.0, 'chunks/s', True), suite.Result('retrieve_p50[50]', 2.7, 'ms', False)]
+    new = [suite.Result('ingest[5000]', 1.0, 'chunks/s', True)]
+    ungated = [suite.Result('retrieve_p50[50]', 9.0, 'ms', False, gated=False)]
+
+    assert suite.compare(within + new + ungated, baselines, tolerance=0.3, floor_ms=0.5) == []
+    assert [line.split(':')[0] for line in suite.compare(beyond, baselines, tolerance=0.3, floor_ms=0.5)] == [
+        'ingest[50]', 'retrieve_p50[50]',
+    ]
+    # 35% slower, but by less than a millisecond
+    assert suite.compare(beyond[1:], baselines, tolerance=0.3, floor_ms=1.0) == []
+
+
+def test_corpus_is_reproducible():
+    assert suite.corpus(3) == suite.corpus(3)
+    assert suite.corpus(3, seed=1) != suite.corpus(3)
+
+
+def test_suite_runs_offline(monkeypatch):
+    providers = [
+        (build_index_module, 'get_vectorstore'), (warmup_module, 'get_vectorstore'),
+        (retrieve_module, 'get_retriever'), (generate_module, 'get_llm_chat'),
+    ]
+    originals = [getattr(module, name) for module, name in providers]
+    monkeypatch.setattr(suite, 'HISTORY_POINTS', (0, 2))
+    monkeypatch.setattr(suite, 'HISTORY_WINDOW', 2)
+
+    results = {result.name: result for result in suite.run(scales=[4], chats=1, queries=5, rounds=2)}
+
+    assert set(results) == {
+        'ingest[4]', 'retrieve_p50[4]', 'retrieve_p99[4]',
+        'chat_turn_p50[history=0]', 'chat_turn_p99[history=0]', 'chat_turn_p50[history=2]', 'chat_turn_p99[history=2]',
+    }
+    assert all(result.value > 0 for result in results.values())
+    assert not results['retrieve_p99[4]'].gated
+    # The offline stack does not outlive the run
+    assert [getattr(module, name) for module, name in providers] == originals
@@ -1,9 +1,9 @@
-import json
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 
 from domain import ChatQueryDTO, ChatResponseDTO
+from infrastructure import get_llm_chat
 import endpoints._api_RAG as api
 
 
@@ -82,3 +82,176 @@ def test_get_chat_not_found(client: TestClient):
     resp = client.get('/chats/999/history')
     assert resp.status_code == status.HTTP_404_NOT_FOUND
     assert resp.json()['detail'] == 'Chat history not found'
+
+
+def test_get_model_stats_lists_ladder(client: TestClient):
+    resp = client.get('/models')
+    assert resp.status_code == status.HTTP_200_OK
+    tiers = resp.json()
+    assert [tier['model_name'] for tier in tiers] == [
+        tier.model_name for tier in get_llm_chat().router.ladder
+    ]
+    assert all({'p50', 'p95', 'prompt_tokens', 'completion_tokens'} <= set(tier) for tier in tiers)
+
+
+def test_post_query_appends_exchanges_in_order(client: TestClient, monkeypatch, fresh_db):
+    seen_histories = []
+
+    def stub_generate(q, h, debug):
+        seen_histories.append([msg.content for msg in h])
+        return ChatResponseDTO(id_response=len(seen_histories), content_response=f'reply {q.content_query}')
+
+    monkeypatch.setattr(api, 'generate_response', stub_generate)
+    monkeypatch.setattr(api, 'CHAT_HISTORY_TURNS', 2)
+
+    for turn in range(4):
+        resp = client.post('/chats/7/query', json={'id_query': turn, 'content_query': f'q{turn}'})
+        assert resp.status_code == status.HTTP_302_FOUND
+
+    # Each turn is one appended row with its own sequence number
+    rows = fresh_db.execute("SELECT seq, content_query FROM exchanges WHERE id_chat = 7 ORDER BY seq").fetchall()
+    assert rows == [(0, 'q0'), (1, 'q1'), (2, 'q2'), (3, 'q3')]
+
+    # The last CHAT_HISTORY_TURNS turns, reaching back to the start of their trim block (turn 0 here)
+    assert seen_histories[-1] == ['q0', 'reply q0', 'q1', 'reply q1', 'q2', 'reply q2', 'q3']
+
+    history = client.get('/chats/7/history').json()['history']
+    assert [ex['query']['content_query'] for ex in history] == ['q0', 'q1', 'q2', 'q3']
+
+
+def test_get_chats_pages_by_key(client: TestClient, fresh_db, monkeypatch):
+    fresh_db.executemany("INSERT INTO chats (id, name, summary) VALUES (?, ?, 's')", [[i, f'chat {i}'] for i in range(5)])
+    monkeypatch.setattr('infrastructure._repository.LISTING_MAX_PAGE_SIZE', 3)
+
+    first = client.get('/chats', params={'limit': 2})
+    assert [chat['id_chat'] for chat in first.json()] == [0, 1]
+    assert first.headers['X-Next-Cursor'] == '1'
+
+    rest = client.get('/chats', params={'after': 1, 'limit': 10})
+    # The page size is capped
+    assert [chat['id_chat'] for chat in rest.json()] == [2, 3, 4]
+    assert 'X-Next-Cursor' not in rest.headers
+
+
+def test_chat_details_are_served_from_cache_until_the_chat_changes(client: TestClient, monkeypatch):
+    monkeypatch.setattr(api, 'generate_response', lambda q, h, debug: ChatResponseDTO(id_response=1, content_response='r'))
+    client.post('/chats/4/query', json={'id_query': 0, 'content_query': 'first'})
+
+    renders = []
+    original = api.chat_details_json
+    monkeypatch.setattr(api, 'chat_details_json', lambda payload: renders.append(payload) or original(payload))
+
+    first = client.get('/chats/4')
+    assert client.get('/chats/4').content == first.content
+    assert client.get('/chats/4/history').content == first.content
+    assert len(renders) == 1
+    assert first.headers['content-type'] == 'application/json'
+
+    client.post('/chats/4/query', json={'id_query': 1, 'content_query': 'second'})
+    history = client.get('/chats/4').json()['history']
+    assert [ex['query']['content_query'] for ex in history] == ['first', 'second']
+    assert len(renders) == 2
+
+
+def test_post_query_is_turned_away_when_the_pool_is_full(app, client: TestClient, monkeypatch):
+    from infrastructure import AdmissionControl, AdmissionPool, get_admission
+    admission = AdmissionControl(interactive=AdmissionPool('interactive', limit=1, queue_size=0))
+    admission.interactive.active = 1  # the only slot is taken
+    app.dependency_overrides[get_admission] = lambda: admission
+    monkeypatch.setattr(api, 'generate_response', lambda q, h, debug: pytest.fail('must not be called'))
+
+    response = client.post('/chats/3/query', json={'id_query': 1, 'content_query': 'q'})
+
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers['retry-after']) >= 1
+    # The bulk pool is separate, so uploads would still be admitted
+    assert admission.bulk.active == 0
+
+
+def test_rejected_new_chat_does_not_use_up_a_chat_id(app, client: TestClient, monkeypatch):
+    from infrastructure import AdmissionControl, AdmissionPool, get_admission
+    admission = AdmissionControl(interactive=AdmissionPool('interactive', limit=1, queue_size=0))
+    app.dependency_overrides[get_admission] = lambda: admission
+    monkeypatch.setattr(api, 'generate_response', lambda q, h, debug: ChatResponseDTO(id_response=1, content_response='a'))
+
+    admission.interactive.active = 1
+    assert client.post('/chats/new', params={'query': 'Hello'}).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    admission.interactive.active = 0
+
+    response = client.post('/chats/new', params={'query': 'Hello'})
+    assert response.headers['location'] == '/chats/0'
+
+
+def test_turn_waiting_for_its_chat_holds_no_slot(sessions):
+    import anyio
+    from infrastructure import AdmissionControl, AdmissionPool
+    admission = AdmissionControl(interactive=AdmissionPool('interactive', limit=1, queue_size=0))
+    query = ChatQueryDTO(id_query=1, content_query='q')
+
+    async def scenario():
+        async with anyio.create_task_group() as task_group:
+            async with sessions.lock(4):
+                task_group.start_soon(api.post_query, 4, query, sessions, admission)
+                await anyio.wait_all_tasks_blocked()
+                # Queued behind the chat's earlier turn, not in the pool, so other chats can still be admitted
+                assert (admission.interactive.active, admission.interactive.queued) == (0, 0)
+                task_group.cancel_scope.cancel()
+
+    anyio.run(scenario)
+
+
+def test_turns_beyond_the_chat_queue_are_turned_away(repository, monkeypatch):
+    import threading
+    import time
+    import anyio
+    from fastapi import HTTPException
+    from infrastructure import AdmissionControl, AdmissionPool, SessionCache
+    sessions = SessionCache(repository, lock_queue=2)
+    admission = AdmissionControl(interactive=AdmissionPool('interactive', limit=8, queue_size=8))
+    release = threading.Event()
+
+    def respond(q, h, debug):
+        release.wait(5)
+        return ChatResponseDTO(id_response=q.id_query, content_response='a')
+
+    monkeypatch.setattr(api, 'generate_response', respond)
+    outcomes = []
+
+    async def turn(index):
+        started = time.perf_counter()
+        try:
+            await api.post_query(5, ChatQueryDTO(id_query=index, content_query='q'), sessions, admission)
+            outcomes.append(('done', index))
+        except HTTPException as e:
+            outcomes.append((e.status_code, time.perf_counter() - started))
+
+    async def scenario():
+        async with anyio.create_task_group() as task_group:
+            for index in range(8):
+                task_group.start_soon(turn, index)
+            await anyio.wait_all_tasks_blocked()
+            # One turn running and two waiting for the chat; the other five are answered at once
+            rejected = [seconds for outcome, seconds in outcomes if outcome == 429]
+            assert len(rejected) == 5 and max(rejected) < 1
+            assert admission.interactive.active == 1
+            release.set()
+
+    anyio.run(scenario)
+    assert sorted(index for outcome, index in outcomes if outcome == 'done') == [0, 1, 2]
+
+
+def test_long_chat_keeps_its_history_prefix_between_block_drops(client: TestClient, monkeypatch):
+    histories = []
+
+    def respond(q, h, debug):
+        histories.append([msg.content for msg in h[:-1]])
+        return ChatResponseDTO(id_response=q.id_query, content_response=f'answer {q.id_query}')
+
+    monkeypatch.setattr(api, 'generate_response', respond)
+    for turn in range(42):
+        client.post('/chats/7/query', json={'id_query': turn, 'content_query': f'question {turn}'})
+
+    # Past CHAT_HISTORY_TURNS turns, turn 41 still starts where turn 40 did and only adds turn 40
+    assert len(histories[40]) > 0
+    assert histories[41][:len(histories[40])] == histories[40]
+    assert histories[41][len(histories[40]):] == ['question 40', 'answer 40']
@@ -1,6 +1,6 @@
+import io
 import os
-import base64
-import pytest
+import hashlib
 from fastapi import status
 from fastapi.testclient import TestClient
 
@@ -28,11 +28,10 @@ def test_post_upload_and_retrieval(tmp_path, client: TestClient, monkeypatch):
     file_path = tmp_path / filename
     file_path.write_bytes(file_content)
 
-    # Monkeypatch the UPLOAD_DIRECTORY to tmp_path
-    monkeypatch.setattr(uploads_api, 'UPLOAD_DIRECTORY', str(tmp_path))
     # Monkeypatch index_from_file to return two IDs
     dummy_ids = ['id1', 'id2']
-    monkeypatch.setattr(uploads_api, 'index_from_file', lambda f: dummy_ids)
+    sources = []
+    monkeypatch.setattr(uploads_api, 'index_from_file', lambda f, source=None: sources.append(source) or dummy_ids)
 
     # Perform upload via TestClient
     with open(file_path, 'rb') as f:
@@ -41,8 +40,10 @@ def test_post_upload_and_retrieval(tmp_path, client: TestClient, monkeypatch):
     # Should redirect to first ID
     assert response.status_code == status.HTTP_302_FOUND
     assert response.headers['location'] == f'/uploads/{dummy_ids[0]}'
+    # Chunks name the uploaded file, not the staging copy that the blob store moves away
+    assert sources == [filename]
 
-    # GET /uploads should list two entries
+    # GET /uploads should list two entries, metadata only
     response = client.get('/uploads')
     assert response.status_code == status.HTTP_200_OK
     data = response.json()
@@ -51,11 +52,9 @@ def test_post_upload_and_retrieval(tmp_path, client: TestClient, monkeypatch):
     rec0 = data[0]
     assert rec0[0][0] == 'id' and rec0[0][1] == 'id1'
     assert rec0[1][0] == 'name' and rec0[1][1] == filename
-    # Contents should be base64-encoded original data
-    contents_encoded = rec0[2][1]
-    # Decode base64 and compare to original bytes
-    decoded = base64.b64decode(contents_encoded)
-    assert decoded == file_content
+    assert rec0[2] == ['size', len(file_content)]
+    assert rec0[3] == ['hash', hashlib.sha256(file_content).hexdigest()]
+    assert len(rec0) == 4
 
     # GET specific upload
     response = client.get(f'/uploads/{dummy_ids[1]}')
@@ -63,18 +62,86 @@ def test_post_upload_and_retrieval(tmp_path, client: TestClient, monkeypatch):
     rec1 = response.json()
     assert rec1[0][1] == 'id2'
     assert rec1[1][1] == filename
-    decoded1 = base64.b64decode(rec1[2][1])
-    assert decoded1 == file_content
-
-
-def test_upload_directory_created(tmp_path, monkeypatch):
-    # Ensure that UPLOAD_DIRECTORY is created if missing
-    target_dir = tmp_path / 'newuploads'
-    # Remove if exists
-    if target_dir.exists():
-        pytest.skip('Directory unexpectedly exists')
-    monkeypatch.setattr(uploads_api, 'UPLOAD_DIRECTORY', str(target_dir))
-    # Reload module to trigger directory creation
-    import importlib
-    importlib.reload(uploads_api)
-    assert target_dir.exists() and target_dir.is_dir()
+
+    # Contents only come from the download endpoint
+    response = client.get(f'/uploads/{dummy_ids[1]}/contents')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == file_content
+    assert response.headers['content-type'].startswith('text/plain')
+    assert response.headers['etag'] == f'"{hashlib.sha256(file_content).hexdigest()}"'
+
+
+def upload(client, monkeypatch, name, content, ids):
+    monkeypatch.setattr(uploads_api, 'index_from_file', lambda f, source=None: ids)
+    return client.post('/uploads', files={'file': (name, io.BytesIO(content), 'application/octet-stream')})
+
+
+def test_uploads_are_stored_once_by_content(client: TestClient, blob_store, monkeypatch):
+    upload(client, monkeypatch, 'a.bin', b'same bytes', ['a'])
+    upload(client, monkeypatch, 'b.bin', b'same bytes', ['b'])
+
+    digest = hashlib.sha256(b'same bytes').hexdigest()
+    with open(blob_store.path(digest), 'rb') as f:
+        assert f.read() == b'same bytes'
+    assert os.listdir(os.path.dirname(blob_store.path(digest))) == [digest]
+    # Nothing is left behind in the staging area
+    assert os.listdir(blob_store.staging) == []
+
+
+def test_download_supports_ranges_and_etags(client: TestClient, monkeypatch):
+    content = bytes(range(256)) * 1024
+    upload(client, monkeypatch, 'data.bin', content, ['doc'])
+    etag = f'"{hashlib.sha256(content).hexdigest()}"'
+
+    response = client.get('/uploads/doc/contents', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == content[100:200]
+    assert response.headers['content-range'] == f'bytes 100-199/{len(content)}'
+
+    response = client.get('/uploads/doc/contents', headers={'Range': 'bytes=-10'})
+    assert response.content == content[-10:]
+
+    response = client.get('/uploads/doc/contents', headers={'Range': f'bytes={len(content)}-'})
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+
+    response = client.get('/uploads/doc/contents', headers={'If-None-Match': etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    response = client.get('/uploads/doc/contents', headers={'If-None-Match': '*'})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    response = client.get('/uploads/doc/contents', headers={'If-None-Match': '"other"'})
+    assert response.status_code == status.HTTP_200_OK
+
+    # A stale If-Range validator gets the whole file
+    response = client.get('/uploads/doc/contents', headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == content
+
+
+def test_download_of_a_non_ascii_name(client: TestClient, monkeypatch):
+    upload(client, monkeypatch, '报告.txt', b'contents', ['doc'])
+
+    response = client.get('/uploads/doc/contents')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b'contents'
+    assert response.headers['content-disposition'] == (
+        'attachment; filename="??.txt"; filename*=UTF-8\'\'%E6%8A%A5%E5%91%8A.txt'
+    )
+
+
+def test_get_uploads_pages_by_key(client: TestClient, repository):
+    import anyio
+    anyio.run(repository.insert_documents, ['a', 'b', 'c'], 'f.txt', 1, 'digest')
+
+    first = client.get('/uploads', params={'limit': 2})
+    assert [rec[0][1] for rec in first.json()] == ['a', 'b']
+    assert first.headers['X-Next-Cursor'] == 'b'
+
+    rest = client.get('/uploads', params={'after': 'b'})
+    assert [rec[0][1] for rec in rest.json()] == ['c']
+    assert 'X-Next-Cursor' not in rest.headers
+
+
+def test_get_upload_contents_not_found(client: TestClient):
+    response = client.get('/uploads/nonexistent/contents')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
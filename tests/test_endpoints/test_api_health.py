@@ -0,0 +1,35 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+import endpoints._api_health as api_health_module
+from endpoints import api_health, TracingMiddleware
+from infrastructure import Readiness, tracer
+
+
+def test_ready_reports_warmup_while_health_stays_up(app, monkeypatch):
+    readiness = Readiness()
+    monkeypatch.setattr(api_health_module, 'readiness', readiness)
+    app.include_router(api_health)
+    client = TestClient(app)
+
+    with readiness.step('vector_index'):
+        pass
+    assert client.get('/health').status_code == status.HTTP_200_OK
+    response = client.get('/ready')
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()['steps'][0]['name'] == 'vector_index'
+
+    readiness.mark_ready()
+    response = client.get('/ready')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['ready'] is True
+
+
+def test_probes_are_not_traced(app):
+    app.include_router(api_health)
+    app.add_middleware(TracingMiddleware)
+    tracer.clear()
+
+    TestClient(app).get('/health')
+
+    assert tracer.slowest(10) == []
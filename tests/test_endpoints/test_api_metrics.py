@@ -0,0 +1,49 @@
+import re
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from domain import ChatResponseDTO
+import endpoints._api_RAG as api
+from endpoints import api_metrics, InFlightMiddleware
+from infrastructure import requests_in_flight
+
+
+def sample(text: str, name: str) -> float:
+    match = re.search(r'^' + re.escape(name) + r' (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_cover_the_stages_of_a_chat_turn(app, monkeypatch):
+    app.include_router(api_metrics)
+    client = TestClient(app, follow_redirects=False)
+    monkeypatch.setattr(api, 'generate_response', lambda q, h, debug: ChatResponseDTO(id_response=1, content_response='r'))
+
+    respond = 'stage_duration_seconds_count{operation="post_query",stage="respond"}'
+    misses = 'cache_requests_total{cache="chat_details",result="miss"}'
+    before = client.get('/metrics').text
+
+    assert client.post('/chats/3/query', json={'id_query': 1, 'content_query': 'q'}).status_code == status.HTTP_302_FOUND
+    client.get('/chats/3')
+    response = client.get('/metrics')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert sample(response.text, respond) == sample(before, respond) + 1
+    assert sample(response.text, misses) == sample(before, misses) + 1
+    assert '# TYPE http_requests_in_flight gauge' in response.text
+
+
+def test_in_flight_gauge_counts_requests_being_served(app):
+    seen = []
+    app.add_middleware(InFlightMiddleware)
+
+    @app.get('/probe')
+    async def probe():
+        seen.append(requests_in_flight.labels(method='GET').value)
+        return {}
+
+    before = requests_in_flight.labels(method='GET').value
+    TestClient(app).get('/probe')
+    assert seen == [before + 1]
+    assert requests_in_flight.labels(method='GET').value == before
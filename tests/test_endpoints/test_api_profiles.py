@@ -0,0 +1,50 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+import infrastructure._profiling as profiling
+from endpoints import api_profiles, ProfilingMiddleware
+from infrastructure import ProfileStore, get_profile_store
+
+
+@pytest.fixture
+def profile_store(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_ADMIN_TOKEN', 'secret')
+    store = ProfileStore(str(tmp_path / 'profiles'))
+    app.include_router(api_profiles)
+    app.add_middleware(ProfilingMiddleware, store=store)
+    app.dependency_overrides[get_profile_store] = lambda: store
+    return store
+
+
+def test_profiles_requests_that_ask_with_the_admin_token(app, profile_store):
+    client = TestClient(app)
+    admin = {'X-Admin-Token': 'secret'}
+
+    assert 'x-profile-id' not in client.get('/chats').headers
+    assert 'x-profile-id' not in client.get('/chats', headers={'X-Profile': '1', 'X-Admin-Token': 'wrong'}).headers
+    response = client.get('/chats', headers={'X-Profile': '1', **admin})
+    name = response.headers['x-profile-id']
+
+    listed = client.get('/admin/profiles', headers=admin).json()
+    assert [profile['name'] for profile in listed] == [name]
+    download = client.get(f'/admin/profiles/{name}', headers=admin)
+    assert download.status_code == status.HTTP_200_OK
+    assert download.text == open(profile_store.path(name)).read()
+    assert client.get(f'/admin/profiles/{name}/summary', headers=admin).json()['samples'] >= 0
+    assert client.get('/admin/profiles/missing.folded', headers=admin).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_sample_rate_profiles_without_a_header(app, profile_store, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+
+    assert 'x-profile-id' in TestClient(app).get('/chats').headers
+
+
+def test_admin_endpoints_need_the_token(app, profile_store, monkeypatch):
+    client = TestClient(app)
+
+    assert client.get('/admin/profiles').status_code == status.HTTP_403_FORBIDDEN
+    assert client.get('/admin/profiles', headers={'X-Admin-Token': 'wrong'}).status_code == status.HTTP_403_FORBIDDEN
+    monkeypatch.setattr(profiling, 'PROFILE_ADMIN_TOKEN', None)
+    assert client.get('/admin/profiles', headers={'X-Admin-Token': 'secret'}).status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,35 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from domain import ChatResponseDTO
+import endpoints._api_RAG as api
+from endpoints import api_traces, TracingMiddleware
+from infrastructure import tracer
+
+
+def names(span: dict) -> list:
+    return [span['name']] + [name for child in span['children'] for name in names(child)]
+
+
+def test_traces_show_the_span_tree_of_slow_requests(app, monkeypatch):
+    app.include_router(api_traces)
+    app.add_middleware(TracingMiddleware)
+    client = TestClient(app, follow_redirects=False)
+    tracer.clear()
+    debug_flags = []
+
+    def stub_generate(q, h, debug):
+        debug_flags.append(debug)
+        return ChatResponseDTO(id_response=1, content_response='r')
+
+    monkeypatch.setattr(api, 'generate_response', stub_generate)
+    assert client.post('/chats/5/query', json={'id_query': 1, 'content_query': 'q'}).status_code == status.HTTP_302_FOUND
+    client.get('/chats/5')
+
+    traces = client.get('/debug/traces', params={'limit': 5}).json()
+    assert {trace['name'] for trace in traces} == {'POST /chats/5/query', 'GET /chats/5'}
+    post = next(trace for trace in traces if trace['name'] == 'POST /chats/5/query')
+    assert post['attributes']['status_code'] == 302
+    assert {'post_query.load_session', 'post_query.respond', 'post_query.persist'} <= set(names(post))
+    # The prompt is only printed for requests sampled for debugging, which is off by default
+    assert debug_flags == [False]
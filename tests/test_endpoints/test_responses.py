@@ -0,0 +1,43 @@
+import anyio
+import pytest
+
+from endpoints._responses import RangedFileResponse, parse_range
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('bytes=0-9', (0, 9)),
+    ('bytes=90-', (90, 99)),
+    ('bytes=-5', (95, 99)),
+    ('bytes=50-500', (50, 99)),
+    ('bytes=0-1,5-6', None),
+    ('items=0-1', None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=100-', 'bytes=20-10', 'bytes=-0'])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 100)
+
+
+def test_zerocopy_extension_gets_the_file_instead_of_bytes(tmp_path):
+    path = tmp_path / 'blob'
+    path.write_bytes(b'0123456789')
+    messages = []
+
+    async def send(message):
+        if message['type'] == 'http.response.zerocopysend':
+            message = {**message, 'file': message['file'].name}
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'headers': [(b'range', b'bytes=2-5')],
+        'extensions': {'http.response.zerocopysend': {}},
+    }
+    anyio.run(RangedFileResponse(str(path), etag='abc', media_type='application/octet-stream'), scope, None, send)
+
+    assert messages[0]['status'] == 206
+    assert messages[1] == {'type': 'http.response.zerocopysend', 'file': str(path), 'offset': 2, 'count': 4}
@@ -0,0 +1,41 @@
+import os
+import re
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative time to import the app, from `python -X importtime -c "import main"`; about 300 ms when
+# committed, the headroom absorbs slow CI machines but not a heavy dependency creeping back in
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '750'))
+# Loaded on demand only: by the first LLM call, the first retrieval or the first ingested file
+DEFERRED_MODULES = (
+    'openai', 'chromadb', 'langchain_chroma', 'langchain_openai', 'langchain_community',
+    'langchain.memory', 'langchain.chains', 'unstructured', 'pandas', 'tiktoken',
+)
+
+
+def import_times(cwd) -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$', line)
+        if match:
+            times[match.group(2)] = int(match.group(1)) / 1000
+    return times
+
+
+def test_app_import_stays_within_budget(tmp_path):
+    runs = [import_times(tmp_path) for _ in range(3)]
+    loaded = set(runs[0])
+    assert not [
+        name for name in loaded
+        if any(name == deferred or name.startswith(deferred + '.') for deferred in DEFERRED_MODULES)
+    ]
+    # The fastest run is the least disturbed by whatever else the machine is doing
+    assert min(run['main'] for run in runs) < IMPORT_TIME_BUDGET_MS
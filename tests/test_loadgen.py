@@ -0,0 +1,37 @@
+import anyio
+import httpx
+
+import endpoints._api_RAG as api
+from benchmarks.loadgen import LoadReport, load_conversations, run_load
+from domain import ChatResponseDTO
+
+
+def test_users_replay_conversations_turn_by_turn(app, repository, monkeypatch):
+    monkeypatch.setattr(api, 'generate_response', lambda q, h, debug: ChatResponseDTO(id_response=1, content_response='a'))
+    conversations = [turns[:3] for turns in load_conversations(None, 4)]
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://app') as client:
+            return await run_load(client, conversations, users=2, per_user=2, think=0.0)
+
+    summary = anyio.run(scenario).summary()
+
+    assert summary['requests'] == 12 and summary['conversations'] == 4
+    assert summary['error_rate'] == 0.0 and summary['throttled_rate'] == 0.0
+    assert [(row['turn'], row['ok']) for row in summary['turns']] == [(0, 4), (1, 4), (2, 4)]
+    assert all('p99_ms' in row for row in summary['turns'])
+    chats = anyio.run(repository.list_chats)
+    assert len(chats.rows) == 4
+
+
+def test_report_separates_errors_and_throttling():
+    report = LoadReport()
+    report.record(0, 0.1, 302)
+    report.record(1, 0.2, 429)
+    report.record(1, 0.3, 500)
+    report.record(1, 0.4, None)
+
+    summary = report.summary()
+    assert summary['requests'] == 4
+    assert summary['error_rate'] == 0.5 and summary['throttled_rate'] == 0.25
+    assert summary['turns'][1] == {'turn': 1, 'ok': 0, 'errors': 2, 'throttled': 1}
@@ -0,0 +1,71 @@
+from domain import ChatQueryDTO, ChatResponseDTO, HumanMessage
+import usecases.RAG._generate_program as program_module
+
+
+class DummyLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+def test_generate_program_response_executes_program(monkeypatch):
+    context = 'TABLE:\n | 2009 | 2008\nrevenue | 206588 | 181001'
+    monkeypatch.setattr(program_module, 'retrieve_context', lambda q: context)
+    captured = {}
+
+    def fake_invoke(messages, instructions=None, context=None):
+        captured.update(messages=messages, instructions=instructions, context=context)
+        return DummyLLMResponse('subtract(206588, 181001), divide(#0, 181001)')
+
+    monkeypatch.setattr(program_module.get_llm_chat(), 'invoke', fake_invoke)
+
+    history = [HumanMessage(content='what was the change in revenue?')]
+    response = program_module.generate_program_response(ChatQueryDTO(id_query=1, content_query='?'), history)
+
+    assert isinstance(response, ChatResponseDTO)
+    assert response.content_response.startswith('0.14136')
+    assert 'Program: subtract(206588, 181001), divide(#0, 181001)' in response.content_response
+    # The already retrieved context is handed to the chain instead of being fetched again
+    assert captured['context'] == context
+    assert captured['instructions'] == program_module.PROGRAM_INSTRUCTIONS
+
+
+def test_prose_reply_is_kept_without_another_call(monkeypatch):
+    monkeypatch.setattr(program_module, 'retrieve_context', lambda q: '')
+    calls = []
+
+    def fake_invoke(messages, instructions=None, context=None):
+        calls.append(instructions)
+        return DummyLLMResponse('Revenue grew by about 14%.')
+
+    monkeypatch.setattr(program_module.get_llm_chat(), 'invoke', fake_invoke)
+
+    response = program_module.generate_program_response(
+        ChatQueryDTO(id_query=1, content_query='?'), [HumanMessage(content='?')]
+    )
+    assert response.content_response == 'Revenue grew by about 14%.'
+    assert calls == [program_module.PROGRAM_INSTRUCTIONS]
+
+
+def test_failed_program_falls_back_over_the_same_context(monkeypatch):
+    retrievals = []
+    monkeypatch.setattr(program_module, 'retrieve_context', lambda q: retrievals.append(q) or 'the context')
+    monkeypatch.setattr(
+        program_module.get_llm_chat(), 'invoke',
+        lambda messages, instructions=None, context=None: DummyLLMResponse('divide(1, 0)'),
+    )
+    fallback = ChatResponseDTO(id_response=1, content_response='free-form')
+    captured = {}
+
+    def fake_fallback(history, context, debug=False):
+        captured.update(history=history, context=context)
+        return fallback
+
+    monkeypatch.setattr(program_module, 'generate_response_from_context', fake_fallback)
+
+    history = [HumanMessage(content='?')]
+    response = program_module.generate_program_response(ChatQueryDTO(id_query=1, content_query='?'), history)
+
+    assert response is fallback
+    # Retrieval is not repeated for the free-form answer
+    assert len(retrievals) == 1
+    assert captured == {'history': history, 'context': 'the context'}
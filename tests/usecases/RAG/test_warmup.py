@@ -0,0 +1,73 @@
+import usecases.RAG._warmup as warmup_module
+from infrastructure import Readiness
+
+
+class FakeVectorStore:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.searched = []
+
+    def get(self, limit=None, include=None):
+        return {'embeddings': self.embeddings[:limit]}
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        self.searched.append(embedding)
+        return []
+
+
+def warmup_with(monkeypatch, vectorstore, encodings=None):
+    readiness = Readiness()
+    monkeypatch.setattr(warmup_module, 'readiness', readiness)
+    monkeypatch.setattr(warmup_module, 'get_vectorstore', lambda: vectorstore)
+    monkeypatch.setattr(warmup_module, 'get_encoding', lambda name: (encodings or {}).get(name, object()))
+    return readiness
+
+
+def test_warm_up_pages_in_index_and_caches_hot_queries(monkeypatch):
+    vectorstore = FakeVectorStore([[0.1, 0.2]])
+    readiness = warmup_with(monkeypatch, vectorstore)
+    retrieved, answered = [], []
+    monkeypatch.setattr(warmup_module._retrieve_context, 'retrieve_context', lambda q: retrieved.append(q.content_query))
+    monkeypatch.setattr(
+        warmup_module._generate_responses, 'generate_response',
+        lambda q, history: answered.append((q.content_query, [m.content for m in history])),
+    )
+
+    assert not readiness.ready
+    warmup_module.warm_up(queries=['q1', 'q2'], answers=['a1'])
+
+    assert readiness.ready
+    assert vectorstore.searched == [[0.1, 0.2]]
+    assert retrieved == ['q1', 'q2']
+    # Hot answers are produced as the first turn of a chat, so later first turns hit the cache
+    assert answered == [('a1', ['a1'])]
+    steps = {step['name']: step['status'] for step in readiness.report()['steps']}
+    assert steps['vector_index'] == steps['query_embeddings'] == steps['answers'] == 'done'
+
+
+def test_failed_steps_do_not_block_readiness(monkeypatch):
+    class BrokenVectorStore(FakeVectorStore):
+        def get(self, limit=None, include=None):
+            raise ConnectionError('chroma is down')
+
+    readiness = warmup_with(monkeypatch, BrokenVectorStore([]), encodings={'o200k_base': None})
+    monkeypatch.setattr(warmup_module, 'WARMUP_ENCODINGS', ('cl100k_base', 'o200k_base'))
+
+    warmup_module.warm_up()
+
+    assert readiness.ready
+    steps = {step['name']: step for step in readiness.report()['steps']}
+    assert steps['encoding:cl100k_base']['status'] == 'done'
+    assert steps['encoding:o200k_base']['status'] == 'failed'
+    assert 'chroma is down' in steps['vector_index']['error']
+
+
+def test_load_hot_queries_reads_json_or_lines(tmp_path):
+    as_json = tmp_path / 'hot.json'
+    as_json.write_text('["what was the revenue?", " "]')
+    as_lines = tmp_path / 'hot.txt'
+    as_lines.write_text('first question\n\nsecond question\n')
+
+    assert warmup_module.load_hot_queries(str(as_json)) == ['what was the revenue?']
+    assert warmup_module.load_hot_queries(str(as_lines)) == ['first question', 'second question']
+    assert warmup_module.load_hot_queries(None) == []
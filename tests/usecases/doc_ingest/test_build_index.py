@@ -37,7 +37,7 @@ def test_from_file_empty(monkeypatch):
     def fake_add_texts(texts, metadatas, ids):
         pytest.skip('vectorstore.add_texts should not be called for empty input')
     monkeypatch.setattr(
-        build_index_module.vectorstore,
+        build_index_module.get_vectorstore(),
         'add_texts',
         fake_add_texts
     )
@@ -76,7 +76,7 @@ def test_from_file_single_batch(monkeypatch):
         # Return the ids list back
         return ids
     monkeypatch.setattr(
-        build_index_module.vectorstore,
+        build_index_module.get_vectorstore(),
         'add_texts',
         fake_add_texts
     )
@@ -117,7 +117,7 @@ def test_from_file_multiple_batches(monkeypatch):
         captured['calls'].append((texts, metadatas, ids))
         return ids
     monkeypatch.setattr(
-        build_index_module.vectorstore,
+        build_index_module.get_vectorstore(),
         'add_texts',
         fake_add_texts
     )
@@ -0,0 +1,26 @@
+import json
+
+import usecases.doc_ingest._build_index as build_index_module
+
+
+class RecordingVectorstore:
+    def __init__(self):
+        self.batches = []
+
+    def add_texts(self, texts, metadatas, ids):
+        self.batches.append(list(texts))
+        return ids
+
+
+def test_json_chunks_are_indexed_once_each(tmp_path, monkeypatch):
+    vectorstore = RecordingVectorstore()
+    monkeypatch.setattr(build_index_module, 'get_vectorstore', lambda: vectorstore)
+    path = tmp_path / 'entry.json'
+    path.write_text(json.dumps({'id': 'e', 'pre_text': [f'paragraph {i} ' * 20 for i in range(10)]}))
+
+    ids = build_index_module.from_file(str(path), batch_size=2, chunk_size=200, chunk_overlap=0)
+
+    texts = [text for batch in vectorstore.batches for text in batch]
+    assert len(texts) > 2
+    assert len(texts) == len(set(texts)) == len(ids)
+    assert all(len(batch) <= 2 for batch in vectorstore.batches)
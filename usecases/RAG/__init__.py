@@ -1,5 +1,7 @@
 from ._retrieve_context import retrieve_context
 from ._generate_responses import generate_response
+from ._generate_program import generate_program_response
+from ._warmup import warm_up, start_warmup
 
 
-__all__ = ('generate_response', 'retrieve_context',)
+__all__ = ('generate_response', 'generate_program_response', 'retrieve_context', 'warm_up', 'start_warmup',)
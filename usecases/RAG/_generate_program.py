@@ -0,0 +1,59 @@
+from uuid import uuid4
+from typing import List
+
+from infrastructure import get_llm_chat, timed
+from domain import (
+    ChatQueryDTO,
+    ChatResponseDTO,
+    ProgramError,
+    execute_program,
+    extract_program,
+    format_program_result,
+    table_from_context,
+)
+from ._retrieve_context import retrieve_context
+from ._generate_responses import generate_response_from_context
+
+
+PROGRAM_INSTRUCTIONS = """You answer questions about financial tables by writing a program, not prose.
+Reply with a single line containing only the program. Available operations:
+add(a, b), subtract(a, b), multiply(a, b), divide(a, b), exp(a, b), greater(a, b),
+table_max(row, none), table_min(row, none), table_sum(row, none), table_average(row, none).
+Arguments are numbers copied from the context, constants such as const_100, or #n for the result of step n.
+Example: subtract(206588, 181001), divide(#0, 181001)"""
+
+
+def generate_program_response(query: ChatQueryDTO, message_history: List[dict], debug=False) -> ChatResponseDTO:
+    with timed('generate_program_response', 'retrieve'):
+        context_of_query = retrieve_context(query)
+
+    with timed('generate_program_response', 'llm'):
+        llm_response = get_llm_chat().invoke(
+            message_history, instructions=PROGRAM_INSTRUCTIONS, context=context_of_query
+        )
+
+    try:
+        program = extract_program(llm_response.content)
+    except ProgramError as error:
+        if debug:
+            print(f"Program mode fell back to free-form answer: {error}\n")
+        # A reply without a program is usually the answer in prose already, so it is kept as it is
+        if llm_response.content.strip():
+            return ChatResponseDTO(id_response=uuid4().int >> 64, content_response=llm_response.content)
+        return generate_response_from_context(message_history, context_of_query, debug=debug)
+
+    try:
+        result = execute_program(program, table=table_from_context(context_of_query))
+    except ProgramError as error:
+        if debug:
+            print(f"Program mode fell back to free-form answer: {error}\n")
+        # One more completion over the context already retrieved, instead of the whole text pipeline
+        return generate_response_from_context(message_history, context_of_query, debug=debug)
+
+    if debug:
+        print(f"Program: {program}\n")
+
+    return ChatResponseDTO(
+        id_response=uuid4().int >> 64,
+        content_response=f"{format_program_result(result)}\n\nProgram: {program}",
+    )
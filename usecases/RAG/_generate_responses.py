@@ -1,23 +1,21 @@
 from os import linesep
 from uuid import uuid4
 from typing import List
-from langchain.memory import ConversationSummaryMemory
 
-from infrastructure import llm_chat
+from infrastructure import get_llm_chat, timed
 from domain import ChatQueryDTO, ChatResponseDTO, HumanMessage, AIMessage, SystemMessage
 from ._retrieve_context import retrieve_context
 
 
 def generate_response(query: ChatQueryDTO, message_history: List[dict], debug=False) -> ChatResponseDTO:
-    context_of_query = retrieve_context(query)
+    with timed('generate_response', 'retrieve'):
+        context_of_query = retrieve_context(query)
+    return generate_response_from_context(message_history, context_of_query, debug=debug)
 
-    messages = []
 
-    if context_of_query:
-        system_message = SystemMessage(content=f"Context: {context_of_query}")
-        messages.append(system_message)
-
-    messages.extend(message_history)
+def generate_response_from_context(message_history: List[dict], context_of_query: str, debug=False) -> ChatResponseDTO:
+    # The chain places the context after the stable history so the prompt prefix stays cacheable
+    messages = list(message_history)
 
     if debug:
         class_name_to_role = {
@@ -29,7 +27,11 @@ def generate_response(query: ChatQueryDTO, message_history: List[dict], debug=Fa
             role = class_name_to_role.get(msg.__class__.__name__, 'Unknown')
             print(f"{role}: {msg.content}\n")
 
-    llm_response = llm_chat.invoke(messages)
+    with timed('generate_response', 'llm'):
+        llm_response = get_llm_chat().invoke(messages, context=context_of_query)
+
+    if debug:
+        print(f"Prompt tokens: {llm_response.response_metadata.get('prompt_breakdown')}\n")
 
     response = ChatResponseDTO(
         id_response=uuid4().int >> 64,
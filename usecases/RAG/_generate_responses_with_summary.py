@@ -4,7 +4,7 @@ from typing import List
 from langchain.chains import ConversationChain
 from langchain.memory import ConversationSummaryMemory
 
-from infrastructure import llm_chat
+from infrastructure import get_llm_chat
 from domain import ChatQueryDTO, ChatResponseDTO, HumanMessage, AIMessage, SystemMessage
 from ._retrieve_context import retrieve_context
 
@@ -32,7 +32,7 @@ def generate_response(query: ChatQueryDTO, message_history: List[dict], summaris
 
     if summarise:
         conversation_with_summary = ConversationChain(
-            llm=llm_chat,
+            llm=get_llm_chat(),
             memory=summarise,
             verbose=True
         )
@@ -42,7 +42,7 @@ def generate_response(query: ChatQueryDTO, message_history: List[dict], summaris
             content_response=llm_response,
         )
     else:
-        llm_response = llm_chat.invoke(messages)
+        llm_response = get_llm_chat().invoke(messages)
 
         response = ChatResponseDTO(
             id_response=uuid4().int >> 64,
@@ -1,9 +1,12 @@
 from domain import ChatQueryDTO, combine_langchain_docs
-from infrastructure import retriever
+from infrastructure import get_retriever, timed
 
 
 
 def retrieve_context(query: ChatQueryDTO) -> str:
-    retrieved_docs = retriever.invoke(query.content_query)
+    # Embedding the query and the vector search; the embedding alone is under operation 'embedding'
+    with timed('retrieve_context', 'retrieve') as span:
+        retrieved_docs = get_retriever().invoke(query.content_query)
+        span.set(k=len(retrieved_docs))
     formatted_context = combine_langchain_docs(retrieved_docs)
     return formatted_context
@@ -0,0 +1,75 @@
+import os
+import json
+import threading
+from typing import List, Optional, Sequence
+
+from infrastructure import get_encoding, get_vectorstore, readiness
+from domain import ChatQueryDTO, HumanMessage
+from . import _generate_responses, _retrieve_context
+
+
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', '1') not in ('0', 'false', 'False')
+# Encodings loaded ahead of the first prompt: the scheduler's and the prompt builder's, and GPT-4o's
+WARMUP_ENCODINGS = tuple(name for name in os.getenv('WARMUP_ENCODINGS', 'cl100k_base,o200k_base').split(',') if name)
+# Files of hot queries, as a JSON list or one per line: their embeddings are cached on startup,
+# and those in WARMUP_ANSWERS are answered as well, as the first turn of a chat
+WARMUP_QUERIES = os.getenv('WARMUP_QUERIES')
+WARMUP_ANSWERS = os.getenv('WARMUP_ANSWERS')
+
+
+def load_hot_queries(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        queries = json.loads(text)
+    else:
+        queries = text.splitlines()
+    return [query.strip() for query in queries if query and query.strip()]
+
+
+def _page_in_index():
+    # Searching with a stored vector loads the segment and its HNSW index without an embedding call
+    vectorstore = get_vectorstore()
+    stored = vectorstore.get(limit=1, include=['embeddings'])['embeddings']
+    if stored is not None and len(stored):
+        vectorstore.similarity_search_by_vector(list(stored[0]), k=1)
+
+
+def warm_up(queries: Sequence[str] = (), answers: Sequence[str] = ()):
+    """Loads what the first requests would otherwise wait for, then marks the process ready."""
+    for name in WARMUP_ENCODINGS:
+        with readiness.step(f'encoding:{name}'):
+            if get_encoding(name) is None:
+                raise RuntimeError(f'tiktoken encoding {name} is unavailable')
+    with readiness.step('vector_index'):
+        _page_in_index()
+    if queries:
+        with readiness.step('query_embeddings'):
+            for query in queries:
+                _retrieve_context.retrieve_context(ChatQueryDTO(id_query=0, content_query=query))
+    if answers:
+        with readiness.step('answers'):
+            for query in answers:
+                _generate_responses.generate_response(
+                    ChatQueryDTO(id_query=0, content_query=query), [HumanMessage(content=query)]
+                )
+    readiness.mark_ready()
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """Warms up in the background, so that the process answers its liveness probe meanwhile."""
+    if not WARMUP_ENABLED:
+        readiness.mark_ready()
+        return None
+
+    def run():
+        queries, answers = [], []
+        with readiness.step('hot_queries'):
+            queries, answers = load_hot_queries(WARMUP_QUERIES), load_hot_queries(WARMUP_ANSWERS)
+        warm_up(queries, answers)
+
+    thread = threading.Thread(target=run, name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -1,4 +1,4 @@
-from .RAG import generate_response, retrieve_context
+from .RAG import generate_response, generate_program_response, retrieve_context, warm_up, start_warmup
 
 
-__all__ = ('generate_response', 'retrieve_context',)
+__all__ = ('generate_response', 'generate_program_response', 'retrieve_context', 'warm_up', 'start_warmup',)
@@ -1,12 +1,12 @@
 import json
 from uuid import uuid4
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from tqdm import tqdm
 from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-from infrastructure import vectorstore
+from infrastructure import get_vectorstore, timed, ingested_chunks
 from domain import to_langchain_simple_metadata
 from ._tokenize import LoadTransformUnstructured
 
@@ -41,48 +41,58 @@ def from_file(
     batch_size: int = 1000,
     chunk_size: int = 2000,
     chunk_overlap: int = 200,
+    source: Optional[str] = None,
 ) -> List[str]:
 
     lower = filename.lower()
     is_json = lower.endswith(".json") or lower.endswith(".jsonl")
 
-    if is_json:
-        with open(filename, "r", encoding="utf-8") as f:
-            entries = json.load(f)
-        documents = _transform_json_entries(entries)
-    else:
-        documents = load_transform_unstructured(filename=filename)
-
-    documents = to_langchain_simple_metadata(documents=documents)
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-    )
-    documents = splitter.split_documents(documents)
-
+    with timed('from_file', 'load'):
+        if is_json:
+            with open(filename, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            documents = _transform_json_entries(entries)
+        else:
+            documents = load_transform_unstructured(filename=filename)
+        if source is not None:
+            # ``filename`` may be a short-lived staging copy; chunks should point at what was uploaded
+            for document in documents:
+                document.metadata['source'] = source
+
+        documents = to_langchain_simple_metadata(documents=documents)
+
+    with timed('from_file', 'split'):
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        documents = splitter.split_documents(documents)
+
+    vectorstore = get_vectorstore()
     ids_added: List[str] = []
     total_batches = (len(documents) + batch_size - 1) // batch_size
-    if is_json:
-        for i in range(0, len(documents)):
-            batch = documents[i : i + batch_size]
-            batch_ids = vectorstore.add_texts(
-                texts=[d.page_content for d in batch],
-                metadatas=[d.metadata for d in batch],
-                ids=[str(uuid4()) for _ in batch],
-            )
-            ids_added.extend(batch_ids)
-    else:
-        for i in tqdm(range(0, len(documents), batch_size),
-                      desc="Ingestion batches",
-                      total=total_batches,
-                      unit="batch"):
-            batch = documents[i: i + batch_size]
-            batch_ids = vectorstore.add_texts(
-                texts=[d.page_content for d in batch],
-                metadatas=[d.metadata for d in batch],
-                ids=[str(uuid4()) for _ in batch],
-            )
-            ids_added.extend(batch_ids)
+    with timed('from_file', 'index'):
+        if is_json:
+            for i in range(0, len(documents), batch_size):
+                batch = documents[i : i + batch_size]
+                batch_ids = vectorstore.add_texts(
+                    texts=[d.page_content for d in batch],
+                    metadatas=[d.metadata for d in batch],
+                    ids=[str(uuid4()) for _ in batch],
+                )
+                ids_added.extend(batch_ids)
+        else:
+            for i in tqdm(range(0, len(documents), batch_size),
+                          desc="Ingestion batches",
+                          total=total_batches,
+                          unit="batch"):
+                batch = documents[i: i + batch_size]
+                batch_ids = vectorstore.add_texts(
+                    texts=[d.page_content for d in batch],
+                    metadatas=[d.metadata for d in batch],
+                    ids=[str(uuid4()) for _ in batch],
+                )
+                ids_added.extend(batch_ids)
+    ingested_chunks.inc(len(ids_added))
 
     return ids_added
@@ -3,37 +3,36 @@ from langchain.text_splitter import (
     SentenceTransformersTokenTextSplitter,
     TextSplitter,
 )
-from langchain_community.document_loaders import (
-    UnstructuredCSVLoader,
-    UnstructuredExcelLoader,
-    UnstructuredPDFLoader,
-    UnstructuredPowerPointLoader,
-    UnstructuredFileLoader,
-    UnstructuredWordDocumentLoader,
-)
 from langchain_core.documents import Document
 from typing_extensions import List, Type
 from collections import defaultdict
 from functools import partial
+from importlib import import_module
+
+
+def _document_loader(name: str) -> Type:
+    # Each Unstructured loader drags in its own parsers (PDF, Office, ...), so it is only
+    # imported once a file of its type actually arrives
+    return getattr(import_module('langchain_community.document_loaders'), name)
 
 
 class LoadTransformUnstructured:
 
     def __call__(self, filename: str) -> List[Document]:
-        document_loader: Type[UnstructuredFileLoader] = self._create_loader(filename)
+        document_loader = self._create_loader(filename)
         text_splitter: Type[TextSplitter] = self._create_splitter(filename)
         documents: List[Document] = document_loader(filename).load()
         documents = text_splitter().split_documents(documents)
         return documents
 
     def __init__(self):
-        self.__document_loaders = defaultdict(lambda: UnstructuredFileLoader)
+        self.__document_loaders = defaultdict(lambda: 'UnstructuredFileLoader')
         self.__document_loaders.update({
-            'csv': UnstructuredCSVLoader,
-            'xlsx': UnstructuredExcelLoader,
-            'pdf': UnstructuredPDFLoader,
-            'pptx': UnstructuredPowerPointLoader,
-            'docx': UnstructuredWordDocumentLoader,
+            'csv': 'UnstructuredCSVLoader',
+            'xlsx': 'UnstructuredExcelLoader',
+            'pdf': 'UnstructuredPDFLoader',
+            'pptx': 'UnstructuredPowerPointLoader',
+            'docx': 'UnstructuredWordDocumentLoader',
         })
         self.document_splitters = defaultdict(lambda: 'characters')
         self.document_splitters.update({
@@ -49,9 +48,9 @@ class LoadTransformUnstructured:
             'sentence': SentenceTransformersTokenTextSplitter,
         })
 
-    def _create_loader(self, filename: str) -> Type[UnstructuredFileLoader]:
+    def _create_loader(self, filename: str):
         file_extension = filename.split('.')[-1].lower()
-        document_loader = self.__document_loaders[file_extension]
+        document_loader = _document_loader(self.__document_loaders[file_extension])
         document_loader = partial(document_loader, mode='elements', strategy='fast')
         return document_loader
 